@@ -0,0 +1,68 @@
+"""
+End-to-end throughput of the chat endpoints at increasing concurrency, sent through the FastAPI app in-process.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List
+import httpx
+from fixtures import create_chat_request
+from harness import summarize
+
+
+async def _run_level(
+    client: httpx.AsyncClient, endpoint: str, payload: Dict, concurrency: int, requests: int
+) -> Dict[str, Any]:
+    durations: List[float] = []
+    errors = 0
+
+    async def worker(count: int):
+        nonlocal errors
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.post(endpoint, json=payload)
+            # the ASGI transport buffers the whole (streamed) body
+            await response.aread()
+            durations.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    per_worker = max(requests // concurrency, 1)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        **summarize(durations),
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_second": len(durations) / elapsed,
+    }
+
+
+def run(iterations: int, concurrency_levels: List[int]) -> Dict[str, Dict[str, Any]]:
+    from main import app
+
+    payload = create_chat_request().model_dump(mode="json")
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def measure_endpoints():
+        # failed requests are counted as errors instead of aborting the suite
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            for endpoint in ("/chat", "/chat/stream"):
+                # warm up the clients and indexes
+                await _run_level(client, endpoint, payload, 1, 2)
+                for concurrency in concurrency_levels:
+                    results[f"{endpoint}[c={concurrency}]"] = await _run_level(
+                        client,
+                        endpoint,
+                        payload,
+                        concurrency,
+                        max(iterations, concurrency * 2),
+                    )
+
+    asyncio.run(measure_endpoints())
+    return results
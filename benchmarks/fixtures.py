@@ -0,0 +1,89 @@
+"""
+Requests and configurations, which resemble the requests of the UI and the agents.
+"""
+
+from internal_shared.models.ai import AvailableModels
+from internal_shared.models.chat import (
+    ChatRequest,
+    PostRetrievalType,
+    PreRetrievalType,
+    PromptTemplate,
+    RetrievalConfig,
+    RetrieverConfig,
+    RetrieverType,
+)
+
+QUERY = "Create a formula that checks whether the end date is still in the current month when 5 working days are added to the current date."
+
+FORMULA_RETRIEVAL = RetrievalConfig(
+    retriever=RetrieverConfig(
+        retriever_name="formula_retriever",
+        retriever_type=RetrieverType.VECTOR,
+        index_name="mergedfunctionindex",
+        embedding_model=AvailableModels.EMBEDDING_2,
+        retriever_select=["chunk", "metadata"],
+        field_mappings={
+            "name": "metadata.function_name",
+            "summary": "chunk",
+            "content": "chunk",
+        },
+    ),
+    context_key="formula_context",
+    pre_retrieval_type=PreRetrievalType.DEFAULT,
+    post_retrieval_type=PostRetrievalType.DEFAULT,
+    top_k=10,
+)
+
+BUSINESS_LOGIC_RETRIEVAL = RetrievalConfig(
+    retriever=RetrieverConfig(
+        retriever_name="business_logic_retriever",
+        retriever_type=RetrieverType.VECTOR,
+        index_name="domain_knowledge",
+        embedding_model=AvailableModels.EMBEDDING_3_LARGE,
+        retriever_select=["name", "summary", "content"],
+        field_mappings={"name": "name", "summary": "summary", "content": "content"},
+    ),
+    context_key="context",
+    pre_retrieval_type=PreRetrievalType.DEFAULT,
+    post_retrieval_type=PostRetrievalType.DEFAULT,
+)
+
+GRAPH_RETRIEVAL = RetrievalConfig(
+    retriever=RetrieverConfig(
+        retriever_name="graph_retriever", retriever_type=RetrieverType.GRAPH
+    ),
+    context_key="graph_context",
+    pre_retrieval_type=PreRetrievalType.DEFAULT,
+    post_retrieval_type=PostRetrievalType.DEFAULT,
+)
+
+PROMPT_TEMPLATE = PromptTemplate(
+    name="benchmark",
+    template="""You are an expert in creating formulas. Use the following context to create the formula.
+Functions:
+{formula_context}
+
+Business logic:
+{context}
+
+Related interfaces:
+{graph_context}
+
+Examples:
+{examples}""",
+    few_shot_key="examples",
+    few_shot_value="User: Is the order empty?\nAssistant: IsNullOrEmpty([Order])",
+)
+
+
+def create_chat_request() -> ChatRequest:
+    return ChatRequest(
+        query=QUERY,
+        retrieval_behaviour=[FORMULA_RETRIEVAL, BUSINESS_LOGIC_RETRIEVAL, GRAPH_RETRIEVAL],
+        model=AvailableModels.GPT_4O,
+        prompt_template=PROMPT_TEMPLATE,
+        history=[
+            ("Which function returns the current date?", "Today() returns the current date."),
+            ("And the current time?", "Now() returns the current date and time."),
+        ],
+    )
@@ -0,0 +1,193 @@
+"""
+Shared helpers of the benchmark suites: environment setup, timing and the comparison against a baseline.
+"""
+
+import asyncio
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+RAG_PIPELINE_API = REPO_ROOT / "rag-pipeline" / "api"
+
+# environment of the benchmarks, existing variables take precedence
+_DEFAULT_ENVIRONMENT = {
+    "LLM_BACKEND": "fake",
+    "RETRIEVAL_BACKEND": "fake",
+    # repeated requests must not be answered from the caches
+    "LLM_CACHE_ENABLED": "false",
+    "EMBEDDING_CACHE_ENABLED": "false",
+    # the clients are never called, but the configuration is validated on import
+    "AZURE_OPENAI_API_VERSION": "2024-02-01",
+    "AZURE_OPENAI_US_API_KEY": "benchmark",
+    "AZURE_OPENAI_US_ENDPOINT": "https://us.benchmark.invalid",
+    "AZURE_OPENAI_SE_API_KEY": "benchmark",
+    "AZURE_OPENAI_SE_ENDPOINT": "https://se.benchmark.invalid",
+    "AZURE_AI_SEARCH_ENDPOINT": "https://search.benchmark.invalid",
+    "AZURE_AI_SEARCH_API_KEY": "benchmark",
+}
+
+# direction of the compared metrics: -1 = lower is better, 1 = higher is better
+METRIC_DIRECTIONS = {
+    "p50_ms": -1,
+    "p95_ms": -1,
+    "requests_per_second": 1,
+    "recall_at_k": 1,
+}
+
+
+def configure_environment() -> None:
+    """
+    Configures the offline stand-in backends and makes the RAG pipeline importable.
+
+    Has to be called before any module of the RAG pipeline is imported.
+    """
+    for key, value in _DEFAULT_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault("RAG_CACHE_DIR", tempfile.mkdtemp(prefix="rag-benchmark-"))
+    if str(RAG_PIPELINE_API) not in sys.path:
+        sys.path.insert(0, str(RAG_PIPELINE_API))
+
+
+def disable_database() -> None:
+    """
+    Skips the MongoDB writes of the chat endpoints, the benchmarks measure the pipeline only.
+    """
+    import main
+    import pipeline
+
+    async def get_async_db(db_name: str):
+        return None
+
+    main.get_async_db = get_async_db
+    pipeline.get_async_db = get_async_db
+
+
+def summarize(durations_ms: List[float]) -> Dict[str, float]:
+    """
+    Summarizes the durations of a benchmark.
+    """
+    ordered = sorted(durations_ms)
+
+    def percentile(p: float) -> float:
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+    return {
+        "iterations": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered),
+        "min_ms": ordered[0],
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1],
+    }
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 5) -> Dict[str, float]:
+    """
+    Measures the duration of a synchronous function.
+    """
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return summarize(durations)
+
+
+async def measure_async(
+    fn: Callable[[], Awaitable[Any]], iterations: int, warmup: int = 5
+) -> Dict[str, float]:
+    """
+    Measures the duration of an asynchronous function.
+    """
+    for _ in range(warmup):
+        await fn()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return summarize(durations)
+
+
+def run_async(coroutine: Awaitable[Any]) -> Any:
+    return asyncio.run(coroutine)
+
+
+def get_metadata() -> Dict[str, Any]:
+    """
+    Metadata of a benchmark run, in order to judge whether two runs are comparable.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "environment": {
+            key: os.environ[key]
+            for key in sorted(os.environ)
+            if key.startswith(("FAKE_", "LLM_", "EMBEDDING_", "RETRIEVAL_"))
+        },
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[Dict[str, Any]]:
+    """
+    Compares the metrics of two benchmark runs.
+
+    A metric regressed, if it got worse by more than `tolerance` (relative to the baseline).
+    """
+    rows = []
+    for suite, benchmarks in current["suites"].items():
+        for name, metrics in benchmarks.items():
+            base_metrics = baseline.get("suites", {}).get(suite, {}).get(name)
+            if not base_metrics:
+                continue
+            for metric, direction in METRIC_DIRECTIONS.items():
+                if metric not in metrics or not base_metrics.get(metric):
+                    continue
+                change = (metrics[metric] - base_metrics[metric]) / base_metrics[metric]
+                rows.append(
+                    {
+                        "benchmark": f"{suite}/{name}",
+                        "metric": metric,
+                        "baseline": base_metrics[metric],
+                        "current": metrics[metric],
+                        "change": change,
+                        "regression": change * direction < -tolerance,
+                    }
+                )
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    width = max((len(row["benchmark"]) for row in rows), default=10)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['benchmark']:<{width}}  {row['metric']:<20} "
+            f"{row['baseline']:>12.3f} -> {row['current']:>12.3f} "
+            f"({row['change']:+7.1%}) {flag}"
+        )
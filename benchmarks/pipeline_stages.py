@@ -0,0 +1,75 @@
+"""
+Per-stage latency of the RAG pipeline hot path.
+"""
+
+from typing import Any, Dict
+from langchain_core.messages import AIMessage
+from fixtures import FORMULA_RETRIEVAL, create_chat_request
+from harness import measure, measure_async, run_async
+
+
+def run(iterations: int) -> Dict[str, Dict[str, Any]]:
+    from pipeline import execute_pipeline, prepare_prompt, retrieve_documents
+    from pipeline.helper import (
+        calculate_token_str_usage,
+        calculate_token_usage,
+        render_prompt,
+    )
+    from retrieval.retrieval import VectorDatabaseRetrievalStrategy
+
+    request = create_chat_request()
+    results: Dict[str, Dict[str, Any]] = {}
+
+    async def measure_pipeline():
+        results["retrieve_documents"] = await measure_async(
+            lambda: retrieve_documents(request), iterations
+        )
+        context, _ = await retrieve_documents(request)
+        results["prepare_prompt"] = await measure_async(
+            lambda: prepare_prompt(request, context), iterations
+        )
+        response = await execute_pipeline(request, "benchmark")
+        return response, await prepare_prompt(request, context)
+
+    response, prompt = run_async(measure_pipeline())
+
+    message = AIMessage(
+        content=response.response,
+        response_metadata={"token_usage": response.token_usage.model_dump()},
+    )
+    results["calculate_token_usage[metadata]"] = measure(
+        lambda: calculate_token_usage(prompt, message, request.model), iterations
+    )
+    try:
+        # tiktoken downloads its encodings, which is not possible without network access
+        calculate_token_str_usage(["probe"], "probe", request.model)
+        tiktoken_available = True
+    except Exception:
+        tiktoken_available = False
+    if tiktoken_available:
+        results["calculate_token_usage[tiktoken]"] = measure(
+            lambda: calculate_token_usage(
+                prompt, AIMessage(content=response.response), request.model
+            ),
+            iterations,
+        )
+    else:
+        results["calculate_token_usage[tiktoken]"] = {
+            "skipped": "tiktoken encoding not available, set TIKTOKEN_CACHE_DIR"
+        }
+
+    results["render_prompt"] = measure(lambda: render_prompt(prompt), iterations)
+
+    strategy = VectorDatabaseRetrievalStrategy(FORMULA_RETRIEVAL.retriever)
+    search_result = {
+        "chunk": "AddWorkingDays(DateTime, DaysCount) adds a number of working days to the start date.",
+        "metadata": {"function_name": "AddWorkingDays", "category": "datetime_functions"},
+        "@search.score": 0.83,
+    }
+    results["_map_single_result"] = measure(
+        lambda: strategy._map_single_result(search_result, FORMULA_RETRIEVAL.threshold),
+        iterations * 10,
+    )
+
+    results["ChatResponse.to_dto_dict"] = measure(response.to_dto_dict, iterations)
+    return results
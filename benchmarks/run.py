@@ -0,0 +1,155 @@
+"""
+Runs the benchmark suites against the offline stand-in backends and compares the results with a baseline.
+
+Usage:
+    python benchmarks/run.py run --output results.json [--baseline baseline.json]
+    python benchmarks/run.py compare results.json baseline.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from harness import (
+    compare,
+    configure_environment,
+    disable_database,
+    get_metadata,
+    print_comparison,
+)
+
+
+def _run_stages(args: argparse.Namespace):
+    import pipeline_stages
+
+    return pipeline_stages.run(args.iterations)
+
+
+def _run_api(args: argparse.Namespace):
+    import api_throughput
+
+    return api_throughput.run(args.iterations, args.concurrency)
+
+
+def _run_vector_index(args: argparse.Namespace):
+    import vector_index
+
+    return vector_index.run(
+        args.iterations,
+        args.index,
+        args.vector_count,
+        args.top_k,
+        args.hnsw_m,
+        args.hnsw_ef_construction,
+        args.hnsw_ef_search,
+        args.rescore_candidates,
+        args.pq_subvectors,
+        args.prefix_dims,
+        args.shortlist_sizes,
+        args.vector_methods,
+    )
+
+
+SUITES = {
+    "stages": _run_stages,
+    "api": _run_api,
+    "vector_index": _run_vector_index,
+}
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",")]
+
+
+def _compare_and_report(current: dict, baseline_path: str, tolerance: float) -> int:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, tolerance)
+    print_comparison(rows)
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+def run(args: argparse.Namespace) -> int:
+    configure_environment()
+    disable_database()
+
+    results = {"metadata": get_metadata(), "suites": {}}
+    for suite in args.suite or list(SUITES):
+        print(f"Running suite '{suite}'", file=sys.stderr)
+        results["suites"][suite] = SUITES[suite](args)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+    if args.baseline:
+        return _compare_and_report(results, args.baseline, args.tolerance)
+    return 0
+
+
+def compare_files(args: argparse.Namespace) -> int:
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    return _compare_and_report(current, args.baseline, args.tolerance)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suites")
+    run_parser.add_argument("--suite", action="append", choices=list(SUITES))
+    run_parser.add_argument("--iterations", type=int, default=50)
+    run_parser.add_argument(
+        "--concurrency",
+        type=_int_list,
+        default=[1, 4, 16, 64],
+        help="Comma-separated concurrency levels of the API suite",
+    )
+    run_parser.add_argument(
+        "--index", help="Local index, whose embeddings are used by the vector index suite"
+    )
+    run_parser.add_argument(
+        "--vector-count",
+        type=int,
+        default=5000,
+        help="Number of synthetic vectors of the vector index suite, if no index is given",
+    )
+    run_parser.add_argument("--top-k", type=int, default=10)
+    run_parser.add_argument("--hnsw-m", type=_int_list, default=[8, 16])
+    run_parser.add_argument("--hnsw-ef-construction", type=_int_list, default=[100, 200])
+    run_parser.add_argument("--hnsw-ef-search", type=_int_list, default=[16, 32, 64, 128])
+    run_parser.add_argument("--rescore-candidates", type=_int_list, default=[0, 100])
+    run_parser.add_argument("--pq-subvectors", type=int)
+    run_parser.add_argument("--prefix-dims", type=_int_list, default=[64, 128, 256])
+    run_parser.add_argument("--shortlist-sizes", type=_int_list, default=[50, 100, 200])
+    run_parser.add_argument(
+        "--vector-methods",
+        type=lambda value: value.split(","),
+        default=["hnsw", "int8", "pq", "prefix"],
+        help="Comma-separated search methods of the vector index suite",
+    )
+    run_parser.add_argument("--output", help="Path of the JSON results")
+    run_parser.add_argument("--baseline", help="Path of the baseline to compare with")
+    run_parser.add_argument("--tolerance", type=float, default=0.1)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1)
+    compare_parser.set_defaults(handler=compare_files)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
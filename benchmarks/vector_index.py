@@ -0,0 +1,142 @@
+"""
+Recall, latency and memory of the approximate search methods of the local retriever compared to exact search.
+"""
+
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from harness import summarize
+
+# rows, which are held out of the index and used as queries
+QUERY_COUNT = 200
+
+METHODS = ["hnsw", "int8", "pq", "prefix"]
+
+
+def load_vectors(index_path: str | None, synthetic_count: int, dimensions: int = 256) -> np.ndarray:
+    """
+    Embeddings of a local index, or clustered random vectors if no index is given.
+    """
+    from retrieval.local_index import load_local_index, normalize
+
+    if index_path:
+        return np.array(load_local_index(index_path).embeddings)
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(max(synthetic_count // 100, 1), dimensions))
+    vectors = centers[rng.integers(len(centers), size=synthetic_count)]
+    vectors = vectors + 0.75 * rng.normal(size=vectors.shape)
+    return normalize(vectors.astype(np.float32))
+
+
+def _measure_queries(
+    search, queries: np.ndarray, iterations: int
+) -> Tuple[Dict[str, float], List[List[int]]]:
+    durations, ids = [], []
+    for i in range(max(iterations, len(queries))):
+        query = queries[i % len(queries)]
+        start = time.perf_counter()
+        hits = search(query)
+        durations.append((time.perf_counter() - start) * 1000)
+        if i < len(queries):
+            ids.append([node for node, _ in hits])
+    return summarize(durations), ids
+
+
+def _recall(expected: List[List[int]], actual: List[List[int]]) -> float:
+    found = sum(len(set(e) & set(a)) for e, a in zip(expected, actual))
+    return found / max(sum(len(e) for e in expected), 1)
+
+
+def run(
+    iterations: int,
+    index_path: str | None = None,
+    synthetic_count: int = 5000,
+    top_k: int = 10,
+    m_values: Sequence[int] = (8, 16),
+    ef_construction_values: Sequence[int] = (100, 200),
+    ef_search_values: Sequence[int] = (16, 32, 64, 128),
+    rescore_values: Sequence[int] = (0, 100),
+    pq_subvectors: int | None = None,
+    prefix_dims_values: Sequence[int] = (64, 128, 256),
+    shortlist_values: Sequence[int] = (50, 100, 200),
+    methods: Sequence[str] = METHODS,
+) -> Dict[str, Dict[str, Any]]:
+    from internal_shared.models.chat import VectorQuantization
+    from retrieval.hnsw import HNSWIndex
+    from retrieval.local_index import PrefixVectorIndex, normalize
+    from retrieval.quantization import QuantizedVectorIndex
+
+    vectors = load_vectors(index_path, synthetic_count)
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(vectors), size=min(QUERY_COUNT, len(vectors) // 10), replace=False)
+    queries = vectors[query_rows]
+    corpus = np.delete(vectors, query_rows, axis=0)
+
+    def exact_search(query: np.ndarray):
+        similarities = corpus @ normalize(query)
+        indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        return [(int(i), float(similarities[i])) for i in indices]
+
+    exact, expected = _measure_queries(exact_search, queries, iterations)
+    results: Dict[str, Dict[str, Any]] = {
+        "exact": {
+            **exact,
+            "vectors": len(corpus),
+            "recall_at_k": 1.0,
+            "memory_bytes": corpus.nbytes,
+        }
+    }
+
+    for quantization in [VectorQuantization.INT8, VectorQuantization.PQ]:
+        if quantization.value not in methods:
+            continue
+        start = time.perf_counter()
+        subvectors = pq_subvectors or max(corpus.shape[1] // 32, 1)
+        quantized = QuantizedVectorIndex.build(corpus, quantization, subvectors)
+        build_seconds = time.perf_counter() - start
+        name = "int8" if quantization == VectorQuantization.INT8 else f"pq[subvectors={subvectors}]"
+        for rescore_candidates in rescore_values:
+            latency, actual = _measure_queries(
+                lambda query: quantized.search(query, top_k, rescore_candidates),
+                queries,
+                iterations,
+            )
+            results[f"{name}[rescore_candidates={rescore_candidates}]"] = {
+                **latency,
+                "recall_at_k": _recall(expected, actual),
+                "memory_bytes": quantized.memory_bytes,
+                "compression": corpus.nbytes / quantized.memory_bytes,
+                "build_seconds": build_seconds,
+            }
+
+    for prefix_dims in prefix_dims_values if "prefix" in methods else []:
+        prefix_index = PrefixVectorIndex(corpus, prefix_dims)
+        for shortlist_size in shortlist_values:
+            latency, actual = _measure_queries(
+                lambda query: prefix_index.search(query, top_k, shortlist_size),
+                queries,
+                iterations,
+            )
+            results[f"prefix[dims={prefix_index.prefix_dims},shortlist={shortlist_size}]"] = {
+                **latency,
+                "recall_at_k": _recall(expected, actual),
+                "memory_bytes": prefix_index.prefixes.nbytes,
+            }
+
+    for m in m_values if "hnsw" in methods else []:
+        for ef_construction in ef_construction_values:
+            start = time.perf_counter()
+            graph = HNSWIndex.build(corpus, m, ef_construction)
+            build_seconds = time.perf_counter() - start
+            for ef_search in ef_search_values:
+                latency, actual = _measure_queries(
+                    lambda query: graph.search(query, top_k, ef_search),
+                    queries,
+                    iterations,
+                )
+                results[f"hnsw[m={m},ef_construction={ef_construction},ef_search={ef_search}]"] = {
+                    **latency,
+                    "recall_at_k": _recall(expected, actual),
+                    "build_seconds": build_seconds,
+                }
+    return results
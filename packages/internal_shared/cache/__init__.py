@@ -0,0 +1,13 @@
+from .embedding_cache import (
+    EmbeddingCache,
+    EmbeddingCacheStats,
+    get_embedding_cache,
+    text_hash,
+)
+
+__all__ = [
+    "EmbeddingCache",
+    "EmbeddingCacheStats",
+    "get_embedding_cache",
+    "text_hash",
+]
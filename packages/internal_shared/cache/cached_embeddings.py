@@ -0,0 +1,56 @@
+from typing import List
+from langchain_core.embeddings import Embeddings
+from .embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a langchain embeddings client and serves known texts from the shared embedding cache.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache: EmbeddingCache | None = None,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = self.embeddings.embed_documents(missing_texts)
+            self.cache.set_many(self.model_name, missing_texts, embedded)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model_name, text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(self.model_name, text, vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # the cache files are accessed in a thread, thus the event loop is not blocked
+        vectors = await self.cache.get_many_async(self.model_name, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = await self.embeddings.aembed_documents(missing_texts)
+            await self.cache.set_many_async(self.model_name, missing_texts, embedded)
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = (await self.cache.get_many_async(self.model_name, [text]))[0]
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await self.cache.set_many_async(self.model_name, [text], [vector])
+        return vector
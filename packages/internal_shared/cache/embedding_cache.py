@@ -0,0 +1,236 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from internal_shared.logger import get_logger
+from internal_shared.utils.helper_functions import get_cache_dir
+
+_logger = get_logger(__name__)
+
+_DTYPE = np.float32
+
+
+def text_hash(text: str) -> str:
+    """
+    Content address of a text, used as the cache key together with the embedding model.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """Hit/miss counters of the embedding cache."""
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+
+    def to_dict(self) -> Dict:
+        total = self.hits + self.misses
+        return {**asdict(self), "hit_rate": self.hits / total if total else 0.0}
+
+
+class _ModelStore:
+    """
+    Vector store of a single embedding model.
+
+    Vectors are appended as raw float32 rows to `<model>.f32`, which is read through a memory map. The SQLite index `<model>.idx` maps the sha256 of a text to its row. Appending is guarded by an exclusive file lock, thus multiple processes can share the same store.
+    """
+
+    def __init__(self, directory: Path, model: str):
+        self.data_path = directory / f"{model}.f32"
+        self.lock_path = directory / f"{model}.lock"
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(
+            directory / f"{model}.idx", timeout=5, check_same_thread=False
+        )
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._index.commit()
+        self._dims: int | None = self._read_dims()
+        self._matrix: np.memmap | None = None
+
+    def _read_dims(self) -> int | None:
+        row = self._index.execute(
+            "SELECT value FROM meta WHERE name = 'dims'"
+        ).fetchone()
+        return row[0] if row else None
+
+    def _rows(self, keys: Sequence[str]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        # sqlite limits the number of host parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(
+                self._index.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+            )
+        return rows
+
+    def _get_matrix(self, min_rows: int) -> np.ndarray:
+        if self._matrix is None or self._matrix.shape[0] < min_rows:
+            if self._dims is None:
+                self._dims = self._read_dims()
+            rows = os.path.getsize(self.data_path) // (self._dims * _DTYPE().itemsize)
+            self._matrix = np.memmap(
+                self.data_path, dtype=_DTYPE, mode="r", shape=(rows, self._dims)
+            )
+        return self._matrix
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            rows = self._rows(keys)
+            if not rows:
+                return [None] * len(keys)
+            matrix = self._get_matrix(max(rows.values()) + 1)
+            return [
+                np.array(matrix[rows[key]]) if key in rows else None for key in keys
+            ]
+
+    def set_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]):
+        data = np.asarray(vectors, dtype=_DTYPE)
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                dims = self._read_dims()
+                if dims is None:
+                    dims = data.shape[1]
+                    self._index.execute(
+                        "INSERT INTO meta (name, value) VALUES ('dims', ?)", (dims,)
+                    )
+                elif dims != data.shape[1]:
+                    raise ValueError(
+                        f"Expected vectors with {dims} dimensions, got {data.shape[1]}"
+                    )
+                self._dims = dims
+
+                # another process may have stored some of the vectors in the meantime
+                existing = self._rows(keys)
+                new_keys, new_rows = [], []
+                for key, vector in zip(keys, data):
+                    if key not in existing and key not in new_keys:
+                        new_keys.append(key)
+                        new_rows.append(vector)
+                if not new_keys:
+                    self._index.commit()
+                    return
+
+                row_size = dims * _DTYPE().itemsize
+                with open(self.data_path, "ab") as data_file:
+                    size = os.fstat(data_file.fileno()).st_size
+                    # an interrupted write leaves a partial row, which would shift all later rows
+                    if size % row_size:
+                        _logger.warning(
+                            f"Truncating partial row at the end of '{self.data_path}'"
+                        )
+                        size -= size % row_size
+                        data_file.truncate(size)
+                    offset = size // row_size
+                    data_file.write(np.stack(new_rows).tobytes())
+                self._index.executemany(
+                    "INSERT INTO vectors (key, row) VALUES (?, ?)",
+                    [(key, offset + i) for i, key in enumerate(new_keys)],
+                )
+                self._index.commit()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache, keyed by the embedding model and the sha256 of the text.
+
+    The vectors are stored as float32 in memory-mapped files, thus a 3072 dimensional vector costs 12 KB on disk. Since the files are shared, the pipeline and evaluation services reuse vectors across processes and restarts.
+    """
+
+    def __init__(self, directory: str | Path, enabled: bool = True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.enabled = enabled
+        self.stats = EmbeddingCacheStats()
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, model: str) -> _ModelStore:
+        with self._lock:
+            if model not in self._stores:
+                self._stores[model] = _ModelStore(self.directory, model)
+            return self._stores[model]
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Get the cached vectors for the given texts. Missing vectors are returned as `None`.
+        """
+        if not self.enabled:
+            return [None] * len(texts)
+        try:
+            vectors = self._store(model).get_many([text_hash(t) for t in texts])
+        except (OSError, sqlite3.Error):
+            _logger.warning("Could not read from embedding cache", exc_info=True)
+            vectors = [None] * len(texts)
+
+        hits = sum(v is not None for v in vectors)
+        self.stats.hits += hits
+        self.stats.misses += len(texts) - hits
+        return [v.tolist() if v is not None else None for v in vectors]
+
+    async def get_many_async(
+        self, model: str, texts: Sequence[str]
+    ) -> List[Optional[List[float]]]:
+        """
+        Variant of `get_many` for async callers, which reads the files in a thread.
+        """
+        if not self.enabled:
+            return [None] * len(texts)
+        return await asyncio.to_thread(self.get_many, model, texts)
+
+    def set(self, model: str, text: str, vector: Sequence[float]) -> None:
+        self.set_many(model, [text], [vector])
+
+    def set_many(
+        self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]
+    ) -> None:
+        if not self.enabled or not texts:
+            return
+        try:
+            self._store(model).set_many([text_hash(t) for t in texts], vectors)
+            self.stats.writes += len(texts)
+        except (OSError, sqlite3.Error, ValueError):
+            _logger.warning("Could not write to embedding cache", exc_info=True)
+
+    async def set_many_async(
+        self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]
+    ) -> None:
+        """
+        Variant of `set_many` for async callers, which writes the files (under the file lock) in a thread.
+        """
+        if not self.enabled or not texts:
+            return
+        await asyncio.to_thread(self.set_many, model, texts, vectors)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Get the process-wide embedding cache, configured by the `EMBEDDING_CACHE_*` environment variables.
+    """
+    directory = os.getenv("EMBEDDING_CACHE_DIR") or get_cache_dir("embeddings")
+    enabled = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    return EmbeddingCache(directory, enabled)
@@ -0,0 +1,42 @@
+"""
+Version counters of the search indexes, stored in the `index_versions` collection as `{"_id": <index name>, "version": <int>}`.
+
+Whoever changes the documents of an index (e.g. the upload notebooks or the ingestion API) bumps its version, which invalidates the cached retrieval results of the index.
+"""
+
+from typing import Dict
+from pymongo import ReturnDocument
+
+INDEX_VERSIONS_COLLECTION = "index_versions"
+
+
+def bump_index_version(db, index_name: str) -> int:
+    """
+    Increments the version of an index and returns the new version.
+    """
+    document = db[INDEX_VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": index_name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["version"]
+
+
+async def bump_index_version_async(db, index_name: str) -> int:
+    document = await db[INDEX_VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": index_name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["version"]
+
+
+def get_index_versions(db) -> Dict[str, int]:
+    return {d["_id"]: d["version"] for d in db[INDEX_VERSIONS_COLLECTION].find({})}
+
+
+async def get_index_versions_async(db) -> Dict[str, int]:
+    documents = await db[INDEX_VERSIONS_COLLECTION].find({}).to_list(length=None)
+    return {d["_id"]: d["version"] for d in documents}
@@ -0,0 +1,32 @@
+from .backend import (
+    cache_namespace,
+    create_fake_chat_model,
+    create_fake_embeddings,
+    is_fake_llm_backend,
+    is_fake_retrieval_backend,
+)
+from .chat import FakeChatModel
+from .embeddings import FakeEmbeddings, fake_embedding
+from .search import (
+    FakeAsyncGraphDriver,
+    FakeAsyncSearchClient,
+    FakeGraphDatabase,
+    FakeSearchClient,
+    get_fake_search_index,
+)
+
+__all__ = [
+    "FakeAsyncGraphDriver",
+    "FakeAsyncSearchClient",
+    "FakeChatModel",
+    "FakeEmbeddings",
+    "FakeGraphDatabase",
+    "FakeSearchClient",
+    "cache_namespace",
+    "create_fake_chat_model",
+    "create_fake_embeddings",
+    "fake_embedding",
+    "get_fake_search_index",
+    "is_fake_llm_backend",
+    "is_fake_retrieval_backend",
+]
@@ -0,0 +1,46 @@
+import os
+from .chat import FakeChatModel
+from .embeddings import FakeEmbeddings
+
+
+def is_fake_llm_backend() -> bool:
+    """
+    Whether the LLM and embedding calls use the offline stand-ins (`LLM_BACKEND=fake`).
+    """
+    return os.getenv("LLM_BACKEND", "azure").lower() == "fake"
+
+
+def is_fake_retrieval_backend() -> bool:
+    """
+    Whether Azure AI Search and Neo4j are replaced by the offline stand-ins (`RETRIEVAL_BACKEND=fake`).
+    """
+    return os.getenv("RETRIEVAL_BACKEND", "azure").lower() == "fake"
+
+
+def cache_namespace(model_name: str) -> str:
+    """
+    Model name used in cache keys. Responses of the stand-ins must not end up in the caches of the real models.
+    """
+    return f"fake-{model_name}" if is_fake_llm_backend() else model_name
+
+
+def create_fake_chat_model(model_name: str) -> FakeChatModel:
+    """
+    Creates a fake chat model based on the `FAKE_LLM_*` environment variables.
+    """
+    return FakeChatModel(
+        model_name=model_name,
+        response=os.getenv("FAKE_LLM_RESPONSE"),
+        response_tokens=int(os.getenv("FAKE_LLM_RESPONSE_TOKENS", 50)),
+        latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", 0.0)),
+        tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 0.0)),
+    )
+
+
+def create_fake_embeddings(model_name: str) -> FakeEmbeddings:
+    """
+    Creates fake embeddings based on the `FAKE_EMBEDDING_*` environment variables.
+    """
+    return FakeEmbeddings(
+        model_name, latency_ms=float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", 0.0))
+    )
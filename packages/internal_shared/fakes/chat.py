@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_VOCABULARY = (
+    "the formula returns value of property field date string list count "
+    "function parameter example tour order consignment truck driver status "
+    "use with and or if empty text number format customer address"
+).split()
+
+# keys requested by the JSON prompts of the evaluation frameworks (deepeval, RAGAS)
+_JSON_RESPONSE = {
+    "statements": [],
+    "verdicts": [],
+    "truths": [],
+    "claims": [],
+    "steps": [],
+    "score": 1,
+    "reason": "Fake response of the offline stand-in backend.",
+}
+
+
+def _count_tokens(text: str) -> int:
+    # rough estimate, the stand-in must not depend on downloaded tokenizer files
+    return max(len(text.split()), 1)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for `AzureChatOpenAI`, which returns canned completions.
+
+    Every response is derived from a hash of the prompt and thus deterministic. The time to the first token is `latency_ms`, afterwards the tokens are generated with `tokens_per_second`. The token usage is reported in the same format as the Azure OpenAI client.
+    """
+
+    model_name: str = "fake"
+    response: Optional[str] = None
+    response_tokens: int = 50
+    latency_ms: float = 0.0
+    tokens_per_second: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _default_params(self) -> Dict[str, Any]:
+        return {"model": self.model_name}
+
+    def _get_tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if self.response is not None:
+            text = self.response
+        elif "json" in prompt.lower():
+            text = json.dumps(_JSON_RESPONSE)
+        else:
+            seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8])
+            rng = np.random.default_rng(seed)
+            text = " ".join(rng.choice(_VOCABULARY, self.response_tokens))
+        # the whitespace is kept, thus the streamed chunks add up to the response
+        words = text.split(" ")
+        return [w if i == 0 else f" {w}" for i, w in enumerate(words)]
+
+    def _get_token_usage(
+        self, messages: List[BaseMessage], completion_tokens: int
+    ) -> Dict[str, int]:
+        prompt_tokens = sum(_count_tokens(str(m.content)) for m in messages)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _get_generation_time(self, tokens: List[str]) -> float:
+        if self.tokens_per_second <= 0:
+            return self.latency_ms / 1000
+        return self.latency_ms / 1000 + len(tokens) / self.tokens_per_second
+
+    def _create_result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        token_usage = self._get_token_usage(messages, len(tokens))
+        message = AIMessage(
+            content="".join(tokens),
+            response_metadata={
+                "token_usage": token_usage,
+                "model_name": self.model_name,
+                "finish_reason": "stop",
+            },
+            usage_metadata={
+                "input_tokens": token_usage["prompt_tokens"],
+                "output_tokens": token_usage["completion_tokens"],
+                "total_tokens": token_usage["total_tokens"],
+            },
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": token_usage, "model_name": self.model_name},
+        )
+
+    def _create_usage_chunk(
+        self, messages: List[BaseMessage], tokens: List[str]
+    ) -> ChatGenerationChunk:
+        # like Azure OpenAI with `stream_usage`, the last chunk reports the token usage
+        token_usage = self._get_token_usage(messages, len(tokens))
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": token_usage["prompt_tokens"],
+                    "output_tokens": token_usage["completion_tokens"],
+                    "total_tokens": token_usage["total_tokens"],
+                },
+            )
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._get_tokens(messages)
+        time.sleep(self._get_generation_time(tokens))
+        return self._create_result(messages, tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self._get_tokens(messages)
+        await asyncio.sleep(self._get_generation_time(tokens))
+        return self._create_result(messages, tokens)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        tokens = self._get_tokens(messages)
+        for token in tokens:
+            if self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield self._create_usage_chunk(messages, tokens)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        tokens = self._get_tokens(messages)
+        for token in tokens:
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield self._create_usage_chunk(messages, tokens)
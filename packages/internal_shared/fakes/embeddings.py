@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# dimensions of the embedding models, other models default to 1536
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _stable_hash(value: str) -> int:
+    # the builtin hash is salted per process, thus it is not deterministic
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest())
+
+
+def fake_embedding(text: str, dimensions: int) -> np.ndarray:
+    """
+    Deterministic embedding of a text, derived from the hashes of its tokens (feature hashing).
+
+    Texts sharing tokens get similar vectors, thus searches on fake embeddings return plausible hits.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        value = _stable_hash(token)
+        vector[value % dimensions] += 1.0 if (value >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        # texts without tokens get a random, but deterministic direction
+        rng = np.random.default_rng(_stable_hash(text))
+        vector = rng.standard_normal(dimensions).astype(np.float32)
+        norm = np.linalg.norm(vector)
+    return vector / norm
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Offline stand-in for `AzureOpenAIEmbeddings`, which returns deterministic hash-derived embeddings after a configurable latency.
+    """
+
+    def __init__(self, model_name: str, latency_ms: float = 0.0):
+        self.model_name = model_name
+        self.dimensions = EMBEDDING_DIMENSIONS.get(model_name, 1536)
+        self.latency_ms = latency_ms
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        return [fake_embedding(text, self.dimensions).tolist() for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._embed(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
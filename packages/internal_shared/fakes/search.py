@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from .embeddings import fake_embedding
+
+_CORPUS_FILE = Path("data") / "functions" / "data.json"
+
+
+def _find_corpus() -> Path:
+    """
+    Find the local corpus, either from `FAKE_CORPUS_PATH` or `data/functions/data.json` in the repository.
+    """
+    if path := os.getenv("FAKE_CORPUS_PATH"):
+        return Path(path)
+    for directory in [Path.cwd(), *Path.cwd().parents, *Path(__file__).resolve().parents]:
+        if (directory / _CORPUS_FILE).exists():
+            return directory / _CORPUS_FILE
+    raise FileNotFoundError(
+        f"Could not find '{_CORPUS_FILE}', set FAKE_CORPUS_PATH to the corpus of the fake search"
+    )
+
+
+def _to_document(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a function of the corpus to a document, which provides the fields of all known indexes.
+    """
+    content = f"{entry['name']} {entry['description']} Example: {entry.get('example', '')}"
+    return {
+        **entry,
+        "summary": entry["description"],
+        "content": content,
+        "chunk": content,
+        "metadata": {
+            "function_name": entry["name"],
+            "category": entry.get("category"),
+            "source": entry.get("source"),
+        },
+    }
+
+
+class FakeSearchIndex:
+    """
+    In-memory vector index over a local corpus, using the fake embeddings of the documents.
+    """
+
+    def __init__(self, corpus_path: str | Path):
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            self.documents = [_to_document(entry) for entry in json.load(f)]
+        self._matrices: Dict[int, np.ndarray] = {}
+
+    def _get_matrix(self, dimensions: int) -> np.ndarray:
+        if dimensions not in self._matrices:
+            self._matrices[dimensions] = np.stack(
+                [fake_embedding(d["content"], dimensions) for d in self.documents]
+            )
+        return self._matrices[dimensions]
+
+    def search(self, vector: List[float], top_k: int) -> List[Tuple[int, float]]:
+        """
+        Returns the indices and cosine similarities of the `top_k` most similar documents.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        similarities = self._get_matrix(len(query)) @ (query / norm if norm else query)
+        top_k = min(top_k, len(similarities))
+        indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        indices = indices[np.argsort(-similarities[indices])]
+        return [(int(i), float(similarities[i])) for i in indices]
+
+
+@lru_cache(maxsize=1)
+def get_fake_search_index() -> FakeSearchIndex:
+    return FakeSearchIndex(_find_corpus())
+
+
+def _get_latency() -> float:
+    return float(os.getenv("FAKE_SEARCH_LATENCY_MS", 0.0)) / 1000
+
+
+class FakeSearchClient:
+    """
+    Offline stand-in for the Azure AI Search `SearchClient`, supporting vector queries.
+    """
+
+    def __init__(self, index_name: str | None = None, **kwargs: Any):
+        self.index_name = index_name
+        self.index = get_fake_search_index()
+
+    def _search(self, vector_queries: List[Any], select: List[str] | None) -> List[Dict]:
+        query = vector_queries[0]
+        results = []
+        for index, similarity in self.index.search(query.vector, query.k_nearest_neighbors):
+            document = self.index.documents[index]
+            if select:
+                document = {k: v for k, v in document.items() if k in select}
+            # Azure AI Search scores cosine similarities as 1 / (1 + cosine distance)
+            results.append({**document, "@search.score": 1 / (2 - similarity)})
+        return results
+
+    def search(self, vector_queries: List[Any], select: List[str] | None = None, **kwargs: Any):
+        time.sleep(_get_latency())
+        return self._search(vector_queries, select)
+
+    def close(self) -> None:
+        pass
+
+
+class _AsyncResults:
+    def __init__(self, results: List[Dict]):
+        self._results = results
+
+    async def __aiter__(self):
+        for result in self._results:
+            yield result
+
+
+class FakeAsyncSearchClient(FakeSearchClient):
+    """
+    Offline stand-in for the asynchronous Azure AI Search `SearchClient`.
+    """
+
+    async def search(self, vector_queries: List[Any], select: List[str] | None = None, **kwargs: Any):
+        await asyncio.sleep(_get_latency())
+        return _AsyncResults(self._search(vector_queries, select))
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class FakeGraphDatabase:
+    """
+    Offline stand-in for the neomodel `db`, answering the vector queries of the graph retrieval.
+
+    Every function references the next function of the same category.
+    """
+
+    def __init__(self):
+        self.index = get_fake_search_index()
+
+    def _get_related(self, index: int) -> str:
+        documents = self.index.documents
+        category = documents[index].get("category")
+        same_category = [d for d in documents if d.get("category") == category]
+        position = same_category.index(documents[index])
+        return same_category[(position + 1) % len(same_category)]["name"]
+
+    def cypher_query(self, query: str, params: Dict[str, Any]) -> Tuple[List[List[Any]], List[str]]:
+        time.sleep(_get_latency())
+        return self.answer(query, params)
+
+    def answer(self, query: str, params: Dict[str, Any]) -> Tuple[List[List[Any]], List[str]]:
+        rows = []
+        for index, similarity in self.index.search(
+            params["query_embedding"], params["num_neighbors"]
+        ):
+            # Neo4j scores cosine similarities as (1 + similarity) / 2
+            score = (1 + similarity) / 2
+            if score < params["threshold"]:
+                continue
+            document = self.index.documents[index]
+            rows.append(
+                [document["name"], document["summary"], self._get_related(index), score]
+            )
+        return rows, ["name", "summary", "related_name", "score"]
+
+
+class _FakeAsyncResult:
+    def __init__(self, records: List[Dict[str, Any]]):
+        self._records = records
+
+    async def data(self) -> List[Dict[str, Any]]:
+        return self._records
+
+    async def __aiter__(self):
+        for record in self._records:
+            yield record
+
+
+class _FakeAsyncTransaction:
+    def __init__(self, graph: FakeGraphDatabase):
+        self._graph = graph
+
+    async def run(self, query: str, parameters: Dict[str, Any] | None = None, **kwargs: Any):
+        await asyncio.sleep(_get_latency())
+        rows, keys = self._graph.answer(query, {**(parameters or {}), **kwargs})
+        return _FakeAsyncResult([dict(zip(keys, row)) for row in rows])
+
+
+class _FakeAsyncSession:
+    def __init__(self, graph: FakeGraphDatabase):
+        self._graph = graph
+
+    async def execute_read(self, fn, *args: Any, **kwargs: Any):
+        return await fn(_FakeAsyncTransaction(self._graph), *args, **kwargs)
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        pass
+
+
+class FakeAsyncGraphDriver:
+    """
+    Offline stand-in for the async Neo4j driver, supporting read transactions of the graph retrieval.
+    """
+
+    def __init__(self):
+        self._graph = FakeGraphDatabase()
+
+    def session(self, **kwargs: Any) -> _FakeAsyncSession:
+        return _FakeAsyncSession(self._graph)
+
+    async def close(self) -> None:
+        pass
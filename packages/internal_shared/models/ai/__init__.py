@@ -10,6 +10,8 @@ from .available_models import (
     EMBEDDING_3_LARGE,
     EMBEDDING_3_SMALL,
     available_models_to_model_metadata,
+    available_models_to_deployments,
+    get_embedding_dimensions,
     get_embedding_models,
     get_chat_models,
 )
@@ -26,6 +28,8 @@ __all__ = [
     "EMBEDDING_3_LARGE",
     "EMBEDDING_3_SMALL",
     "available_models_to_model_metadata",
+    "available_models_to_deployments",
+    "get_embedding_dimensions",
     "get_embedding_models",
     "get_chat_models",
 ]
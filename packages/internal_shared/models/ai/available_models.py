@@ -1,5 +1,8 @@
+import os
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
+from typing import List
 from internal_shared.utils.helper_functions import get_env_variable
 
 
@@ -95,6 +98,24 @@ __model_map = {
 }
 
 
+# output dimensions of the embedding models
+__embedding_dimensions = {
+    AvailableModels.EMBEDDING_3_LARGE: 3072,
+    AvailableModels.EMBEDDING_3_SMALL: 1536,
+    AvailableModels.EMBEDDING_2: 1536,
+}
+
+
+def get_embedding_dimensions(model: AvailableModels) -> int:
+    """
+    Get the dimensions of the embeddings of a given embedding model.
+    """
+    try:
+        return __embedding_dimensions[model]
+    except KeyError:
+        raise ValueError(f"Model {model} is not an embedding model")
+
+
 def available_models_to_model_metadata(model: AvailableModels) -> ModelMetadata:
     """
     Get the model metadata for a given available model.
@@ -103,3 +124,34 @@ def available_models_to_model_metadata(model: AvailableModels) -> ModelMetadata:
         return __model_map[model]
     except KeyError:
         raise ValueError(f"Model {model} is not supported")
+
+
+@lru_cache(maxsize=None)
+def available_models_to_deployments(model: AvailableModels) -> List[ModelMetadata]:
+    """
+    Get all deployments of a given available model. The first deployment is the primary one.
+
+    Additional deployments are configured with the `AZURE_OPENAI_US_DEPLOYMENTS` and `AZURE_OPENAI_SE_DEPLOYMENTS` environment variables, which contain a comma-separated list of models deployed in the respective region, e.g. `gpt-4o,text-embedding-3-large=embedding-large` (`<model>=<deployment name>`, if the deployment name differs).
+    """
+    primary = available_models_to_model_metadata(model)
+    deployments = [primary]
+    for is_us_server, variable in (
+        (True, "AZURE_OPENAI_US_DEPLOYMENTS"),
+        (False, "AZURE_OPENAI_SE_DEPLOYMENTS"),
+    ):
+        for entry in os.getenv(variable, "").split(","):
+            name, _, deployment_name = entry.strip().partition("=")
+            if name != model.value:
+                continue
+            deployment = ModelMetadata.create(
+                model_name=primary.model_name,
+                deployment_name=deployment_name or name,
+                is_us_server=is_us_server,
+            )
+            if all(
+                (d.endpoint, d.deployment_name)
+                != (deployment.endpoint, deployment.deployment_name)
+                for d in deployments
+            ):
+                deployments.append(deployment)
+    return deployments
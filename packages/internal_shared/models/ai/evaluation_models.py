@@ -1,7 +1,16 @@
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 from langchain_openai.chat_models.base import BaseChatOpenAI
 from deepeval.models.base_model import DeepEvalBaseLLM
+from internal_shared.cache.cached_embeddings import CachedEmbeddings
+from internal_shared.fakes import (
+    cache_namespace,
+    create_fake_chat_model,
+    create_fake_embeddings,
+    is_fake_llm_backend,
+)
 from internal_shared.models.ai import GPT_4O, GPT_35_TURBO, EMBEDDING_3_LARGE
+from internal_shared.rate_limit import deployment_key
+from internal_shared.rate_limit.adapters import RateLimitedEmbeddings, RequestRateLimiter
 
 # ref: https://docs.ragas.io/en/stable/howtos/customisations/azure-openai.html
 # ref: https://docs.confident-ai.com/docs/metrics-introduction#azure-openai-example
@@ -35,6 +44,9 @@ azure_model = AzureChatOpenAI(
     model=GPT_35_TURBO.model_name,
     api_key=GPT_35_TURBO.api_key,
     validate_base_url=False,
+    rate_limiter=RequestRateLimiter(
+        deployment_key(GPT_35_TURBO.endpoint, GPT_35_TURBO.deployment_name)
+    ),
 )
 
 critic_llm = AzureChatOpenAI(
@@ -44,14 +56,33 @@ critic_llm = AzureChatOpenAI(
     model=GPT_4O.model_name,
     api_key=GPT_4O.api_key,
     validate_base_url=False,
+    rate_limiter=RequestRateLimiter(
+        deployment_key(GPT_4O.endpoint, GPT_4O.deployment_name)
+    ),
 )
 
-azure_embeddings = AzureOpenAIEmbeddings(
-    openai_api_version=EMBEDDING_3_LARGE.api_version,
-    azure_endpoint=EMBEDDING_3_LARGE.endpoint,
-    azure_deployment=EMBEDDING_3_LARGE.deployment_name,
-    model=EMBEDDING_3_LARGE.model_name,
-    api_key=EMBEDDING_3_LARGE.api_key,
+# embeddings are shared with the RAG pipeline through the embedding cache
+azure_embeddings = CachedEmbeddings(
+    RateLimitedEmbeddings(
+        AzureOpenAIEmbeddings(
+            openai_api_version=EMBEDDING_3_LARGE.api_version,
+            azure_endpoint=EMBEDDING_3_LARGE.endpoint,
+            azure_deployment=EMBEDDING_3_LARGE.deployment_name,
+            model=EMBEDDING_3_LARGE.model_name,
+            api_key=EMBEDDING_3_LARGE.api_key,
+        ),
+        deployment_key(EMBEDDING_3_LARGE.endpoint, EMBEDDING_3_LARGE.deployment_name),
+    ),
+    model_name=EMBEDDING_3_LARGE.model_name,
 )
 
+# offline stand-ins, e.g. to load-test the evaluation without Azure quota
+if is_fake_llm_backend():
+    azure_model = create_fake_chat_model(GPT_35_TURBO.model_name)
+    critic_llm = create_fake_chat_model(GPT_4O.model_name)
+    azure_embeddings = CachedEmbeddings(
+        create_fake_embeddings(EMBEDDING_3_LARGE.model_name),
+        model_name=cache_namespace(EMBEDDING_3_LARGE.model_name),
+    )
+
 azure_openai = AzureOpenAI(model=azure_model, name=GPT_35_TURBO.model_name)
@@ -9,7 +9,7 @@ from pydantic import (
     model_validator,
 )
 from pydantic.functional_validators import BeforeValidator
-from internal_shared.models.ai import AvailableModels
+from internal_shared.models.ai import AvailableModels, get_embedding_dimensions
 
 DEFAULT_MODEL = AvailableModels.GPT_4O
 
@@ -31,6 +31,25 @@ class PreRetrievalType(str, Enum):
 class RetrieverType(str, Enum):
     VECTOR = "vector"
     GRAPH = "graph"
+    LOCAL = "local"
+    HYBRID = "hybrid"
+    FUNCTION_LOOKUP = "function_lookup"
+
+
+class LocalIndexEngine(str, Enum):
+    EXACT = "exact"
+    HNSW = "hnsw"
+
+
+class VectorQuantization(str, Enum):
+    NONE = "none"
+    INT8 = "int8"
+    PQ = "pq"
+
+
+class FusionMethod(str, Enum):
+    RRF = "rrf"
+    WEIGHTED = "weighted"
 
 
 class PostRetrievalType(str, Enum):
@@ -55,6 +74,54 @@ class TokenUsage(BaseModel):
     total_tokens: int
 
 
+class LocalIndexConfig(BaseModel):
+    """Configuration of an in-process vector index (retriever type LOCAL)."""
+
+    # directory of the index, defaults to `LOCAL_INDEX_DIR/<index_name>`
+    path: str | None = None
+    engine: LocalIndexEngine = LocalIndexEngine.EXACT
+    # HNSW parameters, see `retrieval/hnsw.py`
+    m: int = Field(default=16, ge=2)
+    ef_construction: int = Field(default=200, ge=1)
+    ef_search: int = Field(default=64, ge=1)
+    # compressed codes of the exact engine, see `retrieval/quantization.py`
+    quantization: VectorQuantization = VectorQuantization.NONE
+    # must divide the dimensions of the embeddings
+    pq_subvectors: int = Field(default=96, ge=1)
+    # candidates, which are rescored with the full-precision embeddings (0 = no rescoring)
+    rescore_candidates: int = Field(default=100, ge=0)
+    # two-stage search of the exact engine: a shortlist by the first dimensions is reranked with the full embeddings
+    prefix_dims: int | None = Field(default=None, ge=1)
+    shortlist_size: int = Field(default=100, ge=1)
+
+    @model_validator(mode="after")
+    def check_search_mode(self) -> Self:
+        # the engine searches either the HNSW graph, the quantized codes or the prefix shortlist
+        if self.engine == LocalIndexEngine.HNSW and (
+            self.quantization != VectorQuantization.NONE or self.prefix_dims
+        ):
+            raise ValueError(
+                "quantization and prefix_dims are only supported by the exact engine"
+            )
+        if self.quantization != VectorQuantization.NONE and self.prefix_dims:
+            raise ValueError("quantization and prefix_dims can not be combined")
+        return self
+
+
+class HybridConfig(BaseModel):
+    """Configuration of the fusion of lexical (BM25) and vector search (retriever type HYBRID)."""
+
+    fusion: FusionMethod = FusionMethod.RRF
+    # share of the lexical ranking, the vector ranking gets the rest
+    lexical_weight: float = Field(default=0.5, ge=0, le=1)
+    # constant of the reciprocal rank fusion
+    rrf_k: int = Field(default=60, ge=1)
+    # candidates of both rankings, which are fused
+    candidates: int = Field(default=50, ge=1)
+    # field of the documents, which is indexed for BM25
+    text_field: str = "text"
+
+
 class BaseRetrieverConfig(BaseModel):
     """Base configuration for a retriever."""
 
@@ -64,6 +131,8 @@ class BaseRetrieverConfig(BaseModel):
     embedding_model: AvailableModels = AvailableModels.EMBEDDING_3_LARGE
     retriever_select: List[str] | None = None
     field_mappings: Dict[str, str] | None = None
+    local_index: LocalIndexConfig | None = None
+    hybrid: HybridConfig | None = None
 
 
 class RetrieverConfig(BaseRetrieverConfig):
@@ -82,6 +151,17 @@ class RetrieverConfig(BaseRetrieverConfig):
                 raise ValueError(
                     "For VECTOR type, index_name, retriever_select and field_mappings are required"
                 )
+        if self.retriever_type in (RetrieverType.LOCAL, RetrieverType.HYBRID):
+            if not self.index_name or not self.field_mappings:
+                raise ValueError(
+                    "For LOCAL and HYBRID type, index_name and field_mappings are required"
+                )
+        if self.local_index and self.local_index.quantization == VectorQuantization.PQ:
+            dimensions = get_embedding_dimensions(self.embedding_model)
+            if dimensions % self.local_index.pq_subvectors:
+                raise ValueError(
+                    f"local_index.pq_subvectors must divide the {dimensions} dimensions of {self.embedding_model.value}"
+                )
         return self
 
     def to_dto(self):
@@ -107,6 +187,31 @@ class RetrieverConfigDTO(BaseRetrieverConfig):
     )
 
 
+class MultiQueryConfig(BaseModel):
+    """Configuration of the fan-out of several sub-queries of the pre-retrieval (e.g. REWRITE_RETRIEVE_READ)."""
+
+    # sub-queries, which are searched at most
+    max_queries: int = Field(default=5, ge=1)
+    # constant of the reciprocal rank fusion of the sub-query results
+    rrf_k: int = Field(default=60, ge=1)
+
+
+class SpeculativeConfig(BaseModel):
+    """Configuration of the speculative retrieval with the original query, while the LLM rewrites the query."""
+
+    # milliseconds, after which the rewrite is abandoned and only the speculative results are used
+    latency_budget_ms: float = Field(default=3000, gt=0)
+    # constant of the reciprocal rank fusion of the speculative and the rewritten results
+    rrf_k: int = Field(default=60, ge=1)
+
+
+class HydeConfig(BaseModel):
+    """Configuration of the HYDE pre-retrieval."""
+
+    # hypothetical documents, which are generated within a single completion; the retrieval uses the mean of their embeddings and the embedding of the query
+    hypotheses: int = Field(default=1, ge=1, le=10)
+
+
 class RetrievalConfig(BaseModel):
     """Configuration for a retrieval step."""
 
@@ -116,6 +221,11 @@ class RetrievalConfig(BaseModel):
     post_retrieval_type: PostRetrievalType
     top_k: int = 5
     threshold: float = 0.5
+    # searches every sub-query separately and fuses the results, unset searches the whole pre-retrieval text
+    multi_query: MultiQueryConfig | None = None
+    # searches the original query during the pre-retrieval, unset waits for the rewritten query
+    speculative: SpeculativeConfig | None = None
+    hyde: HydeConfig | None = None
 
 
 class ResponseBehavior(BaseModel):
@@ -128,6 +238,36 @@ class ResponseBehavior(BaseModel):
     pass
 
 
+class SubQueryResult(BaseModel):
+    """Retrieval of a single sub-query of a multi-query retrieval step."""
+
+    query: str
+    retrieval_duration: float
+    documents: int
+    retrieval_cache_hit: bool = False
+
+
+class HypothesisResult(BaseModel):
+    """A hypothetical document of the HYDE pre-retrieval and its token cost."""
+
+    text: str
+    # share of the prompt tokens of the completion, which generated all hypotheses
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class RetrievalStepPlan(BaseModel):
+    """Position of a retrieval step in the execution plan of its request."""
+
+    # steps of the same group share a single pre-retrieval (by pre-retrieval type)
+    pre_retrieval_group: int
+    # steps of the same group share a single embedding (by rewritten query and embedding model)
+    embedding_group: int | None = None
+    # whether the pre-retrieval or the embedding were executed by another step of the group
+    pre_retrieval_shared: bool = False
+    embedding_shared: bool = False
+
+
 class RetrievalStepResult(BaseModel):
     """A single step in the retrieval pipeline."""
 
@@ -135,10 +275,26 @@ class RetrievalStepResult(BaseModel):
     initial_query: str
     pre_retrieval: str
     pre_retrieval_duration: float
+    # whether the pre-retrieval was served from the rewrite cache
+    pre_retrieval_cache_hit: bool = False
     retrieval: List[SearchResult]
     retrieval_duration: float
     post_retrieval: List[SearchResult]
     post_retrieval_duration: float
+    # prompt tokens of the curated documents, which were skipped as irrelevant or duplicate
+    curated_tokens_saved: int = 0
+    # whether the retrieved documents were served from the retrieval cache
+    retrieval_cache_hit: bool = False
+    # sub-queries of a multi-query retrieval, whose results were fused into `retrieval`
+    sub_queries: List[SubQueryResult] = []
+    # documents of the speculative retrieval with the original query, which were merged into `retrieval`
+    speculative_retrieval: List[SearchResult] = []
+    # whether the rewrite exceeded the latency budget, thus `retrieval` contains the speculative results only
+    speculative_fallback: bool = False
+    # hypotheses of a multi-hypothesis HYDE pre-retrieval
+    hypotheses: List[HypothesisResult] = []
+    # unset for steps, which are not part of a request plan (e.g. of the agents)
+    plan: RetrievalStepPlan | None = None
 
 
 class BasePromptTemplate(BaseModel):
@@ -148,6 +304,9 @@ class BasePromptTemplate(BaseModel):
     template: str
     few_shot_key: str | None = None
     few_shot_value: str | None = None
+    # selects the k examples most similar to the request from the few-shot dataset, instead of `few_shot_value`
+    few_shot_top_k: int | None = None
+    few_shot_token_budget: int = 500
 
 
 class PromptTemplate(BasePromptTemplate):
@@ -256,10 +415,21 @@ __all__ = [
     "PreRetrievalType",
     "RetrieverType",
     "PostRetrievalType",
+    "LocalIndexEngine",
+    "VectorQuantization",
+    "FusionMethod",
     "SearchResult",
     "TokenUsage",
+    "LocalIndexConfig",
+    "HybridConfig",
+    "MultiQueryConfig",
+    "SpeculativeConfig",
+    "HydeConfig",
     "RetrievalConfig",
     "ResponseBehavior",
+    "SubQueryResult",
+    "HypothesisResult",
+    "RetrievalStepPlan",
     "RetrievalStepResult",
     "PromptTemplate",
     "PromptTemplateDTO",
@@ -0,0 +1,23 @@
+from .limiter import (
+    Priority,
+    RateLimit,
+    RateLimiter,
+    Reservation,
+    SharedBudget,
+    deployment_key,
+    get_priority,
+    get_rate_limiter,
+    priority,
+)
+
+__all__ = [
+    "Priority",
+    "RateLimit",
+    "RateLimiter",
+    "Reservation",
+    "SharedBudget",
+    "deployment_key",
+    "get_priority",
+    "get_rate_limiter",
+    "priority",
+]
@@ -0,0 +1,76 @@
+import os
+from typing import List
+import tiktoken
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import BaseRateLimiter
+from .limiter import RateLimiter, get_rate_limiter
+
+
+def _count_tokens(texts: List[str]) -> int:
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return sum(len(tokens) for tokens in encoding.encode_ordinary_batch(texts))
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Wraps a langchain embeddings client and reserves the rate limit budget of its deployment before each call.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, key: str, limiter: RateLimiter | None = None
+    ):
+        self.embeddings = embeddings
+        self.key = key
+        self.limiter = limiter or get_rate_limiter()
+
+    def _is_limited(self) -> bool:
+        # the token counting is skipped, if the deployment is not limited
+        return self.limiter.get_limit(self.key) is not None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._is_limited():
+            self.limiter.acquire_sync(self.key, _count_tokens(texts))
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if self._is_limited():
+            self.limiter.acquire_sync(self.key, _count_tokens([text]))
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._is_limited():
+            await self.limiter.acquire(self.key, _count_tokens(texts))
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self._is_limited():
+            await self.limiter.acquire(self.key, _count_tokens([text]))
+        return await self.embeddings.aembed_query(text)
+
+
+class RequestRateLimiter(BaseRateLimiter):
+    """
+    Adapter to use the shared rate limiter as `rate_limiter` of langchain chat models.
+
+    Langchain does not pass the prompt to the rate limiter, thus a fixed number of tokens (`LLM_RATE_LIMIT_DEFAULT_TOKENS`) is reserved per request.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        limiter: RateLimiter | None = None,
+        tokens_per_request: int | None = None,
+    ):
+        self.key = key
+        self.limiter = limiter or get_rate_limiter()
+        self.tokens_per_request = tokens_per_request or int(
+            os.getenv("LLM_RATE_LIMIT_DEFAULT_TOKENS", 1000)
+        )
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        self.limiter.acquire_sync(self.key, self.tokens_per_request)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        await self.limiter.acquire(self.key, self.tokens_per_request)
+        return True
@@ -0,0 +1,431 @@
+import asyncio
+import fcntl
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+from internal_shared.logger import get_logger
+from internal_shared.utils.helper_functions import get_cache_dir
+
+_logger = get_logger(__name__)
+
+# Azure OpenAI quotas are defined per minute
+_WINDOW_SECONDS = 60.0
+
+
+class Priority(IntEnum):
+    """
+    Priority of a rate limited call. Lower values are served first.
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+def _default_priority() -> Priority:
+    value = os.getenv("LLM_RATE_LIMIT_PRIORITY", "interactive").upper()
+    return Priority[value] if value in Priority.__members__ else Priority.INTERACTIVE
+
+
+_priority: ContextVar[Priority | None] = ContextVar("rate_limit_priority", default=None)
+
+
+def get_priority() -> Priority:
+    """
+    Get the priority of the current context. Defaults to `LLM_RATE_LIMIT_PRIORITY` of the process.
+    """
+    value = _priority.get()
+    return value if value is not None else _default_priority()
+
+
+@contextmanager
+def priority(value: Priority):
+    """
+    Context manager to run calls with the given priority, e.g. evaluation traffic in the background.
+    """
+    token = _priority.set(value)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Requests and tokens per minute of a deployment."""
+
+    rpm: int
+    tpm: int
+
+
+@dataclass
+class Reservation:
+    """Budget, which was reserved for a single call."""
+
+    key: str
+    id: str
+    tokens: int
+    waited_ms: float = 0.0
+
+
+@dataclass
+class RateLimiterStats:
+    """Statistics of the rate limiter per deployment."""
+
+    acquired: int = 0
+    waited: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    estimated_tokens: int = 0
+    actual_tokens: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": self.total_wait_ms / self.acquired if self.acquired else 0.0,
+            "max_wait_ms": self.max_wait_ms,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+        }
+
+
+def deployment_key(endpoint: str, deployment_name: str) -> str:
+    """
+    Key of a deployment, since the same deployment name can exist on several endpoints.
+    """
+    return f"{urlparse(endpoint).netloc or endpoint}/{deployment_name}"
+
+
+class SharedBudget:
+    """
+    Sliding one-minute window of the used requests and tokens per deployment.
+
+    The window is stored in a JSON file, which is guarded by an exclusive file lock. Thus, all processes using the same file (e.g. the RAG pipeline and the evaluation service) share the same budget. The file access blocks, thus async callers run it in a thread. The last seen window per deployment is kept in memory, which serves `cached_remaining` without any file access.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(self.path.suffix + ".lock")
+        self._lock = threading.Lock()
+        self._seen: Dict[str, List] = {}
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = json.loads(self.path.read_text())
+                except (FileNotFoundError, json.JSONDecodeError):
+                    state = {}
+                yield state
+                self.path.write_text(json.dumps(state))
+                self._seen.update({key: list(entries) for key, entries in state.items()})
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _prune(entries: List, now: float) -> List:
+        return [e for e in entries if e[0] > now - _WINDOW_SECONDS]
+
+    def try_acquire(
+        self, key: str, limit: RateLimit, tokens: int, share: float = 1.0
+    ) -> Tuple[str | None, float]:
+        """
+        Tries to reserve one request and the given tokens within `share` of the budget.
+
+        Returns the reservation ID, or `None` and the estimated time in seconds until enough budget is available.
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            entries = self._prune(state.get(key, []), now)
+            state[key] = entries
+            max_requests = max(1, int(limit.rpm * share))
+            max_tokens = max(1, int(limit.tpm * share))
+            used_tokens = sum(e[1] for e in entries)
+
+            # a single call, which is larger than the whole budget, is allowed on an empty window
+            fits_tokens = used_tokens + tokens <= max_tokens or not entries
+            if len(entries) < max_requests and fits_tokens:
+                reservation_id = uuid.uuid4().hex
+                entries.append([now, tokens, reservation_id])
+                return reservation_id, 0.0
+
+            wait = 0.0
+            if len(entries) >= max_requests:
+                wait = entries[len(entries) - max_requests][0] + _WINDOW_SECONDS - now
+            if not fits_tokens:
+                freed = 0
+                for entry in entries:
+                    freed += entry[1]
+                    if used_tokens - freed + tokens <= max_tokens:
+                        wait = max(wait, entry[0] + _WINDOW_SECONDS - now)
+                        break
+            return None, max(wait, 0.0)
+
+    def correct(self, key: str, reservation_id: str, tokens: int) -> None:
+        """
+        Replaces the estimated tokens of a reservation with the actual token usage.
+        """
+        with self._locked_state() as state:
+            for entry in state.get(key, []):
+                if entry[2] == reservation_id:
+                    entry[1] = tokens
+                    break
+
+    @staticmethod
+    def _remaining(entries: List, limit: RateLimit) -> Tuple[int, int]:
+        return (
+            max(limit.rpm - len(entries), 0),
+            max(limit.tpm - sum(e[1] for e in entries), 0),
+        )
+
+    def remaining(self, key: str, limit: RateLimit) -> Tuple[int, int]:
+        """
+        Remaining requests and tokens of the current window.
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            entries = self._prune(state.get(key, []), now)
+            state[key] = entries
+            return self._remaining(entries, limit)
+
+    def cached_remaining(self, key: str, limit: RateLimit) -> Tuple[int, int]:
+        """
+        Remaining requests and tokens of the window, which was last seen by this process. Does not access the file.
+        """
+        return self._remaining(self._prune(self._seen.get(key, []), time.time()), limit)
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    sequence: int
+    event: asyncio.Event | threading.Event = field(compare=False)
+    loop: asyncio.AbstractEventLoop | None = field(default=None, compare=False)
+
+
+class RateLimiter:
+    """
+    Client-side limiter for the requests and tokens per minute of Azure OpenAI deployments.
+
+    Waiting calls are queued per deployment and served by priority, then first-come-first-served. Background calls may only use `1 - interactive_reserve` of the budget, thus interactive calls are preferred across processes.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, RateLimit],
+        budget: SharedBudget,
+        interactive_reserve: float = 0.2,
+        max_wait_seconds: float = 1.0,
+    ):
+        self.limits = limits
+        self.budget = budget
+        self.interactive_reserve = interactive_reserve
+        self.max_wait_seconds = max_wait_seconds
+        self.stats: Dict[str, RateLimiterStats] = {}
+        self._queues: Dict[str, List[_Ticket]] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def get_limit(self, key: str) -> RateLimit | None:
+        """
+        Get the limit for a deployment key, either configured by the full key or by the deployment name.
+        """
+        return self.limits.get(key) or self.limits.get(key.split("/", 1)[-1])
+
+    def remaining(self, key: str, cached: bool = False) -> Tuple[int, int] | None:
+        """
+        Remaining requests and tokens of a deployment. With `cached`, the window last seen by this process is used, which avoids the file access, e.g. to rank deployments on every call.
+        """
+        limit = self.get_limit(key)
+        if limit is None:
+            return None
+        if cached:
+            return self.budget.cached_remaining(key, limit)
+        return self.budget.remaining(key, limit)
+
+    def _share(self, priority: Priority) -> float:
+        if priority == Priority.INTERACTIVE:
+            return 1.0
+        return 1.0 - self.interactive_reserve
+
+    def _enqueue(self, key: str, ticket: _Ticket) -> None:
+        with self._lock:
+            heapq.heappush(self._queues.setdefault(key, []), ticket)
+
+    def _is_head(self, key: str, ticket: _Ticket) -> bool:
+        with self._lock:
+            return self._queues[key][0] is ticket
+
+    def _dequeue(self, key: str, ticket: _Ticket) -> None:
+        with self._lock:
+            queue = self._queues[key]
+            queue.remove(ticket)
+            heapq.heapify(queue)
+            if queue:
+                # wake up the next caller in line
+                head = queue[0]
+                if head.loop is None:
+                    head.event.set()
+                elif not head.loop.is_closed():
+                    head.loop.call_soon_threadsafe(head.event.set)
+
+    def _record(self, key: str, tokens: int, waited_ms: float) -> None:
+        stats = self.stats.setdefault(key, RateLimiterStats())
+        stats.acquired += 1
+        stats.estimated_tokens += tokens
+        if waited_ms > 1:
+            stats.waited += 1
+        stats.total_wait_ms += waited_ms
+        stats.max_wait_ms = max(stats.max_wait_ms, waited_ms)
+
+    async def acquire(
+        self, key: str, tokens: int, priority: Priority | None = None
+    ) -> Reservation | None:
+        """
+        Waits until the deployment has enough budget for one request with the given tokens.
+
+        Returns `None`, if no limit is configured for the deployment.
+        """
+        limit = self.get_limit(key)
+        if limit is None:
+            return None
+
+        priority = priority if priority is not None else get_priority()
+        start = time.perf_counter()
+        event = asyncio.Event()
+        # the event may be set from other threads, thus the loop is required
+        ticket = _Ticket(
+            priority, next(self._sequence), event, asyncio.get_running_loop()
+        )
+        self._enqueue(key, ticket)
+        try:
+            while True:
+                if not self._is_head(key, ticket):
+                    await event.wait()
+                    event.clear()
+                    continue
+                # the file lock blocks, thus the event loop must not wait for it
+                reservation_id, wait = await asyncio.to_thread(
+                    self.budget.try_acquire, key, limit, tokens, self._share(priority)
+                )
+                if reservation_id is not None:
+                    break
+                await asyncio.sleep(min(wait, self.max_wait_seconds))
+        finally:
+            self._dequeue(key, ticket)
+
+        waited_ms = (time.perf_counter() - start) * 1000
+        self._record(key, tokens, waited_ms)
+        return Reservation(key, reservation_id, tokens, waited_ms)
+
+    def acquire_sync(
+        self, key: str, tokens: int, priority: Priority | None = None
+    ) -> Reservation | None:
+        """
+        Blocking variant of `acquire` for synchronous callers.
+        """
+        limit = self.get_limit(key)
+        if limit is None:
+            return None
+
+        priority = priority if priority is not None else get_priority()
+        start = time.perf_counter()
+        ticket = _Ticket(priority, next(self._sequence), threading.Event())
+        self._enqueue(key, ticket)
+        try:
+            while True:
+                if not self._is_head(key, ticket):
+                    ticket.event.wait(self.max_wait_seconds)
+                    ticket.event.clear()
+                    continue
+                reservation_id, wait = self.budget.try_acquire(
+                    key, limit, tokens, self._share(priority)
+                )
+                if reservation_id is not None:
+                    break
+                time.sleep(min(wait, self.max_wait_seconds))
+        finally:
+            self._dequeue(key, ticket)
+
+        waited_ms = (time.perf_counter() - start) * 1000
+        self._record(key, tokens, waited_ms)
+        return Reservation(key, reservation_id, tokens, waited_ms)
+
+    def _needs_correction(self, reservation: Reservation | None, actual_tokens: int) -> bool:
+        if reservation is None:
+            return False
+        self.stats.setdefault(reservation.key, RateLimiterStats()).actual_tokens += (
+            actual_tokens
+        )
+        return actual_tokens != reservation.tokens
+
+    def correct(self, reservation: Reservation | None, actual_tokens: int) -> None:
+        """
+        Corrects the estimated token usage of a reservation after the call finished.
+        """
+        if self._needs_correction(reservation, actual_tokens):
+            self.budget.correct(reservation.key, reservation.id, actual_tokens)
+
+    async def correct_async(
+        self, reservation: Reservation | None, actual_tokens: int
+    ) -> None:
+        """
+        Variant of `correct` for async callers, which accesses the budget file in a thread.
+        """
+        if self._needs_correction(reservation, actual_tokens):
+            await asyncio.to_thread(
+                self.budget.correct, reservation.key, reservation.id, actual_tokens
+            )
+
+    def get_stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for key, key_stats in self.stats.items():
+            remaining = self.remaining(key)
+            stats[key] = {
+                **key_stats.to_dict(),
+                "remaining_requests": remaining[0] if remaining else None,
+                "remaining_tokens": remaining[1] if remaining else None,
+            }
+        return stats
+
+
+def _parse_limits(value: str | None) -> Dict[str, RateLimit]:
+    if not value:
+        return {}
+    try:
+        return {
+            key: RateLimit(rpm=int(limit["rpm"]), tpm=int(limit["tpm"]))
+            for key, limit in json.loads(value).items()
+        }
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        _logger.error("Invalid LLM_RATE_LIMITS configuration", exc_info=True)
+        return {}
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the process-wide rate limiter, configured by the `LLM_RATE_LIMIT*` environment variables.
+
+    `LLM_RATE_LIMITS` is a JSON object, which maps deployment names (or `<endpoint host>/<deployment name>`) to their limits, e.g. `{"gpt-4o": {"rpm": 300, "tpm": 50000}}`. Deployments without a limit are not limited.
+    """
+    path = os.getenv("LLM_RATE_LIMIT_FILE") or get_cache_dir() / "rate_limits.json"
+    return RateLimiter(
+        limits=_parse_limits(os.getenv("LLM_RATE_LIMITS")),
+        budget=SharedBudget(path),
+        interactive_reserve=float(os.getenv("LLM_RATE_LIMIT_INTERACTIVE_RESERVE", 0.2)),
+    )
@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 
 
 def get_env_variable(var_name):
@@ -9,3 +10,14 @@ def get_env_variable(var_name):
     if value is None:
         raise EnvironmentError(f"Environment variable {var_name} is not set")
     return value
+
+
+def get_cache_dir(*parts: str) -> Path:
+    """
+    Get (and create) a local cache directory shared by all services.
+
+    The base directory can be configured with the `RAG_CACHE_DIR` environment variable.
+    """
+    path = Path(os.getenv("RAG_CACHE_DIR", "/tmp/rag-evaluation-cache"), *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -8,6 +8,7 @@ from pipeline.helper import (
     render_prompt,
 )
 from retrieval import RetrievalStep
+from retrieval.few_shot import format_few_shot_examples, get_few_shot_index
 from internal_shared.models.ai.available_models import AvailableModels
 from internal_shared.models.chat import (
     ChatResponse,
@@ -73,8 +74,26 @@ class FormulaChatAgent(ChatAgent):
     User: Create a formula, that writes the first designation of the vehicle groups of the truck of the current tour to a string separated by a semicolon.
     Assistant: ItemsToText([ITour.Truck.VehicleGroup], '[First]', '[Designation]', ';')"""
 
-    def __init__(self):
+    def __init__(self, few_shot_top_k: int = 3, few_shot_token_budget: int = 500):
         super().__init__(self.TEMPLATE)
+        self.few_shot_top_k = few_shot_top_k
+        self.few_shot_token_budget = few_shot_token_budget
+
+    async def get_examples(self, query: str) -> str:
+        """
+        The formula examples most similar to the query, the static examples if the few-shot dataset is not available.
+        """
+        try:
+            index = get_few_shot_index()
+        except FileNotFoundError:
+            return self.FEW_SHOT_EXAMPLES
+        examples = await index.select(
+            query,
+            self.few_shot_top_k,
+            self.few_shot_token_budget,
+            category="formula",
+        )
+        return format_few_shot_examples(examples) or self.FEW_SHOT_EXAMPLES
 
     async def execute_async(
         self,
@@ -89,7 +108,9 @@ class FormulaChatAgent(ChatAgent):
                 ("user", "{query}"),
             ]
         )
-        prompt = await chat_template.aformat_messages(context=context, query=query, examples=self.FEW_SHOT_EXAMPLES)
+        prompt = await chat_template.aformat_messages(
+            context=context, query=query, examples=await self.get_examples(query)
+        )
         res_time, response = await atime_wrapper(
             self.invoke_prompt_async, prompt, chat_model
         )
@@ -122,15 +143,27 @@ class KnowledgeAgent(ChatAgent):
         chat_id: str,
         chat_model: AvailableModels = AvailableModels.GPT_4O,
     ):
-        embed_time, embedded_query = await atime_wrapper(
-            embed_text_async, query, self.behaviour.retriever.embedding_model
+        embedded_query = None
+        if RetrievalStep.requires_embedding(self.behaviour):
+            embed_time, embedded_query = await atime_wrapper(
+                embed_text_async, query, self.behaviour.retriever.embedding_model
+            )
+            print(f"{self.name}: Embedding duration: {embed_time}")
+
+        retrieval_time, (documents, cache_hit) = await atime_wrapper(
+            RetrievalStep.execute_cached_async, self.behaviour, embedded_query, query
         )
-        print(f"{self.name}: Embedding duration: {embed_time}")
+        print(f"{self.name}: Retrieval duration: {retrieval_time}")
 
-        retrieval_time, documents = await atime_wrapper(
-            RetrievalStep.execute_async, self.behaviour, embedded_query
+        ctx = [doc.content for doc in documents]
+        curated = await RetrievalStep.select_curated_documents(
+            query,
+            embedded_query,
+            self.behaviour.retriever.embedding_model,
+            ctx,
+            [doc.name for doc in documents],
         )
-        print(f"{self.name}: Retrieval duration: {retrieval_time}")
+        ctx.extend(curated.documents)
 
         step = RetrievalStepResult(
             config=self.behaviour,
@@ -141,11 +174,11 @@ class KnowledgeAgent(ChatAgent):
             retrieval_duration=0,
             post_retrieval=documents,
             post_retrieval_duration=0,
+            curated_tokens_saved=curated.tokens_saved,
+            retrieval_cache_hit=cache_hit,
         )
 
         prompt_template = PromptTemplate.from_template(self.template)
-        ctx = [doc.content for doc in documents]
-        ctx.extend(RetrievalStep.get_curated_documents())
         context_str = "\n".join(ctx)
         prompt = await prompt_template.aformat_prompt(context=context_str, query=query)
 
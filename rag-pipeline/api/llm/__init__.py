@@ -1,13 +1,39 @@
+import os
+import time
 from functools import lru_cache
-from typing import List
-from langchain_core.language_models import LanguageModelInput
+from typing import Any, AsyncIterator, Dict, List, Tuple
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_openai.chat_models.base import BaseChatOpenAI
 from langchain_core.messages import BaseMessage
+import tiktoken
+from internal_shared.cache import get_embedding_cache, text_hash
+from internal_shared.cache.cached_embeddings import CachedEmbeddings
+from internal_shared.fakes import (
+    cache_namespace,
+    create_fake_chat_model,
+    create_fake_embeddings,
+    is_fake_llm_backend,
+)
+from internal_shared.rate_limit import Reservation, deployment_key, get_rate_limiter
+from internal_shared.rate_limit.adapters import RateLimitedEmbeddings
 from internal_shared.models.ai import (
     AvailableModels,
+    ModelMetadata,
+    available_models_to_deployments,
     available_models_to_model_metadata,
+    get_chat_models,
+    get_embedding_models,
+)
+from .batching import EmbeddingBatcher, create_batcher_from_env
+from .cache import (
+    SAMPLING_PARAMS,
+    build_cache_key,
+    create_response_cache_from_env,
+    prompt_to_messages,
 )
+from .hedging import HedgingPolicy, create_hedging_policy_from_env, is_hedging_enabled
+from .routing import DeploymentRouter, DeploymentState, RoutedEmbeddings
+from .singleflight import SingleFlight
 
 __all__ = [
     "invoke_prompt",
@@ -15,53 +41,332 @@ __all__ = [
     "invoke_streaming_prompt_async",
     "embed_text",
     "embed_text_async",
+    "embed_texts_async",
+    "get_llm_stats",
 ]
 
+_response_cache = create_response_cache_from_env()
+_prompt_flights = SingleFlight()
+_embedding_flights = SingleFlight()
+_rate_limiter = get_rate_limiter()
+
+# expected completion tokens, which are reserved in addition to the prompt tokens
+_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_RATE_LIMIT_COMPLETION_TOKENS", 500))
+
+
+def _client_retry_kwargs(deployment: ModelMetadata) -> Dict[str, Any]:
+    # with several deployments, failing over is faster than retrying the same deployment
+    deployments = [
+        d
+        for model in AvailableModels
+        if deployment in (d := available_models_to_deployments(model))
+    ]
+    if deployments and len(deployments[0]) > 1:
+        return {"max_retries": 0}
+    return {}
+
+
+@lru_cache(maxsize=None)
+def _get_router(model: AvailableModels) -> DeploymentRouter:
+    return DeploymentRouter(available_models_to_deployments(model), _rate_limiter)
+
+
+@lru_cache(maxsize=None)
+def _get_hedging_policy(model: AvailableModels, kind: str) -> HedgingPolicy:
+    """
+    Get the hedging policy of a model. Completions and first streamed chunks (`kind`) have separate latency distributions.
+    """
+    return create_hedging_policy_from_env()
+
+
+def _should_hedge(hedge: bool | None, ranked: List[DeploymentState]) -> bool:
+    # a hedge needs an alternate deployment
+    hedge = hedge if hedge is not None else is_hedging_enabled()
+    return hedge and len(ranked) > 1
+
+
+@lru_cache(maxsize=20)
+def _get_deployment_embedding_client(deployment: ModelMetadata) -> RateLimitedEmbeddings:
+    if is_fake_llm_backend():
+        client = create_fake_embeddings(deployment.model_name)
+    else:
+        client = AzureOpenAIEmbeddings(
+            azure_endpoint=deployment.endpoint,
+            model=deployment.model_name,
+            azure_deployment=deployment.deployment_name,
+            api_key=deployment.api_key,
+            api_version=deployment.api_version,
+            **_client_retry_kwargs(deployment),
+        )
+    return RateLimitedEmbeddings(
+        client,
+        deployment_key(deployment.endpoint, deployment.deployment_name),
+        _rate_limiter,
+    )
+
 
 @lru_cache(maxsize=10)
-def _get_embedding_client(model: AvailableModels) -> AzureOpenAIEmbeddings:
+def _get_embedding_client(model: AvailableModels) -> CachedEmbeddings:
     actual_model = available_models_to_model_metadata(model)
-    return AzureOpenAIEmbeddings(
-        azure_endpoint=actual_model.endpoint,
-        model=actual_model.model_name,
-        azure_deployment=actual_model.deployment_name,
-        api_key=actual_model.api_key,
-        api_version=actual_model.api_version,
+    routed_client = RoutedEmbeddings(
+        _get_router(model), _get_deployment_embedding_client
     )
+    return CachedEmbeddings(routed_client, cache_namespace(actual_model.model_name))
 
 
 @lru_cache(maxsize=10)
-def _get_client(model: AvailableModels) -> BaseChatOpenAI:
-    actual_model = available_models_to_model_metadata(model)
+def _get_embedding_batcher(model: AvailableModels) -> EmbeddingBatcher | None:
+    embedding_client = _get_embedding_client(model)
+
+    async def embed_and_cache(texts: List[str]) -> List[List[float]]:
+        # the cache was already checked by the callers
+        vectors = await embedding_client.embeddings.aembed_documents(texts)
+        await embedding_client.cache.set_many_async(
+            embedding_client.model_name, texts, vectors
+        )
+        return vectors
+
+    return create_batcher_from_env(embed_and_cache)
+
+
+@lru_cache(maxsize=20)
+def _get_deployment_client(deployment: ModelMetadata) -> BaseChatModel:
+    if is_fake_llm_backend():
+        return create_fake_chat_model(deployment.model_name)
     return AzureChatOpenAI(
-        azure_endpoint=actual_model.endpoint,
-        model=actual_model.model_name,
-        azure_deployment=actual_model.deployment_name,
-        api_key=actual_model.api_key,
-        api_version=actual_model.api_version,
+        azure_endpoint=deployment.endpoint,
+        model=deployment.model_name,
+        azure_deployment=deployment.deployment_name,
+        api_key=deployment.api_key,
+        api_version=deployment.api_version,
+        # the last chunk of a stream reports the token usage, which corrects the rate limit budget
+        stream_usage=True,
+        **_client_retry_kwargs(deployment),
     )
 
 
+def _get_client(model: AvailableModels) -> BaseChatModel:
+    """
+    Get the client of the primary deployment of a model.
+    """
+    return _get_deployment_client(available_models_to_model_metadata(model))
+
+
+def _get_cache_key(
+    client: BaseChatModel, model: AvailableModels, prompt: LanguageModelInput
+) -> str:
+    actual_model = available_models_to_model_metadata(model)
+    params = {
+        key: value
+        for key, value in client._default_params.items()
+        if key in SAMPLING_PARAMS
+    }
+    return build_cache_key(
+        cache_namespace(actual_model.model_name),
+        actual_model.deployment_name,
+        prompt,
+        params,
+    )
+
+
+@lru_cache(maxsize=10)
+def _get_encoding(model_name: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_rate_limit_key(deployment: ModelMetadata) -> str:
+    return deployment_key(deployment.endpoint, deployment.deployment_name)
+
+
+def _estimate_tokens(prompt: LanguageModelInput, model: AvailableModels) -> int:
+    """
+    Estimates the tokens of a call before sending it, in order to reserve the rate limit budget.
+    """
+    encoding = _get_encoding(model.value)
+    contents = [str(m.content) for m in prompt_to_messages(prompt)]
+    prompt_tokens = sum(len(t) for t in encoding.encode_ordinary_batch(contents))
+    return prompt_tokens + _EXPECTED_COMPLETION_TOKENS
+
+
+async def _acquire_budget(
+    prompt: LanguageModelInput, model: AvailableModels, deployment: ModelMetadata
+):
+    key = _get_rate_limit_key(deployment)
+    # the token estimation is skipped, if the deployment is not limited
+    if _rate_limiter.get_limit(key) is None:
+        return None
+    return await _rate_limiter.acquire(key, _estimate_tokens(prompt, model))
+
+
+def _acquire_budget_sync(
+    prompt: LanguageModelInput, model: AvailableModels, deployment: ModelMetadata
+):
+    key = _get_rate_limit_key(deployment)
+    if _rate_limiter.get_limit(key) is None:
+        return None
+    return _rate_limiter.acquire_sync(key, _estimate_tokens(prompt, model))
+
+
+def _get_actual_tokens(response: BaseMessage) -> int | None:
+    token_usage = response.response_metadata.get("token_usage") or {}
+    if (total_tokens := token_usage.get("total_tokens")) is not None:
+        return total_tokens
+    # streamed chunks only report the usage metadata
+    usage_metadata = getattr(response, "usage_metadata", None) or {}
+    return usage_metadata.get("total_tokens")
+
+
 def invoke_prompt(
-    prompt: LanguageModelInput, model: AvailableModels = AvailableModels.GPT_4O
+    prompt: LanguageModelInput,
+    model: AvailableModels = AvailableModels.GPT_4O,
+    use_cache: bool = True,
 ) -> BaseMessage:
     client = _get_client(model)
-    return client.invoke(prompt)
+    key = _get_cache_key(client, model, prompt)
+    use_cache = use_cache and _response_cache.enabled
+    if use_cache and (cached := _response_cache.get(key)) is not None:
+        return cached
+
+    def call_deployment(deployment: ModelMetadata) -> BaseMessage:
+        reservation = _acquire_budget_sync(prompt, model, deployment)
+        response = _get_deployment_client(deployment).invoke(prompt)
+        if (actual_tokens := _get_actual_tokens(response)) is not None:
+            _rate_limiter.correct(reservation, actual_tokens)
+        return response
+
+    start = time.perf_counter()
+    response = _get_router(model).call_sync(call_deployment)
+    if use_cache:
+        _response_cache.set(key, response, (time.perf_counter() - start) * 1000)
+    return response
 
 
 async def invoke_prompt_async(
-    prompt: LanguageModelInput, model: AvailableModels = AvailableModels.GPT_4O
+    prompt: LanguageModelInput,
+    model: AvailableModels = AvailableModels.GPT_4O,
+    use_cache: bool = True,
+    hedge: bool | None = None,
 ) -> BaseMessage:
+    """
+    Invokes the prompt asynchronously. With `hedge` (default: `LLM_HEDGING_ENABLED`), slow calls are duplicated to an alternate deployment.
+    """
     client = _get_client(model)
-    return await client.ainvoke(prompt)
+    key = _get_cache_key(client, model, prompt)
+    # callers, which opt out of the cache, ask for a fresh completion and are not coalesced either
+    coalesce = use_cache
+    use_cache = use_cache and _response_cache.enabled
+    # the SQLite tier of the cache is accessed in a thread
+    if use_cache and (cached := await _response_cache.get_async(key)) is not None:
+        return cached
+
+    async def call_deployment(deployment: ModelMetadata) -> BaseMessage:
+        reservation = await _acquire_budget(prompt, model, deployment)
+        response = await _get_deployment_client(deployment).ainvoke(prompt)
+        if (actual_tokens := _get_actual_tokens(response)) is not None:
+            await _rate_limiter.correct_async(reservation, actual_tokens)
+        return response
+
+    async def call() -> BaseMessage:
+        start = time.perf_counter()
+        router = _get_router(model)
+        ranked = router.ranked()
+        if _should_hedge(hedge, ranked):
+            # the primary and the hedge use disjoint deployments, the hedge is the fail-over of the primary as well
+            response = await _get_hedging_policy(model, "completion").run(
+                lambda: router.call(call_deployment, ranked[:1]),
+                lambda: router.call(call_deployment, ranked[1:]),
+                fail_over=router.should_fail_over,
+            )
+        else:
+            response = await router.call(call_deployment, ranked)
+        if use_cache:
+            await _response_cache.set_async(
+                key, response, (time.perf_counter() - start) * 1000
+            )
+        return response
+
+    if not coalesce:
+        return await call()
+    # concurrent identical prompts share a single call
+    return await _prompt_flights.do(key, call)
+
+
+async def _open_stream(
+    prompt: LanguageModelInput,
+    model: AvailableModels,
+    ranked: List[DeploymentState],
+) -> Tuple[
+    BaseMessage | None, AsyncIterator[BaseMessage] | None, Reservation | None
+]:
+    """
+    Opens a stream on the best of the `ranked` deployments and waits for its first chunk.
+
+    Failing over is only possible until the first chunk was received. Returns `(None, None, reservation)` for an empty stream.
+    """
+    router = _get_router(model)
+    for index, state in enumerate(ranked):
+        reservation = await _acquire_budget(prompt, model, state.deployment)
+        stream = _get_deployment_client(state.deployment).astream(prompt)
+        try:
+            first_chunk = await anext(stream)
+        except StopAsyncIteration:
+            router.record_success(state, None)
+            return None, None, reservation
+        except Exception as e:
+            await stream.aclose()
+            if not router.should_fail_over(e):
+                raise
+            router.record_failure(state, e)
+            if index == len(ranked) - 1:
+                raise
+            continue
+        except BaseException:
+            # e.g. a cancelled hedge
+            await stream.aclose()
+            raise
+        # the latency EWMA tracks complete calls, thus the time to the first chunk is not recorded
+        router.record_success(state, None)
+        return first_chunk, stream, reservation
 
 
 async def invoke_streaming_prompt_async(
-    prompt: LanguageModelInput, model: AvailableModels = AvailableModels.GPT_4O
+    prompt: LanguageModelInput,
+    model: AvailableModels = AvailableModels.GPT_4O,
+    hedge: bool | None = None,
 ):
-    client = _get_client(model)
-    async for chunk in client.astream(prompt):
+    """
+    Streams the response of the prompt. With `hedge` (default: `LLM_HEDGING_ENABLED`), a slow first chunk is hedged on an alternate deployment.
+    """
+    ranked = _get_router(model).ranked()
+    if _should_hedge(hedge, ranked):
+
+        async def close(
+            opened: Tuple[BaseMessage | None, AsyncIterator | None, Reservation | None]
+        ):
+            if opened[1] is not None:
+                await opened[1].aclose()
+
+        first_chunk, stream, reservation = await _get_hedging_policy(model, "first_chunk").run(
+            lambda: _open_stream(prompt, model, ranked[:1]),
+            lambda: _open_stream(prompt, model, ranked[1:]),
+            discard=close,
+            fail_over=_get_router(model).should_fail_over,
+        )
+    else:
+        first_chunk, stream, reservation = await _open_stream(prompt, model, ranked)
+
+    if stream is None:
+        return
+    actual_tokens = _get_actual_tokens(first_chunk)
+    yield first_chunk
+    async for chunk in stream:
+        actual_tokens = _get_actual_tokens(chunk) or actual_tokens
         yield chunk
+    if actual_tokens is not None:
+        await _rate_limiter.correct_async(reservation, actual_tokens)
 
 
 def embed_text(
@@ -77,4 +382,55 @@ async def embed_text_async(
     model: AvailableModels = AvailableModels.EMBEDDING_3_LARGE,
 ) -> List[float]:
     embedding_client = _get_embedding_client(model)
-    return await embedding_client.aembed_query(text)
+    batcher = _get_embedding_batcher(model)
+    key = f"{model.value}:{text_hash(text)}"
+    if batcher is None:
+        return await _embedding_flights.do(
+            key, lambda: embedding_client.aembed_query(text)
+        )
+
+    # cache hits should not wait for the batching window
+    cached = (
+        await embedding_client.cache.get_many_async(embedding_client.model_name, [text])
+    )[0]
+    if cached is not None:
+        return cached
+    return await _embedding_flights.do(key, lambda: batcher.embed(text))
+
+
+async def embed_texts_async(
+    texts: List[str],
+    model: AvailableModels = AvailableModels.EMBEDDING_3_LARGE,
+) -> List[List[float]]:
+    """
+    Embeds multiple texts within a single request.
+    """
+    embedding_client = _get_embedding_client(model)
+    return await embedding_client.aembed_documents(texts)
+
+
+def get_llm_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the LLM layer, e.g. cache hits and misses.
+    """
+    return {
+        "response_cache": _response_cache.stats.to_dict(),
+        "embedding_cache": get_embedding_cache().stats.to_dict(),
+        "prompt_single_flight": _prompt_flights.stats.to_dict(),
+        "embedding_single_flight": _embedding_flights.stats.to_dict(),
+        "rate_limits": _rate_limiter.get_stats(),
+        "deployments": {
+            model.value: _get_router(model).get_stats()
+            for model in [*get_chat_models(), *get_embedding_models()]
+        },
+        "hedging": {
+            f"{model.value}:{kind}": _get_hedging_policy(model, kind).stats.to_dict()
+            for model in get_chat_models()
+            for kind in ("completion", "first_chunk")
+        },
+        "embedding_batching": {
+            model.value: batcher.stats.to_dict()
+            for model in get_embedding_models()
+            if (batcher := _get_embedding_batcher(model)) is not None
+        },
+    }
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# upper bounds of the batch size histogram buckets
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+@dataclass
+class BatchStats:
+    """Statistics of a micro-batcher, i.e. the batch sizes and the added queueing delay."""
+
+    batches: int = 0
+    items: int = 0
+    total_queue_delay_ms: float = 0.0
+    max_queue_delay_ms: float = 0.0
+    batch_size_histogram: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, batch_size: int, queue_delays_ms: List[float]) -> None:
+        self.batches += 1
+        self.items += batch_size
+        self.total_queue_delay_ms += sum(queue_delays_ms)
+        self.max_queue_delay_ms = max(self.max_queue_delay_ms, *queue_delays_ms)
+        bucket = next(
+            (f"<={b}" for b in _BATCH_SIZE_BUCKETS if batch_size <= b),
+            f">{_BATCH_SIZE_BUCKETS[-1]}",
+        )
+        self.batch_size_histogram[bucket] = self.batch_size_histogram.get(bucket, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_queue_delay_ms": (
+                self.total_queue_delay_ms / self.items if self.items else 0.0
+            ),
+            "max_queue_delay_ms": self.max_queue_delay_ms,
+            "batch_size_histogram": dict(self.batch_size_histogram),
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding calls into batched calls.
+
+    Texts are collected until either `window_ms` elapsed since the first pending text or `max_batch_size` texts are pending. Then, all of them are sent in one call to `embed_fn` (e.g. `aembed_documents`) and the vectors are fanned out to the awaiting callers.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+        window_ms: float = 5.0,
+        max_batch_size: int = 64,
+    ):
+        self.embed_fn = embed_fn
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.stats = BatchStats()
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # pending work of a previous event loop can not be awaited anymore
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            # keep a reference, otherwise the task could be garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        start = time.perf_counter()
+        self.stats.record(len(batch), [(start - t) * 1000 for _, _, t in batch])
+
+        # identical texts within the same batch are only embedded once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            vectors = await self.embed_fn(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+
+def create_batcher_from_env(
+    embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]]
+) -> EmbeddingBatcher | None:
+    """
+    Creates an embedding batcher based on the `EMBEDDING_BATCH_*` environment variables.
+
+    Returns `None`, if batching is disabled.
+    """
+    if os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() != "true":
+        return None
+    return EmbeddingBatcher(
+        embed_fn,
+        window_ms=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5.0)),
+        max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 64)),
+    )
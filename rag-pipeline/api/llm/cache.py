@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    convert_to_messages,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.prompt_values import PromptValue
+from internal_shared.logger import get_logger
+from internal_shared.utils.helper_functions import get_cache_dir
+
+_logger = get_logger(__name__)
+
+V = TypeVar("V")
+
+# sampling parameters of the chat client, which influence the generated response
+SAMPLING_PARAMS = ("temperature", "top_p", "n", "max_tokens", "seed", "stop")
+
+
+class LRUCache(Generic[V]):
+    """
+    Thread-safe in-memory LRU cache with a time-to-live per entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float | None, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: V, ttl: float | None = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCache:
+    """
+    Persistent key-value cache backed by SQLite.
+
+    Values are stored as JSON strings. Entries expire after their TTL and the least recently used entries are evicted, as soon as the table grows beyond `max_entries`. SQLite handles concurrent access, thus the same file can be shared between processes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        table: str = "cache",
+        max_entries: int = 100_000,
+        ttl: float | None = None,
+    ):
+        self.path = str(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_last_access ON {self.table} (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (now,),
+        )
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters of a response cache, including the saved latency and tokens."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    saved_latency_ms: float = 0.0
+    saved_prompt_tokens: int = 0
+    saved_completion_tokens: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hits": self.hits, "hit_rate": self.hit_rate}
+
+
+def prompt_to_messages(prompt: LanguageModelInput) -> List[BaseMessage]:
+    """
+    Converts all supported prompt inputs (string, prompt value, message list) to a list of messages.
+    """
+    if isinstance(prompt, PromptValue):
+        return prompt.to_messages()
+    if isinstance(prompt, str):
+        return [HumanMessage(content=prompt)]
+    return convert_to_messages(prompt)
+
+
+def build_cache_key(
+    model_name: str,
+    deployment_name: str,
+    prompt: LanguageModelInput,
+    params: Dict[str, Any] | None = None,
+) -> str:
+    """
+    Builds a stable hash for the given model, deployment, rendered messages and sampling parameters.
+    """
+    payload = {
+        "model": model_name,
+        "deployment": deployment_name,
+        "messages": [(m.type, m.content) for m in prompt_to_messages(prompt)],
+        "params": params or {},
+    }
+    serialized = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache for LLM responses with an in-memory LRU tier and a persistent SQLite tier.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        memory_entries: int = 1024,
+        disk_entries: int = 100_000,
+        ttl: float | None = 24 * 60 * 60,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.stats = CacheStats()
+        self._memory: LRUCache[Dict[str, Any]] = LRUCache(memory_entries, ttl)
+        self._disk: SqliteCache | None = None
+        try:
+            self._disk = SqliteCache(path, "llm_responses", disk_entries, ttl)
+        except sqlite3.Error:
+            _logger.warning(
+                f"Could not open LLM cache at '{path}'. Using in-memory cache only.",
+                exc_info=True,
+            )
+
+    def get(self, key: str) -> Optional[BaseMessage]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            return self._hit(entry, from_disk=False)
+        if self._disk is not None and (entry := self._disk.get(key)) is not None:
+            self._memory.set(key, entry)
+            return self._hit(entry, from_disk=True)
+        self.stats.misses += 1
+        return None
+
+    async def get_async(self, key: str) -> Optional[BaseMessage]:
+        """
+        Variant of `get` for async callers, only the SQLite tier is read in a thread.
+        """
+        entry = self._memory.get(key)
+        if entry is not None:
+            return self._hit(entry, from_disk=False)
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None:
+                self._memory.set(key, entry)
+                return self._hit(entry, from_disk=True)
+        self.stats.misses += 1
+        return None
+
+    def _hit(self, entry: Dict[str, Any], from_disk: bool) -> BaseMessage:
+        if from_disk:
+            self.stats.disk_hits += 1
+        else:
+            self.stats.memory_hits += 1
+        message = messages_from_dict([entry["message"]])[0]
+        self.stats.saved_latency_ms += entry.get("latency_ms", 0.0)
+        token_usage = message.response_metadata.get("token_usage") or {}
+        self.stats.saved_prompt_tokens += token_usage.get("prompt_tokens", 0)
+        self.stats.saved_completion_tokens += token_usage.get("completion_tokens", 0)
+        return message
+
+    def set(self, key: str, message: BaseMessage, latency_ms: float) -> None:
+        entry = self._set_memory(key, message, latency_ms)
+        self._set_disk(key, entry)
+
+    async def set_async(self, key: str, message: BaseMessage, latency_ms: float) -> None:
+        """
+        Variant of `set` for async callers, only the SQLite tier is written in a thread.
+        """
+        entry = self._set_memory(key, message, latency_ms)
+        if self._disk is not None:
+            await asyncio.to_thread(self._set_disk, key, entry)
+
+    def _set_memory(
+        self, key: str, message: BaseMessage, latency_ms: float
+    ) -> Dict[str, Any]:
+        entry = {"message": message_to_dict(message), "latency_ms": latency_ms}
+        self._memory.set(key, entry)
+        return entry
+
+    def _set_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if self._disk is not None:
+            try:
+                self._disk.set(key, entry)
+            except sqlite3.Error:
+                _logger.warning("Could not write to LLM cache", exc_info=True)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+        self.stats = CacheStats()
+
+
+def create_response_cache_from_env() -> LLMResponseCache:
+    """
+    Creates the LLM response cache based on the `LLM_CACHE_*` environment variables.
+    """
+    ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 60 * 60))
+    return LLMResponseCache(
+        path=os.getenv("LLM_CACHE_PATH") or get_cache_dir() / "llm_cache.sqlite",
+        memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 1024)),
+        disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", 100_000)),
+        ttl=ttl if ttl > 0 else None,
+        enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true",
+    )
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+R = TypeVar("R")
+
+
+@dataclass
+class HedgingStats:
+    """Statistics of a hedging policy, i.e. how often hedges were sent and how often they won."""
+
+    requests: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    skipped_by_budget: int = 0
+    fail_overs: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "hedge_win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+        }
+
+
+class HedgingPolicy:
+    """
+    Sends a duplicate (hedge) of a slow call to an alternate deployment and uses whichever answers first.
+
+    The hedge is sent, if the call did not finish after the configured percentile of the recently observed latencies. To limit the additional token spend, every request earns `budget` hedge credits and every hedge costs one credit, i.e. at most `budget` of all requests are hedged.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        window: int = 500,
+        max_credits: float = 10.0,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_credits = max_credits
+        self.stats = HedgingStats()
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._credits = 0.0
+
+    def delay_ms(self) -> float | None:
+        """
+        Delay after which a hedge is sent, `None` if not enough latencies were observed yet.
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+        return ordered[index]
+
+    def _try_spend(self) -> bool:
+        if self._credits < 1.0:
+            self.stats.skipped_by_budget += 1
+            return False
+        self._credits -= 1.0
+        return True
+
+    async def run(
+        self,
+        primary: Callable[[], Awaitable[R]],
+        alternate: Callable[[], Awaitable[R]],
+        discard: Callable[[R], Awaitable[Any]] | None = None,
+        fail_over: Callable[[BaseException], bool] | None = None,
+    ) -> R:
+        """
+        Runs `primary` and sends `alternate` as a hedge, if `primary` is slow. The loser is cancelled.
+
+        `discard` is called with the result of a loser, which finished anyway (e.g. to close a stream). If `primary` fails before the hedge was sent and `fail_over` accepts its error, `alternate` is run instead, thus `primary` and `alternate` can use disjoint deployments.
+        """
+        self.stats.requests += 1
+        self._credits = min(self._credits + self.budget, self.max_credits)
+        start = time.perf_counter()
+        delay = self.delay_ms()
+
+        primary_task = asyncio.ensure_future(primary())
+        tasks = {primary_task}
+        alternate_sent = False
+        failed_over = False
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay / 1000)
+                if not done and self._try_spend():
+                    self.stats.hedges += 1
+                    alternate_sent = True
+                    tasks.add(asyncio.ensure_future(alternate()))
+
+            while True:
+                done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = next((t for t in done if not t.exception()), None)
+                if (
+                    winner is None
+                    and not alternate_sent
+                    and fail_over is not None
+                    and fail_over(primary_task.exception())
+                ):
+                    self.stats.fail_overs += 1
+                    alternate_sent = failed_over = True
+                    tasks = {asyncio.ensure_future(alternate())}
+                    continue
+                if winner is not None or not pending:
+                    break
+                # the first finished call failed, thus wait for the other one
+                tasks = pending
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if winner is None:
+            # all calls failed, raise the error of the primary call (if it failed)
+            failed = primary_task if primary_task in done else next(iter(done))
+            raise failed.exception()
+
+        for task in done:
+            if task is not winner and discard is not None and not task.exception():
+                await discard(task.result())
+
+        if winner is not primary_task and not failed_over:
+            self.stats.hedge_wins += 1
+        self._latencies.append((time.perf_counter() - start) * 1000)
+        return winner.result()
+
+
+def create_hedging_policy_from_env() -> HedgingPolicy:
+    """
+    Creates a hedging policy based on the `LLM_HEDGING_*` environment variables.
+    """
+    return HedgingPolicy(
+        percentile=float(os.getenv("LLM_HEDGING_PERCENTILE", 95.0)),
+        budget=float(os.getenv("LLM_HEDGING_BUDGET", 0.1)),
+        min_samples=int(os.getenv("LLM_HEDGING_MIN_SAMPLES", 20)),
+    )
+
+
+def is_hedging_enabled() -> bool:
+    return os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
@@ -0,0 +1,191 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+from langchain_core.embeddings import Embeddings
+from openai import BadRequestError, RateLimitError
+from internal_shared.logger import get_logger
+from internal_shared.models.ai import ModelMetadata
+from internal_shared.rate_limit import RateLimiter, deployment_key
+
+_logger = get_logger(__name__)
+
+R = TypeVar("R")
+
+
+@dataclass
+class DeploymentState:
+    """Observed latency and health of a single deployment."""
+
+    deployment: ModelMetadata
+    latency_ewma_ms: float | None = None
+    requests: int = 0
+    failures: int = 0
+    rate_limited: int = 0
+    cooldown_until: float = 0.0
+
+    @property
+    def key(self) -> str:
+        return deployment_key(self.deployment.endpoint, self.deployment.deployment_name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.deployment.endpoint,
+            "deployment_name": self.deployment.deployment_name,
+            "latency_ewma_ms": self.latency_ewma_ms,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+class DeploymentRouter:
+    """
+    Routes the calls of a model to the deployment with the lowest recent latency and the most remaining rate limit budget.
+
+    The latency is tracked as an exponentially weighted moving average per deployment. If a call fails (e.g. with a 429), the deployment cools down for a while and the call is retried on the next deployment.
+    """
+
+    def __init__(
+        self,
+        deployments: List[ModelMetadata],
+        rate_limiter: RateLimiter | None = None,
+        alpha: float = 0.2,
+        cooldown_seconds: float = 30.0,
+    ):
+        self.states = [DeploymentState(d) for d in deployments]
+        self.rate_limiter = rate_limiter
+        self.alpha = alpha
+        self.cooldown_seconds = cooldown_seconds
+
+    def _budget_share(self, state: DeploymentState) -> float:
+        """
+        Remaining share of the rate limit budget, 1.0 if the deployment is not limited.
+        """
+        if self.rate_limiter is None:
+            return 1.0
+        limit = self.rate_limiter.get_limit(state.key)
+        # the last seen window, since reading the shared budget file blocks
+        remaining = self.rate_limiter.remaining(state.key, cached=True)
+        if limit is None or remaining is None:
+            return 1.0
+        return min(remaining[0] / limit.rpm, remaining[1] / limit.tpm)
+
+    def _score(self, state: DeploymentState) -> float:
+        # deployments without observed latency are preferred, thus every deployment gets measured
+        if state.latency_ewma_ms is None:
+            return 0.0
+        return state.latency_ewma_ms / max(self._budget_share(state), 0.05)
+
+    def ranked(self) -> List[DeploymentState]:
+        """
+        Deployments ordered by their score. Deployments in cooldown are only used as a last resort.
+        """
+        if len(self.states) == 1:
+            return self.states
+        now = time.monotonic()
+        return sorted(
+            self.states, key=lambda s: (s.cooldown_until > now, self._score(s))
+        )
+
+    def record_success(self, state: DeploymentState, latency_ms: float | None) -> None:
+        state.requests += 1
+        state.cooldown_until = 0.0
+        if latency_ms is None:
+            return
+        if state.latency_ewma_ms is None:
+            state.latency_ewma_ms = latency_ms
+        else:
+            state.latency_ewma_ms = (
+                self.alpha * latency_ms + (1 - self.alpha) * state.latency_ewma_ms
+            )
+
+    def record_failure(self, state: DeploymentState, error: Exception) -> None:
+        state.requests += 1
+        state.failures += 1
+        if isinstance(error, RateLimitError):
+            state.rate_limited += 1
+        state.cooldown_until = time.monotonic() + self.cooldown_seconds
+        _logger.warning(
+            f"Call to deployment '{state.key}' failed, trying the next deployment: {error}"
+        )
+
+    @staticmethod
+    def should_fail_over(error: Exception) -> bool:
+        # invalid requests fail on every deployment
+        return not isinstance(error, BadRequestError)
+
+    async def call(
+        self,
+        fn: Callable[[ModelMetadata], Awaitable[R]],
+        ranked: List[DeploymentState] | None = None,
+    ) -> R:
+        """
+        Calls `fn` with the best deployment and fails over to the next deployment on errors.
+
+        `ranked` restricts the call to the given deployments (e.g. to send a hedge to another deployment).
+        """
+        ranked = ranked if ranked is not None else self.ranked()
+        for index, state in enumerate(ranked):
+            start = time.perf_counter()
+            try:
+                result = await fn(state.deployment)
+            except Exception as e:
+                if not self.should_fail_over(e):
+                    raise
+                self.record_failure(state, e)
+                if index == len(ranked) - 1:
+                    raise
+                continue
+            self.record_success(state, (time.perf_counter() - start) * 1000)
+            return result
+
+    def call_sync(self, fn: Callable[[ModelMetadata], R]) -> R:
+        """
+        Synchronous variant of `call`.
+        """
+        ranked = self.ranked()
+        for index, state in enumerate(ranked):
+            start = time.perf_counter()
+            try:
+                result = fn(state.deployment)
+            except Exception as e:
+                if not self.should_fail_over(e):
+                    raise
+                self.record_failure(state, e)
+                if index == len(ranked) - 1:
+                    raise
+                continue
+            self.record_success(state, (time.perf_counter() - start) * 1000)
+            return result
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [state.to_dict() for state in self.states]
+
+
+class RoutedEmbeddings(Embeddings):
+    """
+    Embeddings client, which routes every call through a `DeploymentRouter`.
+    """
+
+    def __init__(
+        self,
+        router: DeploymentRouter,
+        get_client: Callable[[ModelMetadata], Embeddings],
+    ):
+        self.router = router
+        self.get_client = get_client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.router.call_sync(lambda d: self.get_client(d).embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.router.call_sync(lambda d: self.get_client(d).embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.router.call(
+            lambda d: self.get_client(d).aembed_documents(texts)
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.router.call(lambda d: self.get_client(d).aembed_query(text))
@@ -0,0 +1,51 @@
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+R = TypeVar("R")
+
+
+@dataclass
+class SingleFlightStats:
+    """Number of calls and how many of them were coalesced with an identical in-flight call."""
+
+    calls: int = 0
+    coalesced: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls.
+
+    The first caller of a key starts the call, all further callers with the same key await the same in-flight task instead of issuing their own call. As soon as the task is done, the key is released again.
+    """
+
+    def __init__(self):
+        self.stats = SingleFlightStats()
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[R]]) -> R:
+        self.stats.calls += 1
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.stats.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+
+        # a cancelled caller must not cancel the call for all other callers
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # avoid "exception was never retrieved" warnings, if all callers were cancelled
+        if not task.cancelled():
+            task.exception()
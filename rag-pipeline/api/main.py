@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from datetime import datetime, UTC
 import os
 from bson import ObjectId
@@ -12,16 +13,27 @@ from internal_shared.models.chat import (
     ChatResponse,
 )
 from pipeline import execute_pipeline, execute_pipeline_streaming
+from retrieval import RetrievalStep
 from uuid import uuid4
 
-from routers import retriever_config, prompt_template
+from routers import index_version, metrics, retriever_config, prompt_template
 
 _RAG_PIPELINE_DB = "rag_pipeline"
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # close the long-lived search clients and their connections
+    await RetrievalStep.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(retriever_config.router)
 app.include_router(prompt_template.router)
+app.include_router(metrics.router)
+app.include_router(index_version.router)
 
 logger = get_logger(__name__)
 
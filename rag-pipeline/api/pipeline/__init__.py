@@ -7,20 +7,27 @@ from internal_shared.models.chat import (
     ChatResponse,
     ChatResponseChunk,
     RetrievalConfig,
+    RetrievalStepPlan,
     RetrievalStepResult,
     PostRetrievalType,
+    PreRetrievalType,
+    SearchResult,
 )
 from internal_shared.utils.timer import atime_wrapper
 from internal_shared.logger import get_logger
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import BaseMessageChunk
-from llm import embed_text_async, invoke_prompt_async, invoke_streaming_prompt_async
+from llm import invoke_prompt_async, invoke_streaming_prompt_async
 from retrieval import (
     PreRetrievalStep,
     RetrievalStep,
     PostRetrievalStep,
 )
+from retrieval.curated import content_hash, get_curated_documents_mode
+from retrieval.retrieval import reciprocal_rank_fusion
+from retrieval.few_shot import format_few_shot_examples, get_few_shot_index
+from .plan import PreRetrievalResult, RetrievalPlan, get_pre_retrieval_key
 from .helper import (
     calculate_token_str_usage,
     calculate_token_usage,
@@ -122,42 +129,170 @@ async def execute_pipeline_streaming(request: ChatRequest, chat_id: str, db_name
     )
 
 
+# pre-retrieval strategies, which wait for an LLM completion, thus the original query can be searched meanwhile
+SPECULATIVE_PRE_RETRIEVAL_TYPES = {
+    PreRetrievalType.QUERY_EXPANSION,
+    PreRetrievalType.HYDE,
+    PreRetrievalType.STEP_BACK_PROMPTING,
+    PreRetrievalType.REPHRASE_AND_RESPOND,
+}
+
+
+def discard_task(task: asyncio.Task) -> None:
+    """
+    Cancels a task, whose result is not needed anymore. The error of a failed task is retrieved, thus it is not reported as never retrieved.
+    """
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def search_original_query(
+    plan: RetrievalPlan, cfg: RetrievalConfig
+) -> Tuple[List[SearchResult], bool]:
+    """
+    Embeds and searches the original query of a request (speculative retrieval).
+    """
+    embedded_query = None
+    if RetrievalStep.requires_embedding(cfg):
+        embedded_query, _, _ = await plan.embed(
+            plan.query, cfg.retriever.embedding_model
+        )
+    return await RetrievalStep.execute_cached_async(cfg, embedded_query, plan.query)
+
+
 async def retrieve_documents(
     request: ChatRequest,
 ) -> Tuple[Dict[str, List[str]], List[RetrievalStepResult]]:
     """
     Executes the whole retrieval pipeline in order to retrieve documents based on the retrieval behaviour in the request.
 
+    The retrieval steps share their pre-retrieval and embedding stages, see `RetrievalPlan`.
+
     Args:
         - request (ChatRequest): The request object.
     """
+    plan = RetrievalPlan(request.query, request.retrieval_behaviour)
 
     async def retrieve(cfg: RetrievalConfig):
         """
         Executes on retrieval step to retrieve documents based on the given retrieval configuration.
         """
-        # pre-retrieval
-        pre_time, query = await atime_wrapper(
-            PreRetrievalStep.execute_async, cfg.pre_retrieval_type, request.query
-        )
-
-        embedded_query = await embed_text_async(query, cfg.retriever.embedding_model)
-
-        # retrieval
-        ret_time, retrieved_documents = await atime_wrapper(
-            RetrievalStep.execute_async, cfg, embedded_query
-        )
+        # the original query is searched, while the LLM rewrites it
+        speculative = None
+        if cfg.speculative and cfg.pre_retrieval_type in SPECULATIVE_PRE_RETRIEVAL_TYPES:
+            speculative = asyncio.create_task(search_original_query(plan, cfg))
+
+        try:
+            # pre-retrieval
+            speculative_fallback = False
+            try:
+                timeout = cfg.speculative.latency_budget_ms / 1000 if speculative else None
+                pre_retrieval = await plan.pre_retrieve(cfg, timeout)
+            except asyncio.TimeoutError:
+                if speculative is None:
+                    raise
+                logger.warning(
+                    f"Pre-retrieval {cfg.pre_retrieval_type.value} exceeded the latency budget, using the speculative results"
+                )
+                pre_retrieval = PreRetrievalResult(
+                    duration=cfg.speculative.latency_budget_ms, query=request.query
+                )
+                speculative_fallback = True
+
+            query, hypotheses = pre_retrieval.query, pre_retrieval.hypotheses
+
+            # several sub-queries (e.g. of REWRITE_RETRIEVE_READ) are searched separately and fused
+            sub_queries = []
+            queries = [query]
+            if cfg.multi_query and not speculative_fallback:
+                queries = PreRetrievalStep.split_queries(cfg.pre_retrieval_type, query)
+
+            embedded_query, embedding_group, embedding_shared = None, None, False
+            speculative_documents = []
+            if speculative_fallback:
+                start = time.perf_counter()
+                retrieved_documents, cache_hit = await speculative
+                ret_time = (time.perf_counter() - start) * 1000
+                speculative_documents = retrieved_documents
+            elif len(queries) > 1:
+                ret_time, (retrieved_documents, sub_queries) = await atime_wrapper(
+                    RetrievalStep.execute_multi_query_async, cfg, queries
+                )
+                cache_hit = all(sub.retrieval_cache_hit for sub in sub_queries)
+            else:
+                # lexical retrievers (e.g. the function lookup) do not need the embedding round trip
+                # several HYDE hypotheses are searched by the mean of their embeddings and the embedding of the query
+                if RetrievalStep.requires_embedding(cfg):
+                    texts = query
+                    if hypotheses:
+                        texts = [request.query, *(h.text for h in hypotheses)]
+                    embedded_query, embedding_group, embedding_shared = (
+                        await plan.embed(texts, cfg.retriever.embedding_model)
+                    )
+
+                # retrieval
+                ret_time, (retrieved_documents, cache_hit) = await atime_wrapper(
+                    RetrievalStep.execute_cached_async, cfg, embedded_query, query
+                )
+
+            # both result sets are fused, the speculative retrieval is usually done by now
+            if speculative is not None and not speculative_fallback:
+                start = time.perf_counter()
+                try:
+                    speculative_documents, speculative_hit = await speculative
+                except Exception:
+                    # the speculative retrieval is optional, thus the step keeps the results of the rewritten query
+                    logger.warning(
+                        f"Speculative retrieval of {cfg.pre_retrieval_type.value} failed, using the rewritten query only",
+                        exc_info=True,
+                    )
+                else:
+                    retrieved_documents = reciprocal_rank_fusion(
+                        [retrieved_documents, speculative_documents],
+                        cfg.speculative.rrf_k,
+                    )[: cfg.top_k]
+                    cache_hit = cache_hit and speculative_hit
+                ret_time += (time.perf_counter() - start) * 1000
+        finally:
+            if speculative is not None:
+                discard_task(speculative)
 
         # post-retrieval
         post_time, post_retrieval_documents = await atime_wrapper(
             PostRetrievalStep.execute_async, cfg, retrieved_documents
         )
 
+        context = [
+            f"{doc.name}: {doc.content}" if doc.name not in doc.content else doc.content
+            for doc in post_retrieval_documents
+        ]
+
+        curated_tokens_saved = 0
+        if cfg.context_key == "formula_context":
+            # the speculative, multi-query and lexical paths do not embed the query, thus the shared embedding of the plan is used
+            curated_vector = embedded_query
+            if curated_vector is None and get_curated_documents_mode() == "relevant":
+                curated_vector, _, _ = await plan.embed(
+                    query, cfg.retriever.embedding_model
+                )
+            curated = await RetrievalStep.select_curated_documents(
+                query,
+                curated_vector,
+                cfg.retriever.embedding_model,
+                context,
+                [doc.name for doc in post_retrieval_documents],
+            )
+            context.extend(curated.documents)
+            curated_tokens_saved = curated.tokens_saved
+
         step = RetrievalStepResult(
             config=cfg,
             initial_query=request.query,
             pre_retrieval=query,
-            pre_retrieval_duration=pre_time,
+            pre_retrieval_duration=pre_retrieval.duration,
+            pre_retrieval_cache_hit=pre_retrieval.cache_hit,
             retrieval=retrieved_documents,
             retrieval_duration=ret_time,
             post_retrieval=(
@@ -166,28 +301,40 @@ async def retrieve_documents(
                 else []
             ),
             post_retrieval_duration=post_time,
+            curated_tokens_saved=curated_tokens_saved,
+            retrieval_cache_hit=cache_hit,
+            sub_queries=sub_queries,
+            speculative_retrieval=speculative_documents,
+            speculative_fallback=speculative_fallback,
+            hypotheses=hypotheses,
+            plan=RetrievalStepPlan(
+                pre_retrieval_group=plan.pre_retrieval_groups[get_pre_retrieval_key(cfg)],
+                embedding_group=embedding_group,
+                pre_retrieval_shared=pre_retrieval.shared,
+                embedding_shared=embedding_shared,
+            ),
         )
 
-        context = [
-            f"{doc.name}: {doc.content}" if doc.name not in doc.content else doc.content
-            for doc in post_retrieval_documents
-        ]
-
-        if cfg.context_key == "formula_context":
-            context.extend(RetrievalStep.get_curated_documents())
-
         return cfg.context_key, context, step
 
-    results = await asyncio.gather(
-        *(retrieve(cfg) for cfg in request.retrieval_behaviour)
-    )
+    try:
+        results = await asyncio.gather(
+            *(retrieve(cfg) for cfg in request.retrieval_behaviour)
+        )
+    except BaseException:
+        plan.cancel()
+        raise
 
+    # documents of several steps (e.g. the curated documents) are only added once
     context: Dict[str, List[str]] = {}
+    seen: Dict[str, Set[str]] = {}
     for key, c, _ in results:
-        if key in context:
-            context[key].extend(c)
-        else:
-            context[key] = c
+        documents, hashes = context.setdefault(key, []), seen.setdefault(key, set())
+        for document in c:
+            document_hash = content_hash(document)
+            if document_hash not in hashes:
+                hashes.add(document_hash)
+                documents.append(document)
     steps = [step for _, _, step in results]
 
     return context, steps
@@ -200,10 +347,23 @@ async def prepare_prompt(request: ChatRequest, context: Dict[str, List[str]]):
 
     context_strings = {key: "\n".join(value) for key, value in context.items()}
 
-    if request.prompt_template.few_shot_key and request.prompt_template.few_shot_value:
-        context_strings[request.prompt_template.few_shot_key] = (
-            request.prompt_template.few_shot_value
+    template = request.prompt_template
+    few_shot_index = None
+    if template.few_shot_key and template.few_shot_top_k:
+        try:
+            few_shot_index = get_few_shot_index()
+        except FileNotFoundError as e:
+            logger.warning(
+                f"Few-shot dataset is not available ({e}), using the static few-shot value"
+            )
+    if few_shot_index is not None:
+        # the examples most similar to the request, instead of the static value
+        examples = await few_shot_index.select(
+            request.query, template.few_shot_top_k, template.few_shot_token_budget
         )
+        context_strings[template.few_shot_key] = format_few_shot_examples(examples)
+    elif template.few_shot_key and template.few_shot_value:
+        context_strings[template.few_shot_key] = template.few_shot_value
 
     chat_template = ChatPromptTemplate.from_messages(
         [
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Tuple
+from internal_shared.models.ai import AvailableModels
+from internal_shared.models.chat import (
+    HypothesisResult,
+    PreRetrievalType,
+    RetrievalConfig,
+)
+from llm import embed_text_async, embed_texts_async
+from retrieval import PreRetrievalStep
+from retrieval.local_index import mean_vector
+
+# separator of the hypotheses in the pre-retrieval text of a multi-hypothesis HYDE step
+HYPOTHESES_SEPARATOR = "\n---\n"
+
+
+@dataclass
+class PreRetrievalResult:
+    """Result of the pre-retrieval of a step."""
+
+    duration: float
+    query: str
+    # hypotheses of a multi-hypothesis HYDE pre-retrieval
+    hypotheses: List[HypothesisResult] = field(default_factory=list)
+    # whether the rewrite was served from the rewrite cache
+    cache_hit: bool = False
+    # whether the pre-retrieval was executed by another step of the group
+    shared: bool = False
+
+
+def get_pre_retrieval_key(cfg: RetrievalConfig) -> Tuple[PreRetrievalType, int]:
+    """
+    Pre-retrieval type and number of HYDE hypotheses of a step.
+    """
+    hypotheses = 1
+    if cfg.pre_retrieval_type == PreRetrievalType.HYDE and cfg.hyde:
+        hypotheses = cfg.hyde.hypotheses
+    return cfg.pre_retrieval_type, hypotheses
+
+
+class RetrievalPlan:
+    """
+    Execution plan of the retrieval steps of a request.
+
+    The steps are grouped by their pre-retrieval type and then by their (rewritten) query and embedding model. Every group runs its pre-retrieval or embedding once and all steps of the group share the result, e.g. three HYDE steps with the same embedding model cost one rewrite and one embedding.
+    """
+
+    def __init__(self, query: str, configs: List[RetrievalConfig]):
+        self.query = query
+        self.pre_retrieval_groups: Dict[Tuple[PreRetrievalType, int], int] = {}
+        # embedding model of the query, which is compared by the rewrite cache (the model of the first step of a group)
+        self._pre_retrieval_models: Dict[Tuple[PreRetrievalType, int], AvailableModels] = {}
+        for cfg in configs:
+            key = get_pre_retrieval_key(cfg)
+            self.pre_retrieval_groups.setdefault(key, len(self.pre_retrieval_groups))
+            self._pre_retrieval_models.setdefault(key, cfg.retriever.embedding_model)
+        self.embedding_groups: Dict[Tuple[Tuple[str, ...], AvailableModels], int] = {}
+        self._pre_retrievals: Dict[Tuple[PreRetrievalType, int], asyncio.Task] = {}
+        self._embeddings: Dict[Tuple[Tuple[str, ...], AvailableModels], asyncio.Task] = {}
+
+    async def _execute_pre_retrieval(
+        self, strategy_type: PreRetrievalType, hypotheses: int
+    ) -> PreRetrievalResult:
+        start = time.perf_counter()
+        # nearly identical queries share their rewrites, if the rewrite cache compares embeddings
+        # the query is embedded with the model of the steps, thus e.g. the speculative retrieval shares the embedding
+        model = self._pre_retrieval_models[(strategy_type, hypotheses)]
+        query_vector = None
+        if (
+            strategy_type != PreRetrievalType.DEFAULT
+            and PreRetrievalStep.uses_query_embedding()
+        ):
+            query_vector, _, _ = await self.embed(self.query, model)
+
+        if hypotheses > 1:
+            results, cache_hit = await PreRetrievalStep.generate_hypotheses_async(
+                self.query, hypotheses, query_vector, model
+            )
+            query = HYPOTHESES_SEPARATOR.join(r.text for r in results)
+        else:
+            results = []
+            query, cache_hit = await PreRetrievalStep.execute_cached_async(
+                strategy_type, self.query, query_vector, model
+            )
+        return PreRetrievalResult(
+            duration=(time.perf_counter() - start) * 1000,
+            query=query,
+            hypotheses=results,
+            cache_hit=cache_hit,
+        )
+
+    async def pre_retrieve(
+        self, cfg: RetrievalConfig, timeout: float | None = None
+    ) -> PreRetrievalResult:
+        """
+        Pre-retrieval of the query, which runs once per pre-retrieval type (and number of HYDE hypotheses).
+
+        A timeout only stops waiting, the pre-retrieval still completes for the other steps of the group.
+        """
+        key = get_pre_retrieval_key(cfg)
+        task = self._pre_retrievals.get(key)
+        shared = task is not None
+        if task is None:
+            task = self._pre_retrievals[key] = asyncio.create_task(
+                self._execute_pre_retrieval(*key)
+            )
+        result = await asyncio.wait_for(asyncio.shield(task), timeout)
+        return replace(result, shared=shared)
+
+    async def _embed(self, texts: Tuple[str, ...], model: AvailableModels) -> List[float]:
+        if len(texts) == 1:
+            return await embed_text_async(texts[0], model)
+        # all texts within a single request
+        vectors = await embed_texts_async(list(texts), model)
+        return mean_vector(vectors).tolist()
+
+    async def embed(
+        self, query: str | List[str], model: AvailableModels
+    ) -> Tuple[List[float], int, bool]:
+        """
+        Embedding of a (rewritten) query, which runs once per query and embedding model. Several texts (e.g. the query and its HYDE hypotheses) are embedded within a single request and averaged.
+
+        :return: The embedding, its group and whether it was shared.
+        """
+        key = ((query,) if isinstance(query, str) else tuple(query), model)
+        task = self._embeddings.get(key)
+        shared = task is not None
+        if task is None:
+            self.embedding_groups[key] = len(self.embedding_groups)
+            task = self._embeddings[key] = asyncio.create_task(self._embed(*key))
+        return await asyncio.shield(task), self.embedding_groups[key], shared
+
+    def cancel(self) -> None:
+        """
+        Cancel the pending stages, e.g. if a step failed.
+        """
+        for task in [*self._pre_retrievals.values(), *self._embeddings.values()]:
+            task.cancel()
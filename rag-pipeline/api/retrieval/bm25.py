@@ -0,0 +1,179 @@
+"""
+In-process BM25 inverted index over the documents of a local index, used by the HYBRID retriever.
+
+The posting lists are stored compactly as flat arrays (CSR layout): the postings of term `t` are `doc_ids[offsets[t]:offsets[t + 1]]` with their term frequencies in `term_freqs`.
+"""
+
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+from internal_shared.logger import get_logger
+from .local_index import is_outdated, load_local_index, top_k_indices
+
+_logger = get_logger(__name__)
+
+_WORD = re.compile(r"\w+")
+_CAMEL_CASE = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased words. Identifiers in camel case are also split into their parts, thus `AddWorkingDays` matches `AddWorkingDays` as well as "working days".
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word.lower())
+        parts = _CAMEL_CASE.split(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of texts.
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        document_frequencies = np.diff(offsets)
+        self.idf = np.log(
+            1 + (len(doc_lengths) - document_frequencies + 0.5) / (document_frequencies + 0.5)
+        ).astype(np.float32)
+        # length normalization per document, which does not depend on the query
+        average_length = doc_lengths.mean() if len(doc_lengths) else 1.0
+        self._norms = (k1 * (1 - b + b * doc_lengths / max(average_length, 1e-9))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @staticmethod
+    def build(texts: List[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        terms: Dict[str, int] = {}
+        postings: List[Dict[int, int]] = []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for token in tokens:
+                term = terms.setdefault(token, len(terms))
+                if term == len(postings):
+                    postings.append({})
+                postings[term][doc_id] = postings[term].get(doc_id, 0) + 1
+
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in postings])
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        term_freqs = np.empty(offsets[-1], dtype=np.uint16)
+        for term, posting in enumerate(postings):
+            start, end = offsets[term], offsets[term + 1]
+            doc_ids[start:end] = list(posting.keys())
+            term_freqs[start:end] = np.minimum(list(posting.values()), np.iinfo(np.uint16).max)
+        return BM25Index(terms, offsets, doc_ids, term_freqs, doc_lengths, k1, b)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.offsets.nbytes + self.doc_ids.nbytes + self.term_freqs.nbytes + self.doc_lengths.nbytes
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.terms.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            ids = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end].astype(np.float32)
+            # doc ids are unique per posting list, thus a fancy index update is safe
+            scores[ids] += self.idf[term] * freqs * (self.k1 + 1) / (freqs + self._norms[ids])
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Returns the indices and BM25 scores of the `top_k` best matching documents, documents without a matching term are skipped.
+        """
+        scores = self.scores(query)
+        indices = top_k_indices(scores, top_k)
+        return [(int(i), float(scores[i])) for i in indices if scores[i] > 0]
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(list(self.terms.keys()), dtype=str),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+                params=np.array([self.k1, self.b]),
+            )
+
+    @staticmethod
+    def load(path: str | Path) -> "BM25Index":
+        with np.load(path) as data:
+            terms = {term: i for i, term in enumerate(data["terms"].tolist())}
+            k1, b = data["params"].tolist()
+            return BM25Index(
+                terms, data["offsets"], data["doc_ids"], data["term_freqs"], data["doc_lengths"], k1, b
+            )
+
+
+def get_bm25_path(index_path: str | Path, text_field: str) -> Path:
+    """
+    File of the BM25 index over `text_field` of a local index.
+    """
+    return Path(index_path) / f"bm25_{text_field}.npz"
+
+
+def build_bm25_index(index_path: str | Path, text_field: str) -> BM25Index:
+    """
+    Builds and saves the BM25 index over `text_field` of the documents of a local index. Tokenizing takes a while for large indexes, thus it is done offline (`build_local_index --bm25`), never on the request path.
+    """
+    index = load_local_index(str(index_path))
+    path = get_bm25_path(index_path, text_field)
+    _logger.info(f"Building BM25 index '{path}' for {len(index)} documents")
+    bm25 = BM25Index.build([str(document.get(text_field, "")) for document in index.documents])
+    bm25.save(path)
+    return bm25
+
+
+@lru_cache(maxsize=32)
+def load_bm25_index(index_path: str, text_field: str) -> BM25Index:
+    """
+    Opens the BM25 index over `text_field` of the documents of a local index once per process.
+
+    Raises an error, if the index was not built (see `build_bm25_index`) or does not match the local index.
+    """
+    index = load_local_index(index_path)
+    path = get_bm25_path(index_path, text_field)
+    build_hint = (
+        f"build it with `python -m retrieval.build_local_index {index_path} --bm25 "
+        f"--bm25-text-field {text_field}`"
+    )
+    if not path.exists():
+        raise FileNotFoundError(f"BM25 index '{path}' does not exist, {build_hint}")
+    if is_outdated(path, index_path):
+        raise ValueError(f"BM25 index '{path}' is older than the index, {build_hint}")
+    bm25 = BM25Index.load(path)
+    if len(bm25) != len(index):
+        raise ValueError(
+            f"BM25 index '{path}' does not match the index ({len(bm25)} instead of {len(index)} documents), {build_hint}"
+        )
+    return bm25
@@ -0,0 +1,99 @@
+"""
+Builds a local vector index (see `local_index.py`) from a JSON file with a list of documents.
+
+Usage: `python -m retrieval.build_local_index data/functions/data.json indexes/functions`
+
+Without the documents, only the HNSW graph, the quantized codes or the BM25 index of the existing index are built, e.g. `python -m retrieval.build_local_index indexes/functions --hnsw`.
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+import numpy as np
+from internal_shared.models.ai import AvailableModels, get_embedding_models
+from internal_shared.models.chat import VectorQuantization
+from llm import embed_texts_async
+from .bm25 import build_bm25_index
+from .hnsw import build_hnsw_index
+from .local_index import LocalVectorIndex
+from .quantization import build_quantized_index
+
+
+async def build_local_index(
+    documents: List[Dict[str, Any]],
+    output: str | Path,
+    text_template: str,
+    model: AvailableModels,
+    batch_size: int = 256,
+) -> None:
+    """
+    Embeds the documents (rendered with `text_template`) and writes them as local index.
+    """
+    texts = [text_template.format(**document) for document in documents]
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await embed_texts_async(texts[start : start + batch_size], model))
+    # the embedded text is stored, thus it can be used in the field mappings
+    documents = [{**document, "text": text} for document, text in zip(documents, texts)]
+    LocalVectorIndex.write(output, documents, np.array(vectors), model.value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a local vector index")
+    parser.add_argument(
+        "documents",
+        nargs="?",
+        help="JSON file with a list of documents, without it the existing index is kept",
+    )
+    parser.add_argument("output", help="Directory of the index")
+    parser.add_argument(
+        "--text-template",
+        default="{name}: {description} Example: {example}",
+        help="Template of the embedded text, based on the fields of a document",
+    )
+    parser.add_argument(
+        "--model",
+        default=AvailableModels.EMBEDDING_3_LARGE.value,
+        choices=[m.value for m in get_embedding_models()],
+    )
+    parser.add_argument(
+        "--hnsw", action="store_true", help="Also build the HNSW graph of the index"
+    )
+    parser.add_argument("--hnsw-m", type=int, default=16)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=200)
+    parser.add_argument(
+        "--quantization",
+        action="append",
+        default=[],
+        choices=[q.value for q in VectorQuantization if q != VectorQuantization.NONE],
+        help="Also build the quantized codes of the index, can be repeated",
+    )
+    parser.add_argument("--pq-subvectors", type=int, default=96)
+    parser.add_argument(
+        "--bm25", action="store_true", help="Also build the BM25 index (HYBRID retriever)"
+    )
+    parser.add_argument("--bm25-text-field", default="text")
+    args = parser.parse_args()
+
+    if args.documents:
+        with open(args.documents, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        asyncio.run(
+            build_local_index(
+                documents, args.output, args.text_template, AvailableModels(args.model)
+            )
+        )
+    if args.hnsw:
+        build_hnsw_index(args.output, args.hnsw_m, args.hnsw_ef_construction)
+    if args.bm25:
+        build_bm25_index(args.output, args.bm25_text_field)
+    for quantization in args.quantization:
+        build_quantized_index(
+            args.output, VectorQuantization(quantization), args.pq_subvectors
+        )
+
+
+if __name__ == "__main__":
+    main()
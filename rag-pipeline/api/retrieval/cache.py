@@ -0,0 +1,183 @@
+"""
+Cache of retrieval results, keyed by the retriever configuration, the (quantized) query vector, `top_k`, the threshold and the version of the searched index.
+
+The query vector is rounded to a fixed grid before hashing, thus the same query (whose embedding may differ in the last bits between calls) hits the same entry. Index versions are counters in MongoDB (see `internal_shared.db.index_versions`), which are bumped whenever the documents of an index change. They are refreshed in the background, thus a cache lookup never waits for the database.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+import numpy as np
+from internal_shared.db.index_versions import get_index_versions_async
+from internal_shared.db.mongo import get_async_db
+from internal_shared.logger import get_logger
+from internal_shared.models.chat import RetrieverConfig, SearchResult
+from llm.cache import LRUCache
+from .local_index import to_query_vector
+
+_logger = get_logger(__name__)
+
+_RAG_PIPELINE_DB = "rag_pipeline"
+
+# grid of the quantized query vector, i.e. components are rounded to multiples of 1/4096
+VECTOR_HASH_SCALE = 4096
+
+
+def get_index_key(retriever: RetrieverConfig) -> str:
+    """
+    Name of the index, whose version invalidates the results of the retriever.
+    """
+    return retriever.index_name or retriever.retriever_type.value
+
+
+def query_vector_hash(query: List[float] | None) -> str:
+    if query is None:
+        return "none"
+    quantized = np.rint(to_query_vector(query) * VECTOR_HASH_SCALE).astype(np.int16)
+    return hashlib.sha256(quantized.tobytes()).hexdigest()
+
+
+class IndexVersions:
+    """
+    Local copy of the index versions, which is refreshed from MongoDB at most every `refresh_interval` seconds.
+    """
+
+    def __init__(self, refresh_interval: float = 30.0):
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[str, int] = {}
+        self._refreshed_at = 0.0
+        self._refresh_task: asyncio.Task | None = None
+
+    def get(self, index_name: str) -> int:
+        """
+        Current version of an index, starts a background refresh, if the local copy is outdated.
+        """
+        if time.monotonic() - self._refreshed_at > self.refresh_interval and (
+            self._refresh_task is None or self._refresh_task.done()
+        ):
+            self._refreshed_at = time.monotonic()
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self._versions.get(index_name, 0)
+
+    def set(self, index_name: str, version: int) -> None:
+        self._versions[index_name] = version
+
+    async def refresh(self) -> None:
+        try:
+            db = await get_async_db(_RAG_PIPELINE_DB)
+            if db is not None:
+                self._versions.update(await get_index_versions_async(db))
+        except Exception:
+            _logger.warning("Could not refresh the index versions", exc_info=True)
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self._versions)
+
+
+@dataclass
+class RetrievalCacheStats:
+    """Hit/miss counters of the retrieval cache, including the saved retrieval time."""
+
+    hits: int = 0
+    misses: int = 0
+    saved_latency_ms: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+class RetrievalCache:
+    """
+    In-memory LRU cache of retrieval results with a time-to-live per entry.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float | None = 10 * 60,
+        enabled: bool = True,
+        index_versions: IndexVersions | None = None,
+    ):
+        self.enabled = enabled
+        self.stats = RetrievalCacheStats()
+        self.index_versions = index_versions or IndexVersions()
+        self._entries: LRUCache[Dict[str, Any]] = LRUCache(max_entries, ttl)
+
+    def build_key(
+        self,
+        config_hash: str,
+        retriever: RetrieverConfig,
+        query: List[float] | None,
+        top_k: int,
+        threshold: float,
+        query_text: str | None = None,
+    ) -> str:
+        """
+        `query_text` is only part of the key for strategies, which search by the text as well.
+        """
+        index_name = get_index_key(retriever)
+        parts = [
+            config_hash,
+            query_vector_hash(query),
+            str(top_k),
+            repr(float(threshold)),
+            f"{index_name}@{self.index_versions.get(index_name)}",
+            query_text or "",
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[SearchResult]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.saved_latency_ms += entry["latency_ms"]
+        return [SearchResult.model_validate(result) for result in entry["results"]]
+
+    def set(self, key: str, results: List[SearchResult], latency_ms: float) -> None:
+        self._entries.set(
+            key,
+            {"results": [r.model_dump() for r in results], "latency_ms": latency_ms},
+        )
+
+    def bump_index_version(self, index_name: str, version: int) -> None:
+        """
+        Applies a new index version at once, the outdated entries are evicted over time.
+        """
+        self.index_versions.set(index_name, version)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.stats = RetrievalCacheStats()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats.to_dict(),
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "index_versions": self.index_versions.to_dict(),
+        }
+
+
+def create_retrieval_cache_from_env() -> RetrievalCache:
+    """
+    Creates the retrieval cache based on the `RETRIEVAL_CACHE_*` environment variables.
+    """
+    ttl = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", 10 * 60))
+    return RetrievalCache(
+        max_entries=int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", 1024)),
+        ttl=ttl if ttl > 0 else None,
+        enabled=os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true",
+        index_versions=IndexVersions(
+            float(os.getenv("RETRIEVAL_CACHE_VERSION_REFRESH_SECONDS", 30))
+        ),
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+import aiohttp
+import requests
+from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+
+
+@dataclass
+class ConnectionStats:
+    """Counts new and reused connections of the pooled HTTP sessions."""
+
+    requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+
+    @property
+    def reuse_rate(self) -> float:
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": self.reuse_rate,
+        }
+
+
+class SearchTransportPool:
+    """
+    Long-lived HTTP transports for the Azure AI Search clients, one per endpoint.
+
+    All clients of an endpoint share the same connection pool, thus the TLS and connection setup is only paid once. The transports are not owned by the clients, i.e. closing a client keeps the connections open. Call `aclose` on shutdown.
+    """
+
+    def __init__(self, connection_limit: int = 100, keepalive_timeout: float = 60.0):
+        self.connection_limit = connection_limit
+        self.keepalive_timeout = keepalive_timeout
+        self.stats = ConnectionStats()
+        self._async_transports: Dict[str, Tuple[asyncio.AbstractEventLoop, AioHttpTransport]] = {}
+        self._sync_transports: Dict[str, RequestsTransport] = {}
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats.connections_reused += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def get_async_transport(self, endpoint: str) -> AioHttpTransport:
+        """
+        Get the pooled async transport of an endpoint. Has to be called within the event loop, which uses the transport.
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._async_transports.get(endpoint)
+        if entry is not None and entry[0] is loop:
+            return entry[1]
+
+        # same settings as the sessions created by azure-core itself
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.connection_limit, keepalive_timeout=self.keepalive_timeout
+            ),
+            trust_env=True,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+            trace_configs=[self._create_trace_config()],
+        )
+        transport = AioHttpTransport(session=session, session_owner=False)
+        self._async_transports[endpoint] = (loop, transport)
+        return transport
+
+    def get_sync_transport(self, endpoint: str) -> RequestsTransport:
+        """
+        Get the pooled sync transport of an endpoint.
+        """
+        if endpoint not in self._sync_transports:
+            self._sync_transports[endpoint] = RequestsTransport(
+                session=requests.Session(), session_owner=False
+            )
+        return self._sync_transports[endpoint]
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        for endpoint, (transport_loop, transport) in self._async_transports.items():
+            # sessions of other (already closed) event loops can not be closed anymore
+            if transport_loop is loop:
+                await transport.session.close()
+        self._async_transports.clear()
+        for transport in self._sync_transports.values():
+            transport.session.close()
+        self._sync_transports.clear()
+
+
+_transport_pool = SearchTransportPool(
+    connection_limit=int(os.getenv("AZURE_AI_SEARCH_CONNECTION_LIMIT", 100)),
+)
+
+
+def get_search_transport_pool() -> SearchTransportPool:
+    return _transport_pool
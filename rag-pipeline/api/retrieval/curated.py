@@ -0,0 +1,146 @@
+"""
+Selection of the curated formula documents, which are relevant for a query.
+
+The curated documents are embedded once per embedding model and held in memory. Per request, only the documents, which are similar enough to the query and not yet part of the retrieved context, are added.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+import tiktoken
+from internal_shared.models.ai import AvailableModels
+from llm import embed_text_async, embed_texts_async
+from .local_index import normalize, to_query_vector
+
+_WHITESPACE = re.compile(r"\s+")
+_NAME = re.compile(r"\w+")
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of a text, which ignores case and whitespace.
+    """
+    normalized = _WHITESPACE.sub(" ", text).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _get_encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of tokens of a text. Without the tiktoken encoding (e.g. offline), it is estimated with four characters per token.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+
+@dataclass
+class CuratedSelection:
+    """Curated documents of a request and the documents, which were skipped."""
+
+    documents: List[str] = field(default_factory=list)
+    skipped_irrelevant: int = 0
+    skipped_duplicates: int = 0
+    tokens_saved: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class CuratedDocumentIndex:
+    """
+    In-memory index of the curated documents.
+
+    A curated document is a duplicate, if a retrieved document has the same content (by content hash) or the same function name.
+    """
+
+    def __init__(self, documents: List[str]):
+        self.documents = documents
+        self.names = [_NAME.match(d).group(0).lower() for d in documents]
+        self.hashes = [content_hash(d) for d in documents]
+        self.tokens = [count_tokens(d) for d in documents]
+        self._embeddings: Dict[AvailableModels, asyncio.Task] = {}
+
+    async def _embed(self, model: AvailableModels) -> np.ndarray:
+        vectors = await embed_texts_async(self.documents, model)
+        return normalize(np.array(vectors, dtype=np.float32))
+
+    async def get_embeddings(self, model: AvailableModels) -> np.ndarray:
+        """
+        Embeddings of the curated documents, which are computed once per embedding model. Concurrent requests on a cold index await the same embedding task, a failed task is retried by the next request.
+        """
+        task = self._embeddings.get(model)
+        if task is None or (task.done() and (task.cancelled() or task.exception())):
+            task = self._embeddings[model] = asyncio.create_task(self._embed(model))
+        return await asyncio.shield(task)
+
+    async def select(
+        self,
+        query: str,
+        query_vector: List[float] | None,
+        model: AvailableModels,
+        retrieved: Iterable[str],
+        retrieved_names: Iterable[str] = (),
+        threshold: float = 0.3,
+        mode: str = "relevant",
+    ) -> CuratedSelection:
+        """
+        Selects the curated documents, whose cosine similarity to the query is at least `threshold` and which are not part of `retrieved` yet.
+
+        `mode` "all" selects all curated documents and "none" skips all of them.
+        """
+        selection = CuratedSelection()
+        if mode == "all":
+            selection.documents = list(self.documents)
+            return selection
+        if mode == "none":
+            selection.skipped_irrelevant = len(self.documents)
+            selection.tokens_saved = sum(self.tokens)
+            return selection
+
+        if query_vector is None:
+            query_vector = await embed_text_async(query, model)
+        embeddings = await self.get_embeddings(model)
+        similarities = embeddings @ to_query_vector(query_vector)
+        retrieved_hashes = {content_hash(text) for text in retrieved}
+        names = {name.lower() for name in retrieved_names}
+
+        for index, document in enumerate(self.documents):
+            if self.hashes[index] in retrieved_hashes or self.names[index] in names:
+                selection.skipped_duplicates += 1
+            elif similarities[index] < threshold:
+                selection.skipped_irrelevant += 1
+            else:
+                selection.documents.append(document)
+                continue
+            selection.tokens_saved += self.tokens[index]
+        return selection
+
+
+@lru_cache(maxsize=4)
+def get_curated_document_index(documents: Tuple[str, ...]) -> CuratedDocumentIndex:
+    return CuratedDocumentIndex(list(documents))
+
+
+def get_curated_documents_mode() -> str:
+    """
+    `relevant` (default), `all` or `none`, see `CURATED_DOCUMENTS_MODE`.
+    """
+    return os.getenv("CURATED_DOCUMENTS_MODE", "relevant").lower()
+
+
+def get_curated_documents_threshold() -> float:
+    return float(os.getenv("CURATED_DOCUMENTS_THRESHOLD", 0.3))
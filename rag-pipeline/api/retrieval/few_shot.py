@@ -0,0 +1,118 @@
+"""
+Dynamic selection of few-shot examples from `data/few_shot_dataset.csv`.
+
+The examples are embedded once per embedding model and held in memory. Per request, the examples most similar to the query are selected, as long as they fit into a token budget.
+"""
+
+import csv
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from internal_shared.models.ai import AvailableModels
+from llm import embed_text_async, embed_texts_async
+from .curated import content_hash, count_tokens
+from .function_lookup import find_data_path
+from .local_index import normalize, to_query_vector, top_k_indices
+
+_DATASET_PATH = Path("data") / "few_shot_dataset.csv"
+
+
+@dataclass(frozen=True)
+class FewShotExample:
+    """
+    A user request and the expected answer of the assistant.
+    """
+
+    user: str
+    assistant: str
+    category: str = "formula"
+    content_rating: str = "simplified"
+    difficulty: str = "easy"
+
+    def format(self) -> str:
+        return f"User: {self.user}\nAssistant: {self.assistant}"
+
+
+def load_few_shot_examples(path: str | Path) -> List[FewShotExample]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [
+            FewShotExample(
+                user=row["User"].strip(),
+                assistant=row["Assistant"].strip(),
+                category=row.get("Category", "formula"),
+                content_rating=row.get("Content Rating", "simplified"),
+                difficulty=row.get("Difficulty", "easy"),
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+class FewShotIndex:
+    """
+    In-memory index of the few-shot examples, which are embedded by their user request.
+    """
+
+    def __init__(self, examples: List[FewShotExample]):
+        self.examples = examples
+        self.tokens = [count_tokens(example.format()) for example in examples]
+        self._embeddings: Dict[AvailableModels, np.ndarray] = {}
+
+    async def get_embeddings(self, model: AvailableModels) -> np.ndarray:
+        if model not in self._embeddings:
+            vectors = await embed_texts_async([e.user for e in self.examples], model)
+            self._embeddings[model] = normalize(np.array(vectors, dtype=np.float32))
+        return self._embeddings[model]
+
+    async def select(
+        self,
+        query: str,
+        top_k: int,
+        token_budget: int,
+        query_vector: List[float] | None = None,
+        model: AvailableModels = AvailableModels.EMBEDDING_3_LARGE,
+        category: str | None = None,
+    ) -> List[FewShotExample]:
+        """
+        Selects up to `top_k` examples, most similar first, whose tokens sum up to at most `token_budget`.
+
+        Examples, which would exceed the budget, are skipped in favour of shorter, less similar ones. Examples with the same answer (e.g. a simplified and a detailed variant) are only selected once.
+        """
+        if not self.examples or top_k <= 0:
+            return []
+        if query_vector is None:
+            query_vector = await embed_text_async(query, model)
+        embeddings = await self.get_embeddings(model)
+        similarities = embeddings @ to_query_vector(query_vector)
+
+        selected: List[FewShotExample] = []
+        answers = set()
+        tokens = 0
+        for index in top_k_indices(similarities, len(self.examples)):
+            example = self.examples[index]
+            answer = content_hash(example.assistant)
+            if category and example.category != category:
+                continue
+            if answer in answers or tokens + self.tokens[index] > token_budget:
+                continue
+            selected.append(example)
+            answers.add(answer)
+            tokens += self.tokens[index]
+            if len(selected) >= top_k:
+                break
+        return selected
+
+
+def format_few_shot_examples(examples: List[FewShotExample]) -> str:
+    return "\n\n".join(example.format() for example in examples)
+
+
+@lru_cache(maxsize=1)
+def get_few_shot_index() -> FewShotIndex:
+    """
+    Index of the few-shot dataset, either from `FEW_SHOT_DATASET_PATH` or `data/few_shot_dataset.csv` in the repository.
+    """
+    return FewShotIndex(
+        load_few_shot_examples(find_data_path(_DATASET_PATH, "FEW_SHOT_DATASET_PATH"))
+    )
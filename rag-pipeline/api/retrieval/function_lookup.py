@@ -0,0 +1,176 @@
+"""
+Exact lookup of DevExpress functions, which are named in a query.
+
+All function names and keywords of the catalogue (`data/functions`) are compiled into an Aho-Corasick automaton, which finds all of them in a single pass over the query, i.e. in O(query length) regardless of the size of the catalogue.
+"""
+
+import json
+import os
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from internal_shared.models.documents import DevExpressFunction
+
+# later files override functions of the same name
+CATALOGUE_FILES = ["data.json", "data.custom.json"]
+METADATA_FILES = ["data.metadata.json", "data.custom.metadata.json"]
+_CATALOGUE_DIR = Path("data") / "functions"
+
+# score of a function, whose name is in the query; functions matched by keywords only score between 0.5 and 0.9
+NAME_SCORE = 1.0
+KEYWORD_SCORE = 0.5
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher for lowercase patterns.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = [p.lower() for p in patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(pattern_id)
+
+        # failure links in breadth-first order, thus the links of shorter prefixes exist already
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def find(self, text: str, whole_words: bool = True) -> List[Tuple[int, int, int]]:
+        """
+        Returns (start, end, pattern id) of all occurrences of the patterns in `text` (case-insensitive).
+        """
+        text = text.lower()
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern_id in self._output[state]:
+                end = position + 1
+                start = end - len(self.patterns[pattern_id])
+                if whole_words and (
+                    (start > 0 and text[start - 1].isalnum())
+                    or (end < len(text) and text[end].isalnum())
+                ):
+                    continue
+                matches.append((start, end, pattern_id))
+        return matches
+
+
+def find_data_path(relative: Path, env_var: str) -> Path:
+    """
+    Path of a file of the `data` folder, either from the environment variable or relative to the working directory (or the repository).
+    """
+    if path := os.getenv(env_var):
+        return Path(path)
+    for directory in [Path.cwd(), *Path.cwd().parents, *Path(__file__).resolve().parents]:
+        if (directory / relative).exists():
+            return directory / relative
+    raise FileNotFoundError(f"Could not find '{relative}', set {env_var} to its path")
+
+
+def find_catalogue_dir() -> Path:
+    """
+    Directory of the function catalogue, either from `FUNCTION_CATALOGUE_DIR` or `data/functions` in the repository.
+    """
+    return find_data_path(_CATALOGUE_DIR, "FUNCTION_CATALOGUE_DIR")
+
+
+def load_function_catalogue(directory: str | Path) -> List[DevExpressFunction]:
+    """
+    Loads all functions of the catalogue. The category of functions without one is taken from the metadata files.
+    """
+    directory = Path(directory)
+    categories: Dict[str, str] = {}
+    for file in METADATA_FILES:
+        if (directory / file).exists():
+            with open(directory / file, "r", encoding="utf-8") as f:
+                for category, names in json.load(f).items():
+                    categories.update({name: category for name in names})
+
+    functions: Dict[str, DevExpressFunction] = {}
+    for file in CATALOGUE_FILES:
+        if not (directory / file).exists():
+            continue
+        with open(directory / file, "r", encoding="utf-8") as f:
+            for entry in json.load(f):
+                functions[entry["name"]] = DevExpressFunction(
+                    name=entry["name"],
+                    description=entry["description"],
+                    category=entry.get("category") or categories.get(entry["name"], ""),
+                    example=entry.get("example"),
+                    source=entry.get("source", "DevExpress"),
+                    keywords=entry.get("keywords") or [],
+                )
+    return list(functions.values())
+
+
+class FunctionLookup:
+    """
+    Finds the functions, whose names or keywords occur in a query.
+    """
+
+    def __init__(self, functions: List[DevExpressFunction]):
+        self.functions = functions
+        # pattern -> (function, whether the pattern is the name)
+        targets: Dict[str, List[Tuple[int, bool]]] = {}
+        for index, function in enumerate(functions):
+            targets.setdefault(function.name.lower(), []).append((index, True))
+            for keyword in function.keywords or []:
+                targets.setdefault(keyword.lower(), []).append((index, False))
+        self._targets = list(targets.values())
+        self._matcher = AhoCorasick(targets.keys())
+
+    def search(self, query: str, top_k: int) -> List[Tuple[DevExpressFunction, float]]:
+        """
+        Returns the `top_k` best matching functions and their scores, functions named in the query first (in order of appearance).
+        """
+        named: Dict[int, int] = {}
+        keyword_matches: Dict[int, set] = {}
+        for start, _, pattern_id in self._matcher.find(query):
+            for index, is_name in self._targets[pattern_id]:
+                if is_name:
+                    named.setdefault(index, start)
+                else:
+                    keyword_matches.setdefault(index, set()).add(pattern_id)
+
+        results = [
+            (self.functions[index], NAME_SCORE)
+            for index in sorted(named, key=named.get)
+        ]
+        scored = []
+        for index, patterns in keyword_matches.items():
+            if index in named:
+                continue
+            share = len(patterns) / len(self.functions[index].keywords)
+            scored.append((self.functions[index], KEYWORD_SCORE + 0.4 * share))
+        results.extend(sorted(scored, key=lambda match: match[1], reverse=True))
+        return results[:top_k]
+
+
+@lru_cache(maxsize=1)
+def get_function_lookup() -> FunctionLookup:
+    return FunctionLookup(load_function_catalogue(find_catalogue_dir()))
@@ -0,0 +1,292 @@
+"""
+Hierarchical navigable small world (HNSW) graph for approximate nearest neighbour search on cosine similarity.
+
+Based on Malkov & Yashunin, "Efficient and robust approximate nearest neighbor search using Hierarchical Navigable Small World graphs" (https://arxiv.org/abs/1603.09320).
+"""
+
+import heapq
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Set, Tuple
+import numpy as np
+from internal_shared.logger import get_logger
+from .local_index import is_outdated, load_local_index, normalize, to_query_vector
+
+_logger = get_logger(__name__)
+
+
+class HNSWIndex:
+    """
+    HNSW graph over normalized float32 vectors, whose ids are the insertion order.
+
+    - `m`: Number of links per node and layer (twice as many on the bottom layer). More links increase recall and memory.
+    - `ef_construction`: Size of the candidate list while inserting. Larger values build a better graph, but slower.
+    - `ef_search`: Size of the candidate list while searching. Larger values increase recall, but also latency.
+
+    Deleted vectors are kept in the graph (to keep it connected), but never returned.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: int = 42,
+    ):
+        self.dimensions = dimensions
+        self.m = m
+        self.m_max0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.entry_point: int | None = None
+        self.max_level = -1
+        self.deleted: Set[int] = set()
+        self._level_multiplier = 1 / np.log(m)
+        self._rng = np.random.default_rng(seed)
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._count = 0
+        self._levels: List[int] = []
+        # links per node and layer
+        self._links: List[List[List[int]]] = []
+
+    def __len__(self) -> int:
+        return self._count - len(self.deleted)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: self._count]
+
+    def _reserve(self, count: int) -> None:
+        if count <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        # grow geometrically, this also copies read-only (memory-mapped) vectors
+        vectors = np.zeros((max(count, 2 * len(self._vectors), 64), self.dimensions), dtype=np.float32)
+        vectors[: self._count] = self._vectors[: self._count]
+        self._vectors = vectors
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[Tuple[float, int]],
+        ef: int,
+        level: int,
+    ) -> List[Tuple[float, int]]:
+        """
+        Greedy beam search on a layer. Returns up to `ef` (similarity, id) pairs, most similar first.
+        """
+        visited = {node for _, node in entry_points}
+        candidates = [(-similarity, node) for similarity, node in entry_points]
+        heapq.heapify(candidates)
+        results = list(entry_points)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative_similarity, node = heapq.heappop(candidates)
+            if len(results) >= ef and -negative_similarity < results[0][0]:
+                break
+            neighbors = [n for n in self._links[node][level] if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            # similarities of all unvisited neighbors in one product
+            similarities = self._vectors[neighbors] @ query
+            for neighbor, similarity in zip(neighbors, similarities.tolist()):
+                if len(results) < ef or similarity > results[0][0]:
+                    heapq.heappush(candidates, (-similarity, neighbor))
+                    heapq.heappush(results, (similarity, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbor selection heuristic: a candidate is only linked, if it is closer to the base than to the already selected neighbors. This keeps links in different directions. Pruned candidates fill up the remaining links.
+        """
+        selected: List[int] = []
+        pruned: List[int] = []
+        for similarity, candidate in candidates:
+            if len(selected) >= m:
+                break
+            if not selected or (
+                self._vectors[selected] @ self._vectors[candidate]
+            ).max() < similarity:
+                selected.append(candidate)
+            else:
+                pruned.append(candidate)
+        return selected + pruned[: m - len(selected)]
+
+    def add(self, vector: List[float] | np.ndarray) -> int:
+        """
+        Inserts a vector and returns its id.
+        """
+        node = self._count
+        self._reserve(node + 1)
+        query = to_query_vector(vector)
+        self._vectors[node] = query
+        self._count += 1
+        level = int(-np.log(1.0 - self._rng.random()) * self._level_multiplier)
+        self._levels.append(level)
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self.entry_point is None:
+            self.entry_point, self.max_level = node, level
+            return node
+
+        entry_points = [(float(self._vectors[self.entry_point] @ query), self.entry_point)]
+        for current in range(self.max_level, level, -1):
+            entry_points = self._search_layer(query, entry_points, 1, current)
+
+        for current in range(min(level, self.max_level), -1, -1):
+            candidates = self._search_layer(query, entry_points, self.ef_construction, current)
+            neighbors = self._select_neighbors(candidates, self.m)
+            self._links[node][current] = neighbors
+            m_max = self.m_max0 if current == 0 else self.m
+            for neighbor in neighbors:
+                links = self._links[neighbor][current]
+                links.append(node)
+                if len(links) > m_max:
+                    similarities = self._vectors[links] @ self._vectors[neighbor]
+                    self._links[neighbor][current] = self._select_neighbors(
+                        sorted(zip(similarities.tolist(), links), reverse=True), m_max
+                    )
+            entry_points = candidates
+
+        if level > self.max_level:
+            self.entry_point, self.max_level = node, level
+        return node
+
+    def add_many(self, vectors: np.ndarray) -> List[int]:
+        self._reserve(self._count + len(vectors))
+        return [self.add(vector) for vector in vectors]
+
+    def delete(self, node: int) -> None:
+        """
+        Marks a vector as deleted.
+        """
+        if node >= self._count:
+            raise KeyError(node)
+        self.deleted.add(node)
+
+    def search(
+        self, query: List[float] | np.ndarray, top_k: int, ef: int | None = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the ids and cosine similarities of (approximately) the `top_k` most similar vectors.
+        """
+        if self.entry_point is None or top_k <= 0:
+            return []
+        query = to_query_vector(query)
+        entry_points = [(float(self._vectors[self.entry_point] @ query), self.entry_point)]
+        for current in range(self.max_level, 0, -1):
+            entry_points = self._search_layer(query, entry_points, 1, current)
+        # deleted vectors occupy places in the candidate list
+        ef = max(ef or self.ef_search, top_k) + min(len(self.deleted), top_k)
+        results = self._search_layer(query, entry_points, ef, 0)
+        return [(node, similarity) for similarity, node in results if node not in self.deleted][:top_k]
+
+    def save(self, path: str | Path, include_vectors: bool = True) -> None:
+        """
+        Saves the graph. Without `include_vectors`, the vectors have to be passed to `load` (e.g. from a local index).
+        """
+        link_counts, link_data = [], []
+        for node_links in self._links:
+            for links in node_links:
+                link_counts.append(len(links))
+                link_data.extend(links)
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                params=np.array(
+                    [self.dimensions, self.m, self.ef_construction, self.ef_search,
+                     -1 if self.entry_point is None else self.entry_point, self.max_level, self._count],
+                    dtype=np.int64,
+                ),
+                levels=np.array(self._levels, dtype=np.int32),
+                link_counts=np.array(link_counts, dtype=np.int32),
+                link_data=np.array(link_data, dtype=np.int32),
+                deleted=np.array(sorted(self.deleted), dtype=np.int64),
+                vectors=self.vectors if include_vectors else np.zeros((0, self.dimensions), dtype=np.float32),
+            )
+
+    @staticmethod
+    def load(path: str | Path, vectors: np.ndarray | None = None) -> "HNSWIndex":
+        with np.load(path) as data:
+            dimensions, m, ef_construction, ef_search, entry_point, max_level, count = data["params"].tolist()
+            index = HNSWIndex(dimensions, m, ef_construction, ef_search)
+            index.entry_point = None if entry_point < 0 else entry_point
+            index.max_level = max_level
+            index._count = count
+            index._levels = data["levels"].tolist()
+            index.deleted = set(data["deleted"].tolist())
+            index._vectors = data["vectors"] if vectors is None else vectors
+            link_counts = data["link_counts"].tolist()
+            link_data = data["link_data"].tolist()
+
+        if len(index._vectors) < count:
+            raise ValueError(f"Expected {count} vectors for the HNSW graph, got {len(index._vectors)}")
+        position = 0
+        counts = iter(link_counts)
+        for level in index._levels:
+            node_links = []
+            for _ in range(level + 1):
+                length = next(counts)
+                node_links.append(link_data[position : position + length])
+                position += length
+            index._links.append(node_links)
+        return index
+
+    @staticmethod
+    def build(
+        vectors: np.ndarray, m: int = 16, ef_construction: int = 200, ef_search: int = 64
+    ) -> "HNSWIndex":
+        index = HNSWIndex(vectors.shape[1], m, ef_construction, ef_search)
+        index.add_many(normalize(np.asarray(vectors, dtype=np.float32)))
+        return index
+
+
+def get_hnsw_path(index_path: str | Path, m: int, ef_construction: int) -> Path:
+    """
+    File of the HNSW graph of a local index, there is one graph per build configuration.
+    """
+    return Path(index_path) / f"hnsw_m{m}_efc{ef_construction}.npz"
+
+
+def build_hnsw_index(index_path: str | Path, m: int, ef_construction: int) -> HNSWIndex:
+    """
+    Builds and saves the HNSW graph of a local index. Building takes minutes for large indexes, thus it is done offline (`build_local_index --hnsw`), never on the request path.
+    """
+    index = load_local_index(str(index_path))
+    path = get_hnsw_path(index_path, m, ef_construction)
+    _logger.info(f"Building HNSW graph '{path}' for {len(index)} documents")
+    graph = HNSWIndex(index.dimensions, m, ef_construction)
+    graph.add_many(index.embeddings)
+    graph.save(path, include_vectors=False)
+    return graph
+
+
+@lru_cache(maxsize=32)
+def load_hnsw_index(index_path: str, m: int, ef_construction: int) -> HNSWIndex:
+    """
+    Opens the HNSW graph of a local index once per process. The graph shares the memory-mapped embeddings of the index.
+
+    Raises an error, if the graph was not built (see `build_hnsw_index`) or does not match the index.
+    """
+    index = load_local_index(index_path)
+    path = get_hnsw_path(index_path, m, ef_construction)
+    build_hint = (
+        f"build it with `python -m retrieval.build_local_index {index_path} --hnsw "
+        f"--hnsw-m {m} --hnsw-ef-construction {ef_construction}`"
+    )
+    if not path.exists():
+        raise FileNotFoundError(f"HNSW graph '{path}' does not exist, {build_hint}")
+    if is_outdated(path, index_path):
+        raise ValueError(f"HNSW graph '{path}' is older than the index, {build_hint}")
+    graph = HNSWIndex.load(path, vectors=index.embeddings)
+    if graph._count != len(index) or graph.dimensions != index.dimensions:
+        raise ValueError(
+            f"HNSW graph '{path}' does not match the index ({graph._count} instead of {len(index)} documents), {build_hint}"
+        )
+    return graph
@@ -0,0 +1,181 @@
+"""
+In-process vector index, which is stored as a directory of:
+
+- `embeddings.f32`: normalized float32 embeddings, one row per document (raw, row-major)
+- `documents.json`: the documents in the same order as the embeddings
+- `meta.json`: number of documents, dimensions and the embedding model
+
+Build an index with `python -m retrieval.build_local_index <documents.json> <output directory>`.
+"""
+
+import json
+import os
+from datetime import datetime, UTC
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from internal_shared.models.chat import RetrieverConfig
+
+EMBEDDINGS_FILE = "embeddings.f32"
+DOCUMENTS_FILE = "documents.json"
+META_FILE = "meta.json"
+
+
+def get_index_path(retriever: RetrieverConfig) -> Path:
+    """
+    Directory of the local index of a retriever.
+    """
+    if retriever.local_index is not None and retriever.local_index.path:
+        return Path(retriever.local_index.path)
+    return Path(os.getenv("LOCAL_INDEX_DIR", "indexes")) / retriever.index_name
+
+
+def similarity_to_score(similarities: np.ndarray) -> np.ndarray:
+    """
+    Scales cosine similarities like Azure AI Search (1 / (1 + cosine distance)), thus thresholds can be shared between VECTOR and LOCAL retrievers.
+    """
+    return 1.0 / (2.0 - similarities)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def to_query_vector(query: List[float] | np.ndarray) -> np.ndarray:
+    """
+    Converts a query embedding to a normalized float32 vector.
+    """
+    if not isinstance(query, np.ndarray):
+        # faster than np.asarray for the lists returned by the embedding clients
+        query = np.fromiter(query, dtype=np.float32, count=len(query))
+    return normalize(query.astype(np.float32, copy=False))
+
+
+def mean_vector(vectors: List[List[float]] | np.ndarray) -> np.ndarray:
+    """
+    Normalized mean of the normalized vectors, i.e. every vector has the same weight.
+    """
+    return normalize(normalize(np.asarray(vectors, dtype=np.float32)).mean(axis=0))
+
+
+def top_k_indices(similarities: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the `top_k` highest similarities, highest first. Only the top k are sorted, instead of all similarities.
+    """
+    top_k = min(top_k, len(similarities))
+    if top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+    return indices[np.argsort(-similarities[indices])]
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine search over a memory-mapped float32 matrix.
+
+    The matrix is not read into memory on load, the operating system pages it in on the first queries. Since the embeddings are normalized, the cosine similarity is a single matrix-vector product.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path / META_FILE, "r", encoding="utf-8") as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        with open(self.path / DOCUMENTS_FILE, "r", encoding="utf-8") as f:
+            self.documents: List[Dict[str, Any]] = json.load(f)
+        # plain ndarray view of the memmap, which avoids the overhead of the memmap subclass in every product
+        self.embeddings = np.asarray(
+            np.memmap(
+                self.path / EMBEDDINGS_FILE,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.meta["count"], self.meta["dimensions"]),
+            )
+        )
+
+    @property
+    def dimensions(self) -> int:
+        return self.meta["dimensions"]
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def search(self, query: List[float] | np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Returns the indices and cosine similarities of the `top_k` most similar documents.
+        """
+        similarities = self.embeddings @ to_query_vector(query)
+        indices = top_k_indices(similarities, top_k)
+        return [(int(i), float(similarities[i])) for i in indices]
+
+    @staticmethod
+    def write(
+        path: str | Path,
+        documents: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        embedding_model: str | None = None,
+    ) -> None:
+        """
+        Writes the documents and their embeddings as local index.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        vectors.tofile(path / EMBEDDINGS_FILE)
+        with open(path / DOCUMENTS_FILE, "w", encoding="utf-8") as f:
+            json.dump(documents, f, ensure_ascii=False)
+        with open(path / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "count": len(documents),
+                    "dimensions": int(vectors.shape[1]),
+                    "embedding_model": embedding_model,
+                    "created_at": datetime.now(UTC).isoformat(),
+                },
+                f,
+            )
+
+
+class PrefixVectorIndex:
+    """
+    Two-stage search for Matryoshka embeddings (e.g. `text-embedding-3-*`), whose leading dimensions are an embedding on their own.
+
+    The renormalized prefixes of all embeddings are held in memory and shortlist candidates, which are reranked with the full (memory-mapped) embeddings.
+    """
+
+    def __init__(self, vectors: np.ndarray, prefix_dims: int):
+        self.vectors = vectors
+        self.prefix_dims = min(prefix_dims, vectors.shape[1])
+        self.prefixes = normalize(np.array(vectors[:, : self.prefix_dims], dtype=np.float32))
+
+    def search(
+        self, query: List[float] | np.ndarray, top_k: int, shortlist_size: int = 100
+    ) -> List[Tuple[int, float]]:
+        query = to_query_vector(query)
+        coarse = self.prefixes @ normalize(query[: self.prefix_dims])
+        # sorted candidates read the memory-mapped embeddings sequentially
+        candidates = np.sort(top_k_indices(coarse, max(shortlist_size, top_k)))
+        similarities = self.vectors[candidates] @ query
+        indices = top_k_indices(similarities, top_k)
+        return [(int(candidates[i]), float(similarities[i])) for i in indices]
+
+
+@lru_cache(maxsize=32)
+def load_local_index(path: str) -> LocalVectorIndex:
+    """
+    Opens a local index once per process, thus retrievers of the same index share it.
+    """
+    return LocalVectorIndex(path)
+
+
+def is_outdated(path: str | Path, index_path: str | Path) -> bool:
+    """
+    Whether a file, which was derived from a local index (e.g. its HNSW graph), is older than the embeddings of the index.
+    """
+    return Path(path).stat().st_mtime < (Path(index_path) / EMBEDDINGS_FILE).stat().st_mtime
+
+
+@lru_cache(maxsize=32)
+def load_prefix_index(path: str, prefix_dims: int) -> PrefixVectorIndex:
+    return PrefixVectorIndex(load_local_index(path).embeddings, prefix_dims)
@@ -1,5 +1,7 @@
+import re
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
 from langchain_core.messages import AIMessage, BaseMessage
 from langchain.prompts import (
     ChatPromptTemplate,
@@ -7,7 +9,10 @@ from langchain.prompts import (
     PromptTemplate,
 )
 from llm import invoke_prompt, invoke_prompt_async
-from internal_shared.models.chat import PreRetrievalType
+from internal_shared.models.ai import AvailableModels
+from internal_shared.models.chat import HypothesisResult, PreRetrievalType
+from .curated import count_tokens
+from .rewrite_cache import create_rewrite_cache_from_env
 
 
 class PreRetrievalStrategy(ABC):
@@ -15,6 +20,11 @@ class PreRetrievalStrategy(ABC):
     Abstract class for pre-retrieval strategies.
     """
 
+    # whether the completions are cached, see `rewrite_cache.py`
+    cacheable: bool = True
+    # part of the cache key, increment it whenever the prompt (or the cached completion) of the strategy changes
+    prompt_version: int = 1
+
     @abstractmethod
     def execute(self, query: str) -> str:
         """
@@ -29,12 +39,38 @@ class PreRetrievalStrategy(ABC):
         """
         pass
 
+    def complete(self, query: str) -> str:
+        """
+        The LLM completion of the strategy, which is cached. It must not contain the query, since cached completions are shared by (nearly) identical queries.
+        """
+        return self.execute(query)
+
+    async def complete_async(self, query: str) -> str:
+        """
+        Asynchronous variant of `complete`.
+        """
+        return await self.execute_async(query)
+
+    def format_query(self, query: str, completion: str) -> str:
+        """
+        Turns the (possibly cached) completion into the result of the strategy for this query.
+        """
+        return completion
+
+    def split_queries(self, rewritten: str) -> List[str]:
+        """
+        Splits the result of the strategy into the queries, which are searched separately.
+        """
+        return [rewritten]
+
 
 class DefaultPreRetrievalStrategy(PreRetrievalStrategy):
     """
     Default pre-retrieval strategy. No modifications to the query.
     """
 
+    cacheable = False
+
     def execute(self, query: str) -> str:
         return query
 
@@ -49,6 +85,9 @@ class QueryExpansionPreRetrievalStrategy(PreRetrievalStrategy):
     Compared to approaches like PRF, query expansion with LLMs is more flexible and can be used to expand queries with more complex semantics. This approach also relies on "general-purpose" LLMs, rather than specialized models for query expansion.
     """
 
+    # 2: the cache holds the completion instead of the expanded query
+    prompt_version = 2
+
     def _get_messages(self, query: str) -> List:
         return [
             AIMessage(
@@ -56,18 +95,22 @@ class QueryExpansionPreRetrievalStrategy(PreRetrievalStrategy):
             ),
         ]
 
-    def _format_query(self, query: str, response: str) -> str:
-        return (f"{query} " * 5) + response
+    def complete(self, query: str) -> str:
+        return invoke_prompt(self._get_messages(query)).content
+
+    async def complete_async(self, query: str) -> str:
+        response = await invoke_prompt_async(self._get_messages(query))
+        return response.content
+
+    def format_query(self, query: str, completion: str) -> str:
+        # the query is repeated by the strategy, thus it is added after the cache lookup
+        return (f"{query} " * 5) + completion
 
     def execute(self, query: str) -> str:
-        messages = self._get_messages(query)
-        response = invoke_prompt(messages)
-        return (f"{query} " * 5) + response.content
+        return self.format_query(query, self.complete(query))
 
     async def execute_async(self, query: str) -> str:
-        messages = self._get_messages(query)
-        response = await invoke_prompt_async(messages)
-        return self._format_query(query, response.content)
+        return self.format_query(query, await self.complete_async(query))
 
 
 class RewriteRetrieveReadPreRetrievalStrategy(PreRetrievalStrategy):
@@ -101,6 +144,20 @@ class RewriteRetrieveReadPreRetrievalStrategy(PreRetrievalStrategy):
             )
         ]
 
+    def split_queries(self, rewritten: str) -> List[str]:
+        """
+        The queries are separated by ';' and end with '**', e.g. "Thought: ... Query: query 1; query 2**". Duplicates are searched once.
+        """
+        text = rewritten.split("**")[0]
+        if "Query:" in text:
+            text = text.rsplit("Query:", 1)[1]
+        queries = []
+        for query in text.split(";"):
+            query = query.strip()
+            if query and query not in queries:
+                queries.append(query)
+        return queries or [rewritten]
+
     def execute(self, query: str) -> str:
         messages = self._get_messages(query, use_few_shot=False)
         response = invoke_prompt(messages)
@@ -185,10 +242,45 @@ class HydePreRetrievalStrategy(PreRetrievalStrategy):
     Hypothetical Interface Documentation:  
     """
 
+    HYPOTHETICAL_INTERFACES = """  
+    Based on the following query, please write {count} different hypothetical C# interface documentations that might answer the query. Separate the documentations with a line containing only "---".  
+    
+    Query: {question}  
+    Hypothetical Interface Documentations:  
+    """
+
+    HYPOTHESIS_SEPARATOR = re.compile(r"^\s*---\s*$", re.MULTILINE)
+
     def generate_prompt(self, query: str) -> str:
         template = PromptTemplate.from_template(self.HYPOTHETICAL_INTERFACE)
         return template.format(question=query)
 
+    async def generate_hypotheses_async(
+        self, query: str, count: int
+    ) -> List[HypothesisResult]:
+        """
+        Generates `count` hypothetical documents within a single completion, instead of one completion per document.
+
+        The prompt tokens are shared equally by the hypotheses.
+        """
+        template = PromptTemplate.from_template(self.HYPOTHETICAL_INTERFACES)
+        prompt = template.format(question=query, count=count)
+        result = await invoke_prompt_async(prompt)
+        hypotheses = [
+            h.strip() for h in self.HYPOTHESIS_SEPARATOR.split(result.content) if h.strip()
+        ][:count] or [result.content]
+
+        token_usage = result.response_metadata.get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens") or count_tokens(prompt)
+        return [
+            HypothesisResult(
+                text=hypothesis,
+                prompt_tokens=prompt_tokens // len(hypotheses),
+                completion_tokens=count_tokens(hypothesis),
+            )
+            for hypothesis in hypotheses
+        ]
+
     def execute(self, query: str) -> str:
         prompt = self.generate_prompt(query)
         return invoke_prompt(prompt).content
@@ -256,9 +348,14 @@ class PreRetrievalStrategyFactory:
                 return DefaultPreRetrievalStrategy()
 
 
+_cache = create_rewrite_cache_from_env()
+
+
 class PreRetrievalStep:
     """
     Facade class to execute pre-retrieval strategies.
+
+    The rewrites of the strategies are cached, see `rewrite_cache.py`.
     """
 
     @staticmethod
@@ -267,12 +364,128 @@ class PreRetrievalStep:
         Execute a pre-retrieval strategy based on the given configuration.
         """
         pre = PreRetrievalStrategyFactory.create(strategy_type)
-        return pre.execute(query)
+        if not pre.cacheable or not _cache.enabled:
+            return pre.execute(query)
+
+        completion = _cache.get(strategy_type.value, pre.prompt_version, query)
+        if completion is None:
+            start = time.perf_counter()
+            completion = pre.complete(query)
+            _cache.set(
+                strategy_type.value,
+                pre.prompt_version,
+                query,
+                completion,
+                (time.perf_counter() - start) * 1000,
+            )
+        return pre.format_query(query, completion)
 
     @staticmethod
     async def execute_async(strategy_type: PreRetrievalType, query: str) -> str:
         """
         Execute a pre-retrieval strategy based on the given configuration asynchronously.
         """
+        rewritten, _ = await PreRetrievalStep.execute_cached_async(strategy_type, query)
+        return rewritten
+
+    @staticmethod
+    async def execute_cached_async(
+        strategy_type: PreRetrievalType,
+        query: str,
+        query_vector: List[float] | None = None,
+        embedding_model: AvailableModels | None = None,
+    ) -> Tuple[str, bool]:
+        """
+        Execute a pre-retrieval strategy asynchronously, unless the rewrite of the query is cached.
+
+        :param query_vector: The embedding of the query, which finds the rewrites of nearly identical queries (if enabled).
+        :param embedding_model: The model of `query_vector`, only embeddings of the same model are compared.
+        :return: The rewritten query and whether it was served from the cache.
+        """
+        pre = PreRetrievalStrategyFactory.create(strategy_type)
+        if not pre.cacheable or not _cache.enabled:
+            return await pre.execute_async(query), False
+        completion, cache_hit = await PreRetrievalStep._cached_async(
+            strategy_type.value,
+            pre.prompt_version,
+            query,
+            query_vector,
+            embedding_model,
+            lambda: pre.complete_async(query),
+        )
+        return pre.format_query(query, completion), cache_hit
+
+    @staticmethod
+    async def generate_hypotheses_async(
+        query: str,
+        count: int,
+        query_vector: List[float] | None = None,
+        embedding_model: AvailableModels | None = None,
+    ) -> Tuple[List[HypothesisResult], bool]:
+        """
+        Generate several hypothetical documents for the query with a single completion (HYDE), unless they are cached.
+
+        :return: The hypotheses and whether they were served from the cache.
+        """
+        pre = HydePreRetrievalStrategy()
+        if not _cache.enabled:
+            return await pre.generate_hypotheses_async(query, count), False
+
+        async def generate() -> List[Dict[str, Any]]:
+            hypotheses = await pre.generate_hypotheses_async(query, count)
+            return [h.model_dump() for h in hypotheses]
+
+        hypotheses, cache_hit = await PreRetrievalStep._cached_async(
+            f"{PreRetrievalType.HYDE.value}:{count}",
+            pre.prompt_version,
+            query,
+            query_vector,
+            embedding_model,
+            generate,
+        )
+        return [HypothesisResult.model_validate(h) for h in hypotheses], cache_hit
+
+    @staticmethod
+    async def _cached_async(
+        strategy: str,
+        version: int,
+        query: str,
+        query_vector: List[float] | None,
+        embedding_model: AvailableModels | None,
+        rewrite: Callable[[], Awaitable[Any]],
+    ) -> Tuple[Any, bool]:
+        model = embedding_model.value if embedding_model else None
+        cached = _cache.get(strategy, version, query, query_vector, model)
+        if cached is not None:
+            return cached, True
+        start = time.perf_counter()
+        rewritten = await rewrite()
+        _cache.set(
+            strategy,
+            version,
+            query,
+            rewritten,
+            (time.perf_counter() - start) * 1000,
+            query_vector,
+            model,
+        )
+        return rewritten, False
+
+    @staticmethod
+    def uses_query_embedding() -> bool:
+        """
+        Whether the rewrite cache matches nearly identical queries by their embedding.
+        """
+        return _cache.uses_embeddings
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        return {"rewrite_cache": _cache.stats.to_dict()}
+
+    @staticmethod
+    def split_queries(strategy_type: PreRetrievalType, rewritten: str) -> List[str]:
+        """
+        Split the result of a pre-retrieval strategy into its sub-queries (only REWRITE_RETRIEVE_READ creates several).
+        """
         pre = PreRetrievalStrategyFactory.create(strategy_type)
-        return await pre.execute_async(query)
+        return pre.split_queries(rewritten)
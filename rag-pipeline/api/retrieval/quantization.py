@@ -0,0 +1,260 @@
+"""
+Compressed codes of the embeddings of a local index, which are scored instead of the float32 embeddings.
+
+- int8 (scalar quantization): every dimension is mapped linearly to 256 levels, i.e. 4x smaller.
+- PQ (product quantization): every vector is split into subvectors, which are replaced by the id of their nearest centroid, i.e. one byte per subvector (e.g. 96 bytes instead of 12 KB for 3072 dimensions).
+
+The approximate scores shortlist candidates, which are optionally rescored with the full-precision embeddings. The embeddings stay memory-mapped, thus only the rows of the candidates are read.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+from internal_shared.logger import get_logger
+from internal_shared.models.chat import VectorQuantization
+from .local_index import is_outdated, load_local_index, to_query_vector, top_k_indices
+
+_logger = get_logger(__name__)
+
+# rows, which are decoded at once, this bounds the temporary memory of a search
+BLOCK_SIZE = 32768
+
+
+class ScalarQuantizer:
+    """
+    Maps every dimension linearly from its observed range to int8.
+    """
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = offset.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @staticmethod
+    def train(vectors: np.ndarray) -> "ScalarQuantizer":
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        return ScalarQuantizer(low, np.maximum(high - low, 1e-12) / 255)
+
+    @property
+    def nbytes(self) -> int:
+        return self.offset.nbytes + self.scale.nbytes
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((vectors - self.offset) / self.scale) - 128
+        return np.clip(levels, -128, 127).astype(np.int8)
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # q · ((c + 128) * scale + offset) = c · (q * scale) + constant
+        weights = query * self.scale
+        constant = 128 * weights.sum() + query @ self.offset
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_SIZE):
+            block = codes[start : start + BLOCK_SIZE]
+            scores[start : start + len(block)] = block.astype(np.float32) @ weights
+        return scores + constant
+
+    def to_arrays(self) -> dict:
+        return {"offset": self.offset, "scale": self.scale}
+
+
+class ProductQuantizer:
+    """
+    Splits the vectors into `subvectors` parts, which are encoded as the id of their nearest of 256 centroids (trained with k-means).
+    """
+
+    def __init__(self, centroids: np.ndarray):
+        # shape: subvectors x centroids x dimensions of a subvector
+        self.centroids = centroids.astype(np.float32)
+
+    @staticmethod
+    def train(
+        vectors: np.ndarray,
+        subvectors: int,
+        centroids: int = 256,
+        iterations: int = 20,
+        sample_size: int = 20000,
+        seed: int = 42,
+    ) -> "ProductQuantizer":
+        if vectors.shape[1] % subvectors:
+            raise ValueError(
+                f"Dimensions ({vectors.shape[1]}) are not divisible by the number of subvectors ({subvectors})"
+            )
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        centroids = min(centroids, len(vectors))
+        parts = vectors.reshape(len(vectors), subvectors, -1).transpose(1, 0, 2)
+        return ProductQuantizer(
+            np.stack([_kmeans(part, centroids, iterations, rng) for part in parts])
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes
+
+    def _assign(self, parts: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # the squared norm of the parts does not change the nearest centroid
+        distances = (centroids**2).sum(axis=1) - 2 * parts @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subvectors = len(self.centroids)
+        codes = np.empty((len(vectors), subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block = np.asarray(vectors[start : start + BLOCK_SIZE], dtype=np.float32)
+            parts = block.reshape(len(block), subvectors, -1)
+            for s in range(subvectors):
+                codes[start : start + len(block), s] = self._assign(parts[:, s], self.centroids[s])
+        return codes
+
+    def scores(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # asymmetric distance: the similarities of the query parts to all centroids are looked up per code
+        table = np.einsum("skd,sd->sk", self.centroids, query.reshape(len(self.centroids), -1))
+        subvectors = np.arange(len(self.centroids))
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_SIZE):
+            block = codes[start : start + BLOCK_SIZE]
+            scores[start : start + len(block)] = table[subvectors, block].sum(axis=1)
+        return scores
+
+    def to_arrays(self) -> dict:
+        return {"centroids": self.centroids}
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (centroids**2).sum(axis=1) - 2 * vectors @ centroids.T
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # empty clusters keep their centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class QuantizedVectorIndex:
+    """
+    Scores the codes of all vectors and rescores the best candidates with the full-precision `vectors` (if given).
+    """
+
+    def __init__(
+        self,
+        quantizer: ScalarQuantizer | ProductQuantizer,
+        codes: np.ndarray,
+        vectors: np.ndarray | None = None,
+    ):
+        self.quantizer = quantizer
+        self.codes = codes
+        self.vectors = vectors
+
+    @staticmethod
+    def build(
+        vectors: np.ndarray,
+        quantization: VectorQuantization,
+        pq_subvectors: int = 96,
+    ) -> "QuantizedVectorIndex":
+        match quantization:
+            case VectorQuantization.INT8:
+                quantizer = ScalarQuantizer.train(vectors)
+            case VectorQuantization.PQ:
+                quantizer = ProductQuantizer.train(vectors, pq_subvectors)
+            case _:
+                raise ValueError(f"Unsupported quantization: {quantization}")
+        return QuantizedVectorIndex(quantizer, quantizer.encode(vectors), vectors)
+
+    @property
+    def memory_bytes(self) -> int:
+        """
+        Memory of the codes and the quantizer, the memory-mapped vectors are not included.
+        """
+        return self.codes.nbytes + self.quantizer.nbytes
+
+    def search(
+        self, query: List[float] | np.ndarray, top_k: int, rescore_candidates: int = 0
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the indices and (approximate, unless rescored) cosine similarities of the `top_k` most similar vectors.
+
+        With rescoring, at least `top_k` candidates are rescored, even if `rescore_candidates` is smaller.
+        """
+        query = to_query_vector(query)
+        scores = self.quantizer.scores(query, self.codes)
+        if self.vectors is None or rescore_candidates <= 0:
+            indices = top_k_indices(scores, top_k)
+            return [(int(i), float(scores[i])) for i in indices]
+
+        # sorted candidates read the memory-mapped vectors sequentially
+        candidates = np.sort(top_k_indices(scores, max(rescore_candidates, top_k)))
+        similarities = self.vectors[candidates] @ query
+        indices = top_k_indices(similarities, top_k)
+        return [(int(candidates[i]), float(similarities[i])) for i in indices]
+
+    def save(self, path: str | Path) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, codes=self.codes, **self.quantizer.to_arrays())
+
+    @staticmethod
+    def load(path: str | Path, vectors: np.ndarray | None = None) -> "QuantizedVectorIndex":
+        with np.load(path) as data:
+            if "centroids" in data:
+                quantizer = ProductQuantizer(data["centroids"])
+            else:
+                quantizer = ScalarQuantizer(data["offset"], data["scale"])
+            return QuantizedVectorIndex(quantizer, data["codes"], vectors)
+
+
+def get_quantized_path(
+    index_path: str | Path, quantization: VectorQuantization, pq_subvectors: int
+) -> Path:
+    if quantization == VectorQuantization.PQ:
+        return Path(index_path) / f"quantized_pq{pq_subvectors}.npz"
+    return Path(index_path) / f"quantized_{quantization.value}.npz"
+
+
+def build_quantized_index(
+    index_path: str | Path, quantization: VectorQuantization, pq_subvectors: int
+) -> QuantizedVectorIndex:
+    """
+    Trains the quantizer and saves the codes of a local index. Training takes minutes for large indexes, thus it is done offline (`build_local_index --quantization`), never on the request path.
+    """
+    index = load_local_index(str(index_path))
+    path = get_quantized_path(index_path, quantization, pq_subvectors)
+    _logger.info(f"Building {quantization.value} codes '{path}' for {len(index)} documents")
+    quantized = QuantizedVectorIndex.build(index.embeddings, quantization, pq_subvectors)
+    quantized.save(path)
+    return quantized
+
+
+@lru_cache(maxsize=32)
+def load_quantized_index(
+    index_path: str, quantization: VectorQuantization, pq_subvectors: int
+) -> QuantizedVectorIndex:
+    """
+    Opens the codes of a local index once per process.
+
+    Raises an error, if the codes were not built (see `build_quantized_index`) or do not match the index.
+    """
+    index = load_local_index(index_path)
+    if quantization == VectorQuantization.PQ and index.dimensions % pq_subvectors:
+        raise ValueError(
+            f"pq_subvectors ({pq_subvectors}) must divide the dimensions of the index '{index_path}' ({index.dimensions})"
+        )
+    path = get_quantized_path(index_path, quantization, pq_subvectors)
+    build_hint = (
+        f"build them with `python -m retrieval.build_local_index {index_path} "
+        f"--quantization {quantization.value} --pq-subvectors {pq_subvectors}`"
+    )
+    if not path.exists():
+        raise FileNotFoundError(f"Quantized codes '{path}' do not exist, {build_hint}")
+    if is_outdated(path, index_path):
+        raise ValueError(f"Quantized codes '{path}' are older than the index, {build_hint}")
+    quantized = QuantizedVectorIndex.load(path, index.embeddings)
+    if len(quantized.codes) != len(index):
+        raise ValueError(
+            f"Quantized codes '{path}' do not match the index ({len(quantized.codes)} instead of {len(index)} documents), {build_hint}"
+        )
+    return quantized
@@ -1,19 +1,63 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
 import os
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.aio import SearchClient as AsyncSearchClient
 from azure.search.documents.models import VectorizedQuery
 from neomodel import db, config
+from internal_shared.fakes import (
+    FakeAsyncSearchClient,
+    FakeGraphDatabase,
+    FakeSearchClient,
+    is_fake_retrieval_backend,
+)
+from internal_shared.logger import get_logger
+from internal_shared.models.ai import AvailableModels
 from internal_shared.models.chat import (
+    FusionMethod,
+    HybridConfig,
+    LocalIndexConfig,
+    LocalIndexEngine,
+    MultiQueryConfig,
     RetrievalConfig,
     RetrieverConfig,
     SearchResult,
     RetrieverType,
+    SubQueryResult,
+    VectorQuantization,
+)
+from internal_shared.utils.timer import atime_wrapper
+from llm import embed_texts_async
+from .bm25 import load_bm25_index
+from .cache import create_retrieval_cache_from_env
+from .clients import SearchTransportPool, get_search_transport_pool
+from .curated import (
+    CuratedSelection,
+    content_hash,
+    get_curated_document_index,
+    get_curated_documents_mode,
+    get_curated_documents_threshold,
 )
+from .function_lookup import FunctionLookup, get_function_lookup
+from .graph import GraphSessionPool, get_graph_session_pool
+from .hnsw import load_hnsw_index
+from .local_index import (
+    get_index_path,
+    load_local_index,
+    load_prefix_index,
+    similarity_to_score,
+    to_query_vector,
+)
+from .quantization import load_quantized_index
+
+_logger = get_logger(__name__)
 
 config.DATABASE_URL = os.getenv("NEO4J_URI")
 
@@ -23,9 +67,18 @@ class RetrievalStrategy(ABC):
     Abstract class for retrieval strategies.
     """
 
+    # whether the strategy searches by the query vector, otherwise the query is not embedded
+    requires_embedding: bool = True
+    # whether the results depend on the query text, which is then part of the cache key
+    uses_query_text: bool = False
+
     @abstractmethod
     def execute(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
         """
         Execute a synchronous search query.
@@ -33,13 +86,18 @@ class RetrievalStrategy(ABC):
         :param query: A list of float values representing the query vector.
         :param threshold: The minimum score threshold for considering a result.
         :param top_k: The number of top results to retrieve.
+        :param query_text: The query text (after pre-retrieval), used by lexical strategies.
         :return: A list of SearchResult objects.
         """
         pass
 
     @abstractmethod
     async def execute_async(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
         """
         Execute an asynchronous search query.
@@ -47,29 +105,108 @@ class RetrievalStrategy(ABC):
         :param query: A list of float values representing the query vector.
         :param threshold: The minimum score threshold for considering a result.
         :param top_k: The number of top results to retrieve.
+        :param query_text: The query text (after pre-retrieval), used by lexical strategies.
         :return: A list of SearchResult objects.
         """
         pass
 
+    async def aclose(self) -> None:
+        """
+        Release the clients and connections of the strategy.
+        """
+        pass
+
 
-class VectorDatabaseRetrievalStrategy(RetrievalStrategy):
-    def __init__(self, retriever: RetrieverConfig) -> None:
+class FieldMappingRetrievalStrategy(RetrievalStrategy):
+    """
+    Base class for strategies, which map search results to `SearchResult` objects with the `field_mappings` of the retriever.
+    """
+
+    retriver: RetrieverConfig
+
+    def _map_single_result(
+        self, result: Dict, threshold: float
+    ) -> Optional[SearchResult]:
+        if "@search.score" not in result:
+            return None
+
+        mapped_results = {}
+
+        for field, mapping in self.retriver.field_mappings.items():
+            value = self._get_nested_value(result, mapping) or result.get(mapping, "")
+            mapped_results[field] = value
+
+        if result.get("@search.score", 0.0) < threshold:
+            return None
+
+        return SearchResult(
+            name=mapped_results.get("name", "N/A"),
+            summary=mapped_results.get("summary", ""),
+            content=mapped_results.get("content", ""),
+            score=float(result.get("@search.score", 0.0)),
+            type=self.retriver.retriever_type,
+        )
+
+    def _get_nested_value(self, d: Dict, keys: str) -> Optional[str]:
+        keys_list = keys.split(".")
+        for key in keys_list:
+            if isinstance(d, dict) and key in d:
+                d = d[key]
+            else:
+                return None
+        return d
+
+
+class VectorDatabaseRetrievalStrategy(FieldMappingRetrievalStrategy):
+    def __init__(
+        self,
+        retriever: RetrieverConfig,
+        transport_pool: SearchTransportPool | None = None,
+    ) -> None:
         self.retriver = retriever
+        self.endpoint = os.getenv("AZURE_AI_SEARCH_ENDPOINT")
+        self.transport_pool = transport_pool or get_search_transport_pool()
+        self._async_search_client = None
+        self._async_search_client_loop = None
+
+        if is_fake_retrieval_backend():
+            self.search_client = FakeSearchClient(index_name=self.retriver.index_name)
+            return
 
         self.search_client = SearchClient(
-            endpoint=os.getenv("AZURE_AI_SEARCH_ENDPOINT"),
+            endpoint=self.endpoint,
             index_name=self.retriver.index_name,
             credential=AzureKeyCredential(os.getenv("AZURE_AI_SEARCH_API_KEY")),
+            transport=self.transport_pool.get_sync_transport(self.endpoint),
         )
 
-        self.async_search_client = AsyncSearchClient(
-            endpoint=os.getenv("AZURE_AI_SEARCH_ENDPOINT"),
-            index_name=self.retriver.index_name,
-            credential=AzureKeyCredential(os.getenv("AZURE_AI_SEARCH_API_KEY")),
-        )
+    @property
+    def async_search_client(self) -> AsyncSearchClient:
+        """
+        Long-lived async client of the current event loop, sharing the pooled transport of the endpoint.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_search_client is None or self._async_search_client_loop is not loop:
+            if is_fake_retrieval_backend():
+                self._async_search_client = FakeAsyncSearchClient(
+                    index_name=self.retriver.index_name
+                )
+            else:
+                self._async_search_client = AsyncSearchClient(
+                    endpoint=self.endpoint,
+                    index_name=self.retriver.index_name,
+                    credential=AzureKeyCredential(os.getenv("AZURE_AI_SEARCH_API_KEY")),
+                    transport=self.transport_pool.get_async_transport(self.endpoint),
+                )
+            self._async_search_client_loop = loop
+        return self._async_search_client
 
     def execute(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
         vector_query = self._get_vectorized_query(query, top_k)
         results = self.search_client.search(
@@ -84,23 +221,35 @@ class VectorDatabaseRetrievalStrategy(RetrievalStrategy):
         return documents
 
     async def execute_async(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
         """
         Making use of azure.search.documents.aio SearchClient, which relies on aiohttp.
+
+        The client is not closed after the query, thus its connections are reused by the next queries.
         """
         vector_query = self._get_vectorized_query(query, top_k)
-        async with self.async_search_client:
-            results = await self.async_search_client.search(
-                vector_queries=[vector_query],
-                select=self.retriver.retriever_select,
-            )
-            documents = []
-            async for result in results:
-                mapped_result = self._map_single_result(result, threshold)
-                if mapped_result is not None:
-                    documents.append(mapped_result)
-            return documents
+        results = await self.async_search_client.search(
+            vector_queries=[vector_query],
+            select=self.retriver.retriever_select,
+        )
+        documents = []
+        async for result in results:
+            mapped_result = self._map_single_result(result, threshold)
+            if mapped_result is not None:
+                documents.append(mapped_result)
+        return documents
+
+    async def aclose(self) -> None:
+        # clients of other (already closed) event loops can not be closed anymore
+        if self._async_search_client_loop is asyncio.get_running_loop():
+            await self._async_search_client.close()
+        self._async_search_client = None
+        self.search_client.close()
 
     def _get_vectorized_query(
         self, query: List[float], top_k: int, fields: str = "embedding"
@@ -111,91 +260,258 @@ class VectorDatabaseRetrievalStrategy(RetrievalStrategy):
             fields=fields,
         )
 
-    def _map_single_result(
-        self, result: Dict, threshold: float
-    ) -> Optional[SearchResult]:
-        if "@search.score" not in result:
-            return None
 
-        mapped_results = {}
-
-        for field, mapping in self.retriver.field_mappings.items():
-            value = self._get_nested_value(result, mapping) or result.get(mapping, "")
-            mapped_results[field] = value
+class GraphDatabaseRetrievalStrategy(RetrievalStrategy):
+    CYPHER_QUERY = """
+    CALL db.index.vector.queryNodes('interface_embeddings', $num_neighbors, $query_embedding)
+    YIELD node AS similarNode, score
+    MATCH (similarNode)-[r:REFERENCES]->(relatedNode)
+    WHERE score >= $threshold
+    RETURN similarNode.name AS name, similarNode.summary AS summary, relatedNode.name AS related_name, score
+    """
 
-        if result.get("@search.score", 0.0) < threshold:
-            return None
+    def __init__(self, session_pool: GraphSessionPool | None = None) -> None:
+        self.db = FakeGraphDatabase() if is_fake_retrieval_backend() else db
+        self.session_pool = session_pool or get_graph_session_pool()
 
-        return SearchResult(
-            name=mapped_results.get("name", "N/A"),
-            summary=mapped_results.get("summary", ""),
-            content=mapped_results.get("content", ""),
-            score=float(result.get("@search.score", 0.0)),
-            type=RetrieverType.VECTOR,
+    def execute(
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
+    ) -> List[SearchResult]:
+        # Execute the query
+        results, meta = self.db.cypher_query(
+            self.CYPHER_QUERY,
+            {"num_neighbors": top_k, "query_embedding": query, "threshold": threshold},
         )
 
-    def _get_nested_value(self, d: Dict, keys: str) -> Optional[str]:
-        keys_list = keys.split(".")
-        for key in keys_list:
-            if isinstance(d, dict) and key in d:
-                d = d[key]
-            else:
-                return None
-        return d
-
+        # Process the results
+        return [self._map_record(*result) for result in results]
 
-class GraphDatabaseRetrievalStrategy(RetrievalStrategy):
-    def execute(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+    async def execute_async(
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
-        cypher_query = """  
-        CALL db.index.vector.queryNodes('interface_embeddings', $num_neighbors, $query_embedding)  
-        YIELD node AS similarNode, score  
-        MATCH (similarNode)-[r:REFERENCES]->(relatedNode)  
-        WHERE score >= $threshold  
-        RETURN similarNode.name AS name, similarNode.summary AS summary, relatedNode.name AS related_name, score  
         """
+        Execute an asynchronous search query with the official async Neo4j driver.
 
-        # Execute the query
-        results, meta = db.cypher_query(
-            cypher_query,
+        The queries share a bounded pool of read sessions, instead of running the synchronous neomodel query in a thread.
+        """
+        records = await self.session_pool.read(
+            self.CYPHER_QUERY,
             {"num_neighbors": top_k, "query_embedding": query, "threshold": threshold},
         )
+        return [
+            self._map_record(r["name"], r["summary"], r["related_name"], r["score"])
+            for r in records
+        ]
 
-        # Process the results
-        documents = []
-        for result in results:
-            documents.append(
-                SearchResult(
-                    name=result[0],
-                    summary=result[1],
-                    content=f"{result[0]} ({result[1]}) references {result[2]}",
-                    score=result[3],
-                    type=RetrieverType.GRAPH,
-                )
+    def _map_record(
+        self, name: str, summary: str, related_name: str, score: float
+    ) -> SearchResult:
+        return SearchResult(
+            name=name,
+            summary=summary,
+            content=f"{name} ({summary}) references {related_name}",
+            score=score,
+            type=RetrieverType.GRAPH,
+        )
+
+
+class LocalVectorRetrievalStrategy(FieldMappingRetrievalStrategy):
+    """
+    In-process vector search over a memory-mapped local index, see `local_index.py`. The HNSW engine searches an approximate nearest neighbour graph (`hnsw.py`) instead of all embeddings, the exact engine optionally scores compressed codes (`quantization.py`) or truncated embeddings (`PrefixVectorIndex`).
+    """
+
+    def __init__(self, retriever: RetrieverConfig) -> None:
+        self.retriver = retriever
+        self.config = retriever.local_index or LocalIndexConfig()
+        index_path = str(get_index_path(retriever))
+        self.index = load_local_index(index_path)
+        self.graph = None
+        self.quantized = None
+        self.prefix_index = None
+        if self.config.engine == LocalIndexEngine.HNSW:
+            self.graph = load_hnsw_index(
+                index_path, self.config.m, self.config.ef_construction
+            )
+        elif self.config.quantization != VectorQuantization.NONE:
+            self.quantized = load_quantized_index(
+                index_path, self.config.quantization, self.config.pq_subvectors
             )
+        elif self.config.prefix_dims:
+            self.prefix_index = load_prefix_index(index_path, self.config.prefix_dims)
+
+    def search(self, query: List[float], top_k: int) -> List[Tuple[int, float]]:
+        if self.graph is not None:
+            return self.graph.search(query, top_k, self.config.ef_search)
+        if self.quantized is not None:
+            return self.quantized.search(query, top_k, self.config.rescore_candidates)
+        if self.prefix_index is not None:
+            return self.prefix_index.search(query, top_k, self.config.shortlist_size)
+        return self.index.search(query, top_k)
 
+    def execute(
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
+    ) -> List[SearchResult]:
+        hits = self.search(query, top_k)
+        scores = similarity_to_score(np.array([s for _, s in hits]))
+        return self._map_hits(
+            [(index, float(score)) for (index, _), score in zip(hits, scores)],
+            threshold,
+        )
+
+    def _map_hits(
+        self, hits: List[Tuple[int, float]], threshold: float
+    ) -> List[SearchResult]:
+        documents = []
+        for index, score in hits:
+            result = {**self.index.documents[index], "@search.score": score}
+            mapped_result = self._map_single_result(result, threshold)
+            if mapped_result is not None:
+                documents.append(mapped_result)
         return documents
 
     async def execute_async(
-        self, query: List[float], threshold: float = 0.5, top_k: int = 5
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
     ) -> List[SearchResult]:
         """
-        Execute an asynchronous search query by running the synchronous code in a separate thread.
-
-        Since neomodel does not support async calls, we run the synchronous method in a separate thread.
-        This should be safe to do, since reads are idempotent and do not modify the database.
-        https://neomodel.readthedocs.io/en/latest/transactions.html#explicit-transactions
+        The search takes microseconds for small corpora, thus it runs directly on the event loop.
         """
+        return self.execute(query, threshold, top_k, query_text)
 
-        loop = asyncio.get_running_loop()
-        executor = ThreadPoolExecutor()
 
-        # Run the synchronous method in a separate thread and await its completion
-        return await loop.run_in_executor(
-            executor, self.execute, query, threshold, top_k
+class HybridRetrievalStrategy(LocalVectorRetrievalStrategy):
+    """
+    Fuses the BM25 ranking (`bm25.py`) and the vector ranking of a local index, thus documents containing exact terms of the query (e.g. function names) are found, even if their embedding is not similar to the query.
+
+    The fused score is scaled to [0, 1], i.e. a document ranked first by both rankings scores 1.
+    """
+
+    uses_query_text = True
+
+    def __init__(self, retriever: RetrieverConfig) -> None:
+        super().__init__(retriever)
+        self.hybrid = retriever.hybrid or HybridConfig()
+        self.bm25 = load_bm25_index(
+            str(get_index_path(retriever)), self.hybrid.text_field
         )
 
+    def _fuse_rrf(
+        self, vector_hits: List[Tuple[int, float]], lexical_hits: List[Tuple[int, float]]
+    ) -> Dict[int, float]:
+        k = self.hybrid.rrf_k
+        scores: Dict[int, float] = {}
+        for hits, weight in [
+            (vector_hits, 1 - self.hybrid.lexical_weight),
+            (lexical_hits, self.hybrid.lexical_weight),
+        ]:
+            for rank, (index, _) in enumerate(hits):
+                scores[index] = scores.get(index, 0.0) + weight * (k + 1) / (k + rank + 1)
+        return scores
+
+    def _fuse_weighted(
+        self,
+        query: np.ndarray,
+        vector_hits: List[Tuple[int, float]],
+        lexical_hits: List[Tuple[int, float]],
+    ) -> Dict[int, float]:
+        similarities = dict(vector_hits)
+        lexical_only = [i for i, _ in lexical_hits if i not in similarities]
+        if lexical_only:
+            # documents found by BM25 only are scored with their exact similarity
+            exact = self.index.embeddings[lexical_only] @ query
+            similarities.update(zip(lexical_only, exact.tolist()))
+        max_lexical = max((s for _, s in lexical_hits), default=1.0)
+        lexical = {i: s / max_lexical for i, s in lexical_hits}
+        weight = self.hybrid.lexical_weight
+        return {
+            index: (1 - weight) * float(similarity_to_score(similarity))
+            + weight * lexical.get(index, 0.0)
+            for index, similarity in similarities.items()
+        }
+
+    def execute(
+        self,
+        query: List[float],
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
+    ) -> List[SearchResult]:
+        if not query_text:
+            return super().execute(query, threshold, top_k)
+
+        candidates = max(self.hybrid.candidates, top_k)
+        query = to_query_vector(query)
+        vector_hits = self.search(query, candidates)
+        lexical_hits = self.bm25.search(query_text, candidates)
+        match self.hybrid.fusion:
+            case FusionMethod.RRF:
+                scores = self._fuse_rrf(vector_hits, lexical_hits)
+            case FusionMethod.WEIGHTED:
+                scores = self._fuse_weighted(query, vector_hits, lexical_hits)
+        hits = sorted(scores.items(), key=lambda hit: hit[1], reverse=True)[:top_k]
+        return self._map_hits(hits, threshold)
+
+
+class FunctionLookupRetrievalStrategy(RetrievalStrategy):
+    """
+    Returns the DevExpress functions, whose names or keywords occur in the query, see `function_lookup.py`. The query is not embedded.
+    """
+
+    requires_embedding = False
+    uses_query_text = True
+
+    def __init__(self, lookup: FunctionLookup | None = None) -> None:
+        self.lookup = lookup or get_function_lookup()
+
+    def execute(
+        self,
+        query: List[float] | None,
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
+    ) -> List[SearchResult]:
+        if not query_text:
+            return []
+        return [
+            SearchResult(
+                name=function.name,
+                summary=function.description,
+                content=(
+                    f"{function.description} Example: {function.example}"
+                    if function.example
+                    else function.description
+                ),
+                score=score,
+                type=RetrieverType.FUNCTION_LOOKUP,
+            )
+            for function, score in self.lookup.search(query_text, top_k)
+            if score >= threshold
+        ]
+
+    async def execute_async(
+        self,
+        query: List[float] | None,
+        threshold: float = 0.5,
+        top_k: int = 5,
+        query_text: str | None = None,
+    ) -> List[SearchResult]:
+        return self.execute(query, threshold, top_k, query_text)
+
 
 class RetrievalStrategyFactory:
     """
@@ -209,33 +525,268 @@ class RetrievalStrategyFactory:
                 return VectorDatabaseRetrievalStrategy(cfg.retriever)
             case RetrieverType.GRAPH:
                 return GraphDatabaseRetrievalStrategy()
+            case RetrieverType.LOCAL:
+                return LocalVectorRetrievalStrategy(cfg.retriever)
+            case RetrieverType.HYBRID:
+                return HybridRetrievalStrategy(cfg.retriever)
+            case RetrieverType.FUNCTION_LOOKUP:
+                return FunctionLookupRetrievalStrategy()
             case _:
                 raise ValueError(f"Unknown retrieval type: {cfg}")
 
 
+def retriever_config_hash(retriever: RetrieverConfig) -> str:
+    """
+    Stable hash of a retriever configuration.
+    """
+    serialized = json.dumps(retriever.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[SearchResult]], k: int = 60
+) -> List[SearchResult]:
+    """
+    Fuses several rankings by their reciprocal ranks. Documents found by several rankings (same name and content) are returned once with their best score.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, SearchResult] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = content_hash(f"{document.name}\n{document.content}")
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank + 1)
+            if key not in documents or document.score > documents[key].score:
+                documents[key] = document
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class RetrievalStrategyRegistry:
+    """
+    Registry of long-lived retrieval strategies, keyed by the hash of their retriever configuration.
+
+    Creating a strategy builds its search clients, thus strategies are created once per configuration and reused by all requests. At most `max_strategies` are kept, the least recently used strategy is evicted and closed after `close_delay` seconds (requests, which still use it, can finish in the meantime).
+    """
+
+    def __init__(self, max_strategies: int = 64, close_delay: float = 60.0):
+        self.max_strategies = max_strategies
+        self.close_delay = close_delay
+        self._strategies: OrderedDict[str, RetrievalStrategy] = OrderedDict()
+        self._evicted: Dict[asyncio.Task, RetrievalStrategy] = {}
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get(self, cfg: RetrievalConfig) -> RetrievalStrategy:
+        key = retriever_config_hash(cfg.retriever)
+        strategy = self._strategies.get(key)
+        if strategy is None:
+            strategy = self._strategies[key] = RetrievalStrategyFactory.create(cfg)
+            self.created += 1
+            while len(self._strategies) > self.max_strategies:
+                self._evict(self._strategies.popitem(last=False)[1])
+        else:
+            self._strategies.move_to_end(key)
+            self.reused += 1
+        return strategy
+
+    def _evict(self, strategy: RetrievalStrategy) -> None:
+        self.evicted += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # synchronous callers can not close the async clients, they are released by the garbage collector
+            return
+        task = loop.create_task(self._close_later(strategy))
+        self._evicted[task] = strategy
+        task.add_done_callback(lambda t: self._evicted.pop(t, None))
+
+    async def _close_later(self, strategy: RetrievalStrategy) -> None:
+        await asyncio.sleep(self.close_delay)
+        try:
+            await strategy.aclose()
+        except Exception:
+            _logger.warning("Could not close an evicted retrieval strategy", exc_info=True)
+
+    async def aclose(self) -> None:
+        # evicted strategies, which are still waiting, are closed at once
+        for task in list(self._evicted):
+            task.cancel()
+        strategies = [*self._strategies.values(), *self._evicted.values()]
+        self._strategies, self._evicted = OrderedDict(), {}
+        for strategy in strategies:
+            await strategy.aclose()
+        await get_search_transport_pool().aclose()
+        await get_graph_session_pool().aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "strategies": len(self._strategies),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+            "search_connections": get_search_transport_pool().stats.to_dict(),
+            "graph_sessions": get_graph_session_pool().stats.to_dict(),
+        }
+
+
+def create_registry_from_env() -> RetrievalStrategyRegistry:
+    """
+    Creates the strategy registry based on the `RETRIEVAL_MAX_STRATEGIES` environment variable.
+    """
+    return RetrievalStrategyRegistry(int(os.getenv("RETRIEVAL_MAX_STRATEGIES", 64)))
+
+
+_registry = create_registry_from_env()
+_cache = create_retrieval_cache_from_env()
+
+
 class RetrievalStep:
     """
     Facade class to execute retrieval strategies.
     """
 
     @staticmethod
-    def execute(cfg: RetrievalConfig, query: List[float]) -> List[SearchResult]:
+    def execute(
+        cfg: RetrievalConfig, query: List[float], query_text: str | None = None
+    ) -> List[SearchResult]:
         """
         Execute a retrieval strategy based on the given configuration.
         """
-        retrieval = RetrievalStrategyFactory.create(cfg)
-        return retrieval.execute(query, cfg.threshold, cfg.top_k)
+        retrieval = _registry.get(cfg)
+        return retrieval.execute(query, cfg.threshold, cfg.top_k, query_text)
 
     @staticmethod
     async def execute_async(
-        cfg: RetrievalConfig, query: List[float]
+        cfg: RetrievalConfig, query: List[float], query_text: str | None = None
     ) -> List[SearchResult]:
         """
         Execute a retrieval strategy based on the given configuration asynchronously.
         """
-        retrieval = RetrievalStrategyFactory.create(cfg)
-        return await retrieval.execute_async(query, cfg.threshold, cfg.top_k)
+        retrieval = _registry.get(cfg)
+        return await retrieval.execute_async(
+            query, cfg.threshold, cfg.top_k, query_text
+        )
+
+    @staticmethod
+    async def execute_cached_async(
+        cfg: RetrievalConfig, query: List[float], query_text: str | None = None
+    ) -> Tuple[List[SearchResult], bool]:
+        """
+        Execute a retrieval strategy asynchronously, unless the result is cached (see `cache.py`).
+
+        :return: The documents and whether they were served from the cache.
+        """
+        retrieval = _registry.get(cfg)
+        if not _cache.enabled:
+            documents = await retrieval.execute_async(
+                query, cfg.threshold, cfg.top_k, query_text
+            )
+            return documents, False
+
+        key = _cache.build_key(
+            retriever_config_hash(cfg.retriever),
+            cfg.retriever,
+            query,
+            cfg.top_k,
+            cfg.threshold,
+            query_text if retrieval.uses_query_text else None,
+        )
+        documents = _cache.get(key)
+        if documents is not None:
+            return documents, True
+
+        start = time.perf_counter()
+        documents = await retrieval.execute_async(
+            query, cfg.threshold, cfg.top_k, query_text
+        )
+        _cache.set(key, documents, (time.perf_counter() - start) * 1000)
+        return documents, False
+
+    @staticmethod
+    async def execute_multi_query_async(
+        cfg: RetrievalConfig, queries: List[str]
+    ) -> Tuple[List[SearchResult], List[SubQueryResult]]:
+        """
+        Search all sub-queries concurrently and fuse their results by reciprocal rank fusion, see `MultiQueryConfig`.
+
+        The sub-queries are embedded within a single request.
+
+        :return: The `top_k` fused documents and the retrieval of every sub-query.
+        """
+        multi_query = cfg.multi_query or MultiQueryConfig()
+        queries = queries[: multi_query.max_queries]
+        vectors = [None] * len(queries)
+        if RetrievalStep.requires_embedding(cfg):
+            vectors = await embed_texts_async(queries, cfg.retriever.embedding_model)
+
+        async def search(query: str, vector: List[float] | None):
+            duration, (documents, cache_hit) = await atime_wrapper(
+                RetrievalStep.execute_cached_async, cfg, vector, query
+            )
+            return documents, SubQueryResult(
+                query=query,
+                retrieval_duration=duration,
+                documents=len(documents),
+                retrieval_cache_hit=cache_hit,
+            )
+
+        results = await asyncio.gather(
+            *(search(query, vector) for query, vector in zip(queries, vectors))
+        )
+        fused = reciprocal_rank_fusion(
+            [documents for documents, _ in results], multi_query.rrf_k
+        )
+        return fused[: cfg.top_k], [sub_query for _, sub_query in results]
+
+    @staticmethod
+    def bump_index_version(index_name: str, version: int) -> None:
+        """
+        Invalidate the cached results of an index, after its version was bumped.
+        """
+        _cache.bump_index_version(index_name, version)
+
+    @staticmethod
+    def requires_embedding(cfg: RetrievalConfig) -> bool:
+        """
+        Whether the retriever of the configuration searches by the query vector.
+        """
+        return _registry.get(cfg).requires_embedding
+
+    @staticmethod
+    async def aclose() -> None:
+        """
+        Close all long-lived strategies and their connections, e.g. on shutdown.
+        """
+        await _registry.aclose()
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        return {**_registry.get_stats(), "cache": _cache.get_stats()}
     
+    @staticmethod
+    async def select_curated_documents(
+        query: str,
+        query_vector: List[float] | None,
+        model: AvailableModels,
+        retrieved: List[str],
+        retrieved_names: Optional[List[str]] = None,
+    ) -> CuratedSelection:
+        """
+        Select the curated documents, which are relevant for the query and not yet retrieved, see `curated.py`.
+        """
+        if retrieved_names is None:
+            retrieved_names = []
+        index = get_curated_document_index(tuple(RetrievalStep.get_curated_documents()))
+        return await index.select(
+            query,
+            query_vector,
+            model,
+            retrieved,
+            retrieved_names,
+            threshold=get_curated_documents_threshold(),
+            mode=get_curated_documents_mode(),
+        )
+
     @staticmethod
     def get_curated_documents() -> List[str]:
         """
@@ -245,7 +796,7 @@ class RetrievalStep:
 
         Current basic "workaround" implementation for curated formula context. This is used, because sometimes the request has no similarity with "required" documents. Thus, an analysis lead to these curated documents.
 
-        For more "consistency", a check can be added, if a particular document is already in the retrieved documents. If so, this document can be skipped, as it is already present. Duplicates are not desired.
+        Use `select_curated_documents` to add only the relevant documents, which are not already retrieved.
         """
         return [
             "IsNullOrEmpty(String) Returns True if the specified String object is NULL or an empty string; otherwise, False is returned. Example: IsNullOrEmpty([Name])",
@@ -0,0 +1,227 @@
+"""
+Cache of pre-retrieval rewrites, keyed by the strategy, the version of its prompt and the normalized query.
+
+A rewrite is a pure function of these, thus common questions skip the rewrite completion entirely. Only the LLM completion is cached, the strategy applies its formatting (e.g. repeating the query) to the current query after the lookup, thus a cached entry never leaks the query of another request. Queries are normalized (case, whitespace, punctuation), and optionally, a query, whose embedding is nearly identical to the embedding of a cached query, gets the cached rewrite as well. The rewrites are stored in an in-memory LRU tier and a persistent SQLite tier (see `llm/cache.py`).
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from internal_shared.logger import get_logger
+from internal_shared.models.chat import PreRetrievalType
+from internal_shared.utils.helper_functions import get_cache_dir
+from llm.cache import LRUCache, SqliteCache
+from .local_index import to_query_vector
+
+_logger = get_logger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercased query without punctuation and with single spaces, e.g. "How do I use ToStr?" -> "how do i use tostr".
+    """
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+@dataclass
+class RewriteCacheStats:
+    """Hit/miss counters of the rewrite cache, including the saved rewrite latency."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    saved_latency_ms: float = 0.0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits + self.similar_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "hits": self.hits, "hit_rate": self.hit_rate}
+
+
+class RewriteCache:
+    """
+    Two-tier cache of pre-retrieval rewrites with a time-to-live per strategy.
+
+    Near-duplicate matching (`similarity_threshold`) compares the query embedding with the embeddings of the queries, which were rewritten by this process (at most `memory_entries` per strategy and embedding model).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        memory_entries: int = 1024,
+        disk_entries: int = 100_000,
+        ttl: float | None = 7 * 24 * 60 * 60,
+        strategy_ttls: Dict[str, float | None] | None = None,
+        similarity_threshold: float | None = None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.strategy_ttls = strategy_ttls or {}
+        self.similarity_threshold = similarity_threshold
+        self.memory_entries = memory_entries
+        self.stats = RewriteCacheStats()
+        self._memory: LRUCache[Dict[str, Any]] = LRUCache(memory_entries)
+        # strategy and embedding model -> key -> (expires at, normalized query embedding)
+        self._vectors: Dict[str, OrderedDict[str, Tuple[float | None, np.ndarray]]] = {}
+        self._disk: SqliteCache | None = None
+        try:
+            self._disk = SqliteCache(path, "pre_retrieval_rewrites", disk_entries)
+        except sqlite3.Error:
+            _logger.warning(
+                f"Could not open rewrite cache at '{path}'. Using in-memory cache only.",
+                exc_info=True,
+            )
+
+    @property
+    def uses_embeddings(self) -> bool:
+        return self.enabled and self.similarity_threshold is not None
+
+    def get_ttl(self, strategy: str) -> float | None:
+        # variants of a strategy (e.g. "hyde:3") share the TTL of the strategy
+        return self.strategy_ttls.get(strategy.split(":")[0], self.ttl)
+
+    def build_key(self, strategy: str, version: int, query: str) -> str:
+        payload = f"{strategy}\x1f{version}\x1f{normalize_query(query)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_entry(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry, False
+        if self._disk is not None and (entry := self._disk.get(key)) is not None:
+            expires_at = entry["expires_at"]
+            self._memory.set(key, entry, expires_at - time.time() if expires_at else None)
+            return entry, True
+        return None, False
+
+    @staticmethod
+    def _vector_namespace(strategy: str, version: int, embedding_model: str | None) -> str:
+        # embeddings of different models are not comparable
+        return f"{strategy}\x1f{version}\x1f{embedding_model or ''}"
+
+    def _find_similar(self, namespace: str, query_vector: List[float]) -> Optional[str]:
+        vectors = self._vectors.get(namespace)
+        if not vectors:
+            return None
+        now = time.time()
+        for key in [k for k, (expires_at, _) in vectors.items() if expires_at and expires_at < now]:
+            del vectors[key]
+        if not vectors:
+            return None
+        keys = list(vectors.keys())
+        similarities = np.stack([v for _, v in vectors.values()]) @ to_query_vector(query_vector)
+        best = int(similarities.argmax())
+        return keys[best] if similarities[best] >= self.similarity_threshold else None
+
+    def get(
+        self,
+        strategy: str,
+        version: int,
+        query: str,
+        query_vector: List[float] | None = None,
+        embedding_model: str | None = None,
+    ) -> Optional[Any]:
+        """
+        Returns the cached rewrite of the (normalized) query or, if `query_vector` is given, of a nearly identical query, whose embedding was created by the same `embedding_model`.
+        """
+        entry, from_disk = self._get_entry(self.build_key(strategy, version, query))
+        if entry is not None:
+            if from_disk:
+                self.stats.disk_hits += 1
+            else:
+                self.stats.memory_hits += 1
+        elif self.uses_embeddings and query_vector is not None:
+            similar_key = self._find_similar(
+                self._vector_namespace(strategy, version, embedding_model), query_vector
+            )
+            if similar_key is not None:
+                entry, _ = self._get_entry(similar_key)
+                if entry is not None:
+                    self.stats.similar_hits += 1
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self.stats.saved_latency_ms += entry["latency_ms"]
+        return entry["value"]
+
+    def set(
+        self,
+        strategy: str,
+        version: int,
+        query: str,
+        value: Any,
+        latency_ms: float,
+        query_vector: List[float] | None = None,
+        embedding_model: str | None = None,
+    ) -> None:
+        key = self.build_key(strategy, version, query)
+        ttl = self.get_ttl(strategy)
+        expires_at = time.time() + ttl if ttl is not None else None
+        entry = {"value": value, "latency_ms": latency_ms, "expires_at": expires_at}
+        self._memory.set(key, entry, ttl)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, entry, ttl)
+            except sqlite3.Error:
+                _logger.warning("Could not write to rewrite cache", exc_info=True)
+
+        if self.uses_embeddings and query_vector is not None:
+            namespace = self._vector_namespace(strategy, version, embedding_model)
+            vectors = self._vectors.setdefault(namespace, OrderedDict())
+            vectors[key] = (expires_at, to_query_vector(query_vector))
+            vectors.move_to_end(key)
+            while len(vectors) > self.memory_entries:
+                vectors.popitem(last=False)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        self._vectors.clear()
+        if self._disk is not None:
+            self._disk.clear()
+        self.stats = RewriteCacheStats()
+
+
+def _parse_ttl(value: str) -> float | None:
+    ttl = float(value)
+    return ttl if ttl > 0 else None
+
+
+def create_rewrite_cache_from_env() -> RewriteCache:
+    """
+    Creates the rewrite cache based on the `PRE_RETRIEVAL_CACHE_*` environment variables.
+    """
+    strategy_ttls = {
+        strategy.value: _parse_ttl(ttl)
+        for strategy in PreRetrievalType
+        if (ttl := os.getenv(f"PRE_RETRIEVAL_CACHE_TTL_SECONDS_{strategy.name}"))
+    }
+    similarity = os.getenv("PRE_RETRIEVAL_CACHE_SIMILARITY")
+    return RewriteCache(
+        path=os.getenv("PRE_RETRIEVAL_CACHE_PATH")
+        or get_cache_dir() / "pre_retrieval_cache.sqlite",
+        memory_entries=int(os.getenv("PRE_RETRIEVAL_CACHE_MEMORY_ENTRIES", 1024)),
+        disk_entries=int(os.getenv("PRE_RETRIEVAL_CACHE_DISK_ENTRIES", 100_000)),
+        ttl=_parse_ttl(os.getenv("PRE_RETRIEVAL_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60)),
+        strategy_ttls=strategy_ttls,
+        similarity_threshold=float(similarity) if similarity else None,
+        enabled=os.getenv("PRE_RETRIEVAL_CACHE_ENABLED", "true").lower() == "true",
+    )
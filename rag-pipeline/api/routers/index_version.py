@@ -0,0 +1,42 @@
+from typing import Dict
+from fastapi import APIRouter, Depends, status
+from internal_shared.db.index_versions import (
+    bump_index_version_async,
+    get_index_versions_async,
+)
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from dependencies import get_db
+from retrieval import RetrievalStep
+
+router = APIRouter(
+    prefix="/index_version",
+    tags=["index_version"],
+    responses={
+        status.HTTP_500_INTERNAL_SERVER_ERROR: {"description": "Database not found"}
+    },
+)
+
+
+@router.get(
+    "/",
+    description="Get the versions of all search indexes",
+    response_description="A dictionary with the version per index",
+    response_model=Dict[str, int],
+)
+async def get_index_versions(db: AsyncIOMotorDatabase = Depends(get_db)):
+    return await get_index_versions_async(db)
+
+
+@router.post(
+    "/{index_name}",
+    summary="Bump the version of a search index",
+    description="Bump the version of a search index after its documents changed, which invalidates the cached retrieval results of the index",
+    response_description="The new version of the index",
+    response_model=int,
+)
+async def bump_index_version(
+    index_name: str, db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    version = await bump_index_version_async(db, index_name)
+    RetrievalStep.bump_index_version(index_name, version)
+    return version
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from llm import get_llm_stats
+from retrieval import PreRetrievalStep, RetrievalStep
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+@router.get(
+    "/",
+    description="Get runtime statistics of the pipeline, e.g. cache hits and misses",
+    response_description="A dictionary with statistics per component",
+)
+async def get_metrics():
+    return {
+        "llm": get_llm_stats(),
+        "pre_retrieval": PreRetrievalStep.get_stats(),
+        "retrieval": RetrievalStep.get_stats(),
+    }
@@ -45,9 +45,10 @@ def render_basic_chat_charts():
                             "Duration": step["pre_retrieval_duration"],
                         }
                     )
+                    cached = " (cached)" if step.get("retrieval_cache_hit") else ""
                     steps_data.append(
                         {
-                            "Step": f"Step {i+1} - Retrieval",
+                            "Step": f"Step {i+1} - Retrieval{cached}",
                             "Duration": step["retrieval_duration"],
                         }
                     )
@@ -62,8 +63,13 @@ def render_basic_chat_charts():
                     {"Step": "Response Creation", "Duration": rd["response_duration"]}
                 )
                 steps_df = pd.DataFrame(steps_data)
+                cache_hits = sum(1 for step in steps if step.get("retrieval_cache_hit"))
                 with col2:
                     st.subheader("Retrieval Steps Duration")
+                    if cache_hits:
+                        st.caption(
+                            f"{cache_hits} of {len(steps)} retrieval steps served from cache"
+                        )
                     pie_chart = px.pie(
                         steps_df,
                         values="Duration",
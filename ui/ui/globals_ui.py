@@ -68,8 +68,11 @@ def handle_retriever_config():
         submit_button = st.form_submit_button("Create Retriever Config")
 
         if submit_button:
-            # if retriever_type == RetrievalType.GRAPH: set index_name, retriever_select, field_mappings to None
-            if retriever_type == RetrieverType.GRAPH.name:
+            # if retriever_type == RetrievalType.GRAPH or FUNCTION_LOOKUP: set index_name, retriever_select, field_mappings to None
+            if retriever_type in (
+                RetrieverType.GRAPH.name,
+                RetrieverType.FUNCTION_LOOKUP.name,
+            ):
                 index_name = None
                 retriever_select = None
                 mappings = None
@@ -106,6 +109,8 @@ def handle_prompt_templates():
     template_content = ""
     few_shot_key = ""
     few_shot_value = ""
+    few_shot_top_k = 0
+    few_shot_token_budget = 500
 
     def get_template_content(templates: list, choice: str):
         template_dict = next(
@@ -123,12 +128,24 @@ def handle_prompt_templates():
             template_content = selected_template.template
             few_shot_key = selected_template.few_shot_key or ""
             few_shot_value = selected_template.few_shot_value or ""
+            few_shot_top_k = selected_template.few_shot_top_k or 0
+            few_shot_token_budget = selected_template.few_shot_token_budget
 
     template_name = st.text_input("Template Name", value=template_name)
     template_content = st.text_area("Template Content", value=template_content)
     with st.expander("Few Shot Configuration"):
         few_shot_key = st.text_input("Few Shot Key", value=few_shot_key)
         few_shot_value = st.text_area("Few Shot Value", value=few_shot_value)
+        few_shot_top_k = st.number_input(
+            "Dynamic Examples (0 = use the Few Shot Value)",
+            min_value=0,
+            value=few_shot_top_k,
+        )
+        few_shot_token_budget = st.number_input(
+            "Token Budget of the Dynamic Examples",
+            min_value=0,
+            value=few_shot_token_budget,
+        )
 
     sb1, sb2 = st.columns([1, 1])
 
@@ -141,6 +158,8 @@ def handle_prompt_templates():
                         template=template_content,
                         few_shot_key=few_shot_key if few_shot_key else None,
                         few_shot_value=few_shot_value if few_shot_value else None,
+                        few_shot_top_k=few_shot_top_k if few_shot_top_k else None,
+                        few_shot_token_budget=few_shot_token_budget,
                     )
                 )
     else:
@@ -156,6 +175,8 @@ def handle_prompt_templates():
                         template=template_content,
                         few_shot_key=few_shot_key if few_shot_key else None,
                         few_shot_value=few_shot_value if few_shot_value else None,
+                        few_shot_top_k=few_shot_top_k if few_shot_top_k else None,
+                        few_shot_token_budget=few_shot_token_budget,
                     ),
                 )
 
@@ -23,4 +23,6 @@ def get_prompt_template() -> PromptTemplate | None:
         template=prompt_template["template"],
         few_shot_key=prompt_template["few_shot_key"],
         few_shot_value=prompt_template["few_shot_value"],
+        few_shot_top_k=prompt_template.get("few_shot_top_k"),
+        few_shot_token_budget=prompt_template.get("few_shot_token_budget", 500),
     )